@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+# Compare two result files from run.py. Exits with status 1 if any benchmark
+# got slower than the threshold, so it can gate a change:
+#
+#   python benchmarks/compare.py before.json after.json --threshold 1.10
+
+import argparse
+import json
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.10,
+        help="slowdown ratio (after/before median) that counts as a regression",
+    )
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print(f"before: {before.get('commit') or 'unknown'}  after: {after.get('commit') or 'unknown'}")
+    regressions = 0
+    for name in sorted(set(before["results"]) | set(after["results"])):
+        old, new = before["results"].get(name), after["results"].get(name)
+        if old is None or new is None:
+            print(f"{name:32} {'only in ' + ('after' if old is None else 'before'):>36}")
+            continue
+        ratio = new["median"] / old["median"]
+        flag = ""
+        if ratio > args.threshold:
+            flag = "  slower"
+            regressions += 1
+        elif ratio < 1 / args.threshold:
+            flag = "  faster"
+        print(
+            f"{name:32} {old['median'] * 1e6:12.1f}µs -> {new['median'] * 1e6:12.1f}µs"
+            f"  x{ratio:.2f}{flag}"
+        )
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
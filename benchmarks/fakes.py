@@ -0,0 +1,154 @@
+# Fake platform backends, so the pipeline can be benchmarked off macOS.
+#
+# install() registers stand-ins for the Cocoa/Quartz bindings and for
+# utils.system and utils.ascript in sys.modules. Import it before anything
+# from mark.py or utils.system.
+
+import sys
+import time
+import types
+
+from utils.apps import AppEventSource, AppInfo
+from utils.dispatcher import StatusDispatcher
+from utils.events import EventSource
+from utils.snapshot import RECORD_SEP, UNIT_SEP
+
+FRONTMOST = "company.thebrowser.browser"
+RUNNING = [
+    "company.thebrowser.browser",
+    "com.spotify.client",
+    "com.microsoft.vscode",
+    "dev.zed.zed-preview",
+    "com.googlecode.iterm2",
+    "com.hnc.discord",
+    "com.apple.finder",
+]
+
+URL = "https://github.com/domenicurso/mark/pulls"
+TITLE = "mark.py — mark"
+TRACK = f"Weightless{UNIT_SEP}Marconi Union"
+
+
+class FakeState:
+    """What the fake system reports; benchmarks change it between ticks."""
+
+    frontmost: str = FRONTMOST
+    idle: float = 0.0
+    running: list[str] = RUNNING
+    # What media apps are playing; empty when nothing is.
+    track: str = TRACK
+
+
+class FakeAppSource(AppEventSource):
+    def list(self) -> list[AppInfo]:
+        return [
+            AppInfo(bundle, pid, bundle.rsplit(".", 1)[-1])
+            for pid, bundle in enumerate(FakeState.running, start=100)
+        ]
+
+
+class FakeEventSource(EventSource):
+    pass
+
+
+class FakeHost:
+    """
+    Script host that answers snapshot scripts with canned values after a
+    fixed latency, instead of running osascript.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency: float = latency
+        self.spawns: int = 1
+
+    def run(self, script: str, timeout: float | None = None) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        values = []
+        for fragment in script.split("set end of out to v")[:-1]:
+            if "URL of active tab" in fragment:
+                values.append(URL)
+            elif "current track" in fragment:
+                values.append(FakeState.track)
+            elif "first process whose frontmost" in fragment and "AXTitle" not in fragment:
+                values.append(FakeState.frontmost)
+            else:
+                values.append(TITLE)
+        return RECORD_SEP.join(values)
+
+    def close(self):
+        pass
+
+
+class FakeResponse:
+    status_code = 200
+    text = "{}"
+    headers: dict[str, str] = {
+        "X-RateLimit-Bucket": "fake",
+        "X-RateLimit-Limit": "1000",
+        "X-RateLimit-Remaining": "999",
+        "X-RateLimit-Reset-After": "0.001",
+    }
+
+    def json(self):
+        return {}
+
+
+class FakeTransport:
+    """Discord transport that answers 200 after a fixed latency."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency: float = latency
+        self.requests: int = 0
+
+    def patch_settings(self, payload: dict) -> FakeResponse:
+        if self.latency:
+            time.sleep(self.latency)
+        self.requests += 1
+        return FakeResponse()
+
+    def close(self):
+        pass
+
+
+class TicketDispatcher(StatusDispatcher):
+    """StatusDispatcher that keeps the ticket of its last post, to wait on."""
+
+    ticket: int = 0
+
+    def post(self, status: tuple[str, str, str], interval: float | None = None) -> int:
+        self.ticket = super().post(status, interval)
+        return self.ticket
+
+
+def _module(name: str, **attrs) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    return module
+
+
+def install():
+    """Register the fake backends in sys.modules."""
+
+    class NotificationCenter:
+        def addObserver_selector_name_object_(self, *args):
+            pass
+
+    class NSWorkspace:
+        @staticmethod
+        def sharedWorkspace():
+            return types.SimpleNamespace(notificationCenter=NotificationCenter)
+
+    sys.modules.setdefault("Cocoa", _module("Cocoa", NSLog=print, NSWorkspace=NSWorkspace))
+    sys.modules["utils.ascript"] = _module(
+        "utils.ascript", ascript=lambda script: "", default_host=lambda: FakeHost()
+    )
+    sys.modules["utils.system"] = _module(
+        "utils.system",
+        WorkspaceAppSource=FakeAppSource,
+        WorkspaceEventSource=FakeEventSource,
+        frontmost_bundle=lambda: FakeState.frontmost,
+        get_frontmost_bundle=lambda: FakeState.frontmost,
+        get_idle_time=lambda: FakeState.idle,
+        pump=time.sleep,
+    )
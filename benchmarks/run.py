@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+
+# Benchmarks for Mark's status pipeline, runnable on any platform with the
+# fake backends in fakes.py. Results are written as JSON so runs on different
+# commits can be compared with compare.py:
+#
+#   python benchmarks/run.py --output before.json
+#   python benchmarks/run.py --output after.json
+#   python benchmarks/compare.py before.json after.json
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import fakes  # noqa: E402
+
+fakes.install()
+
+from mark import MarkApp  # noqa: E402
+from plugins.extra.browser import BrowserPlugin  # noqa: E402
+from plugins.extra.rules import RulesPlugin  # noqa: E402
+from plugins.manager import PluginManager  # noqa: E402
+from utils import jsonc  # noqa: E402
+from utils.events import FOCUS, Event  # noqa: E402
+from utils.probes import ProbeRunner  # noqa: E402
+from utils.snapshot import Snapshot, take_snapshot  # noqa: E402
+from utils.stabilizer import Stabilizer  # noqa: E402
+
+SEED = 1234
+SCHEMA = 1
+
+# Frontmost apps the pipeline benchmarks cycle through: a browser, editors,
+# an app with only a per-app status, and an unknown app.
+FRONTMOST_CYCLE = [
+    "company.thebrowser.browser",
+    "com.microsoft.vscode",
+    "com.googlecode.iterm2",
+    "dev.zed.zed-preview",
+    "org.example.unknown",
+]
+
+
+def measure(fn: Callable[[], None], number: int, repeat: int, warmup: int = 1) -> dict:
+    """
+    Time fn: warmup calls, then repeat rounds of number calls. Statistics are
+    per call, in seconds, over the rounds.
+    """
+    for _ in range(warmup):
+        fn()
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - start) / number)
+    rounds.sort()
+    return {
+        "number": number,
+        "repeat": repeat,
+        "mean": statistics.fmean(rounds),
+        "median": statistics.median(rounds),
+        "min": rounds[0],
+        "p95": rounds[min(len(rounds) - 1, round(0.95 * (len(rounds) - 1)))],
+        "stdev": statistics.stdev(rounds) if len(rounds) > 1 else 0.0,
+        "ops_per_sec": 1 / statistics.median(rounds),
+    }
+
+
+def load_settings(path: Path) -> dict:
+    app = MarkApp()
+    app.settings_cache = None
+    if not app.load_settings(path):
+        raise SystemExit(f"Could not load {path}")
+    return app.settings
+
+
+def large_settings(base: dict, apps: int, rules: int) -> dict:
+    """The repo's settings scaled up to many apps, plugin apps and browser rules."""
+    rng = random.Random(SEED)
+    settings = json.loads(json.dumps(base))
+    statuses = settings["statuses"]
+    for i in range(apps):
+        statuses["apps"][f"com.example.app{i}"] = ["🧩", f"Using app {i}", rng.choice(["online", "dnd"])]
+
+    plugins = statuses["plugins"]
+    plugins["_enabled"] = ["music", "browser", "code"]
+    plugins["browser"]["apps"] = ["company.thebrowser.browser"] + [
+        f"com.example.browser{i}" for i in range(20)
+    ]
+    plugins["browser"]["special_statuses"] = special_statuses(rules)
+    plugins["code"]["apps"] += [f"com.example.editor{i}" for i in range(20)]
+    plugins["music"]["apps"] = ["com.spotify.client", "com.apple.music"]
+    return settings
+
+
+def special_statuses(count: int) -> dict[str, list[str]]:
+    rules = {f"site{i}.example.com": ["🔗", f"Visiting site {i}"] for i in range(count)}
+    rules["github.com"] = ["🐙", "Browsing GitHub"]
+    return rules
+
+
+def write_jsonc(settings: dict, path: Path):
+    """Write settings as JSONC, with a comment per key like settings.jsonc."""
+    lines = []
+    for line in json.dumps(settings, indent=2, ensure_ascii=False).splitlines():
+        stripped = line.lstrip()
+        if stripped.startswith('"'):
+            indent = line[: len(line) - len(stripped)]
+            lines.append(f"{indent}// Setting {stripped.split(':', 1)[0]}")
+        lines.append(line)
+    path.write_text("\n".join(lines))
+
+
+def bench_get_status(settings: dict, args) -> dict:
+    snapshot = take_snapshot(
+        PluginManager(settings).fields,
+        runner=ProbeRunner(workers=1, host_factory=fakes.FakeHost),
+        apps=None,
+    )
+    manager = PluginManager(settings, collect=lambda fields: snapshot)
+    running = frozenset(fakes.RUNNING)
+    enabled = settings["statuses"]["plugins"]["_enabled"]
+    contexts = [
+        {"_name": name, "_idle": 0.0, "_running": running, "_enabled": enabled}
+        for name in FRONTMOST_CYCLE
+    ]
+    index = 0
+
+    def run():
+        nonlocal index
+        manager.get_status(contexts[index % len(contexts)])
+        index += 1
+
+    return measure(run, args.number * 10, args.repeat)
+
+
+def bench_load_settings(path: Path, args, cache_dir: str | None = None) -> dict:
+    app = MarkApp()
+    app.settings_cache = jsonc.ParseCache(cache_dir) if cache_dir else None
+    return measure(lambda: app.load_settings(path), args.number, args.repeat)
+
+
+def regex_loads(text: str) -> dict:
+    """The comment stripping load_settings used before utils.jsonc, as a baseline."""
+    return json.loads(re.sub(r"/\*[\s\S]*?\*/", "", re.sub(r"//.*", "", text)))
+
+
+def bench_jsonc(loads: Callable[[str], dict], text: str, args) -> dict:
+    return measure(lambda: loads(text), args.number, args.repeat)
+
+
+def bench_browser_lookup(rules: int, args) -> dict:
+    settings = load_settings(ROOT / "settings.jsonc")
+    settings["statuses"]["plugins"]["browser"]["special_statuses"] = special_statuses(rules)
+    plugin = BrowserPlugin(settings)
+    rng = random.Random(SEED)
+    urls = [
+        f"https://site{rng.randrange(rules * 2)}.example.com/page?q={i}" for i in range(64)
+    ] + ["https://github.com/domenicurso/mark"]
+    contexts = [
+        {"_name": "company.thebrowser.browser", "company.thebrowser.browser": {"url": url, "title": ""}}
+        for url in urls
+    ]
+    index = 0
+
+    def run():
+        nonlocal index
+        plugin.build_status(contexts[index % len(contexts)])
+        index += 1
+
+    return measure(run, args.number * 10, args.repeat)
+
+
+def title_rules(count: int) -> list[dict]:
+    rules = [
+        {"app": "com.apple.finder", "title": rf"^Project {i} \((?P<n>\d+) items\)", "status": ["📂", "Project {n}"]}
+        for i in range(count)
+    ]
+    rules.append({"app": "com.apple.finder", "title": r"PR #(?P<n>\d+)", "status": ["🔍", "Reviewing PR #{n}"]})
+    return rules
+
+
+def bench_rules_match(rules: int, args) -> dict:
+    settings = load_settings(ROOT / "settings.jsonc")
+    settings["statuses"]["plugins"]["rules"]["rules"] = title_rules(rules)
+    plugin = RulesPlugin(settings)
+    rng = random.Random(SEED)
+    # More distinct titles than RuleSet remembers, so every match is evaluated
+    titles = [f"Project {rng.randrange(rules * 2)} ({i} items)" for i in range(1024)] + ["Fix PR #12"]
+    global_context = {"_name": "com.apple.finder"}
+    snapshots = [Snapshot(frontmost_title=title) for title in titles]
+    index = 0
+
+    def run():
+        nonlocal index
+        context = plugin.get_context(global_context, snapshots[index % len(snapshots)])
+        if plugin.supports(context):
+            plugin.build_status(context)
+        index += 1
+
+    return measure(run, args.number * 10, args.repeat)
+
+
+def bench_tick(probe_latency: float, http_latency: float, args) -> dict:
+    os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+    app = MarkApp()
+    if not app.setup():
+        raise SystemExit("Could not set up Mark")
+    app.probes = ProbeRunner(
+        workers=app.probes.workers,
+        timeout=app.probes.timeout,
+        timeouts=app.probes.timeouts,
+        host_factory=lambda: fakes.FakeHost(probe_latency),
+    )
+    app.status_manager.transport = fakes.FakeTransport(http_latency)
+    app.dispatcher.stop()
+    app.dispatcher = fakes.TicketDispatcher(
+        app.status_manager, interval=app.dispatcher.interval
+    ).start()
+    # Commit every status right away, so each tick sends one
+    app.stabilizer = Stabilizer(samples=1)
+    # With a track playing the music plugin would win every tick, whatever
+    # is frontmost, so nothing would depend on the probes
+    fakes.FakeState.track = ""
+    index = 0
+
+    def run():
+        nonlocal index
+        fakes.FakeState.frontmost = FRONTMOST_CYCLE[index % len(FRONTMOST_CYCLE)]
+        index += 1
+        # Probe every tick instead of serving titles and URLs from the cache
+        app.cache.clear()
+        app.tick([Event(FOCUS, fakes.FakeState.frontmost, time.monotonic())])
+        # The update goes out on the dispatcher's thread; count it too
+        if not app.dispatcher.wait(app.dispatcher.ticket, timeout=5):
+            raise RuntimeError("status update was not sent")
+
+    try:
+        return measure(run, max(1, args.number // 10), args.repeat)
+    finally:
+        app.dispatcher.stop()
+        app.probes.close()
+        fakes.FakeState.frontmost = fakes.FRONTMOST
+        fakes.FakeState.track = fakes.TRACK
+
+
+def git_revision() -> tuple[str | None, bool]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(
+            subprocess.run(
+                ["git", "status", "--porcelain", "--untracked-files=no"],
+                cwd=ROOT,
+                capture_output=True,
+                text=True,
+            ).stdout.strip()
+        )
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Mark's status pipeline")
+    parser.add_argument("--output", "-o", help="write results to this file instead of stdout")
+    parser.add_argument("--filter", "-k", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--number", type=int, default=100, help="calls per round (scaled per benchmark)")
+    parser.add_argument("--repeat", type=int, default=7, help="rounds per benchmark")
+    parser.add_argument("--quick", action="store_true", help="fewer calls and rounds, for smoke runs")
+    args = parser.parse_args()
+    if args.quick:
+        args.number, args.repeat = 10, 3
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = load_settings(ROOT / "settings.jsonc")
+        large = large_settings(base, apps=500, rules=1000)
+        large_path = Path(tmp) / "large.jsonc"
+        write_jsonc(large, large_path)
+        cache_dir = str(Path(tmp) / "cache")
+        # Settings with thousands of special website rules, as JSONC text
+        rules_text = {}
+        for rules in (1000, 5000):
+            rules_path = Path(tmp) / f"rules{rules}.jsonc"
+            write_jsonc(large_settings(base, apps=500, rules=rules), rules_path)
+            rules_text[rules] = rules_path.read_text()
+
+        benchmarks: dict[str, Callable[[], dict]] = {
+            "get_status/default": lambda: bench_get_status(base, args),
+            "get_status/large": lambda: bench_get_status(large, args),
+            "load_settings/default": lambda: bench_load_settings(ROOT / "settings.jsonc", args),
+            "load_settings/large": lambda: bench_load_settings(large_path, args),
+            "load_settings/large_cached": lambda: bench_load_settings(large_path, args, cache_dir),
+            "jsonc/regex/1000": lambda: bench_jsonc(regex_loads, rules_text[1000], args),
+            "jsonc/regex/5000": lambda: bench_jsonc(regex_loads, rules_text[5000], args),
+            "jsonc/loads/1000": lambda: bench_jsonc(jsonc.loads, rules_text[1000], args),
+            "jsonc/loads/5000": lambda: bench_jsonc(jsonc.loads, rules_text[5000], args),
+            "browser_lookup/10": lambda: bench_browser_lookup(10, args),
+            "browser_lookup/1000": lambda: bench_browser_lookup(1000, args),
+            "browser_lookup/10000": lambda: bench_browser_lookup(10000, args),
+            "rules_match/10": lambda: bench_rules_match(10, args),
+            "rules_match/500": lambda: bench_rules_match(500, args),
+            "tick/no_latency": lambda: bench_tick(0.0, 0.0, args),
+            "tick/probe_20ms_http_50ms": lambda: bench_tick(0.02, 0.05, args),
+        }
+
+        results = {}
+        # Mark logs to stdout; keep it clean for the JSON results.
+        with contextlib.redirect_stdout(sys.stderr):
+            for name, bench in benchmarks.items():
+                if args.filter not in name:
+                    continue
+                random.seed(SEED)
+                results[name] = bench()
+                print(
+                    f"{name:32} median {results[name]['median'] * 1e6:12.1f}µs"
+                    f"  ({results[name]['ops_per_sec']:,.0f}/s)",
+                    file=sys.stderr,
+                )
+
+    commit, dirty = git_revision()
+    report = {
+        "schema": SCHEMA,
+        "commit": commit,
+        "dirty": dirty,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "results": results,
+    }
+    data = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(data + "\n")
+    else:
+        print(data)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,9 @@
 
 # Leave your mark behind
 
+import asyncio
 import json
 import os
-import re
 import signal
 import sys
 import termios
@@ -34,8 +34,50 @@ except ImportError:
 from zenif.cli import Applet
 
 from plugins.manager import PluginManager
+from utils.apps import AppIndex
+from utils.breaker import BreakerBoard
+from utils.config import ConfigError, compile_config
+from utils.cache import DEFAULT_SIZE, FOCUS_CHANGED, MEDIA_CHANGED, ProbeCache
 from utils.constants import FB_ICON, FB_TEXT, MIN_RATE_LIMIT, VERSION, l
-from utils.system import get_frontmost_bundle, get_idle_time
+from utils.dispatcher import AsyncStatusDispatcher, StatusDispatcher
+from utils.events import (
+    CLOCK,
+    FOCUS,
+    MEDIA,
+    SETTINGS,
+    AsyncEventBus,
+    EventBus,
+    IdleEventSource,
+)
+from utils.governor import (
+    DEFAULT_CPU_TARGET,
+    DEFAULT_MAX_INTERVAL,
+    DEFAULT_WATCH_INTERVAL,
+    SamplingGovernor,
+)
+from utils import jsonc
+from utils.metrics import DEFAULT_HOST, DEFAULT_PORT, MetricsServer, metrics
+from utils.probes import DEFAULT_TIMEOUT, DEFAULT_WORKERS, AsyncProbeRunner, ProbeRunner
+from utils.scheduler import DEFAULT_POLL_INTERVAL, AsyncScheduler, Scheduler
+from utils.snapshot import Snapshot, take_snapshot, take_snapshot_async
+from utils.stabilizer import (
+    DEFAULT_INTERVAL,
+    DEFAULT_SAMPLES,
+    DEFAULT_WINDOW,
+    Stabilizer,
+)
+from utils.ratelimit import RateLimiter
+from utils.trace import TraceEntry, TraceRecorder, replay as replay_trace
+from utils.watcher import SettingsWatcher
+from utils.transport import DISCORD_API, AsyncDiscordTransport, DiscordTransport
+from utils.system import (
+    WorkspaceAppSource,
+    WorkspaceEventSource,
+    frontmost_bundle,
+    get_frontmost_bundle,
+    get_idle_time,
+    pump,
+)
 
 # Initialize the CLI app
 app = Applet(single=True)
@@ -45,29 +87,91 @@ app.install(os.path.abspath(__file__))
 SCRIPT_DIR = Path(__file__).resolve().parent
 DEFAULT_ENV_PATH = SCRIPT_DIR / ".env"
 DEFAULT_SETTINGS_PATH = SCRIPT_DIR / "settings.jsonc"
+STATUS_ROUTE = "PATCH /users/@me/settings"
+SHUTDOWN_GRACE = 15  # seconds allowed for the final reset past the rate limit
+# Settings that take effect when reloaded; changes to the others need a restart
+LIVE_SETTINGS = ("statuses", "update_interval", "colorblind")
+
+# Metric names
+TICK_SECONDS = "mark_tick_seconds"
+DISCORD_SECONDS = "mark_discord_request_seconds"
+DISCORD_RESPONSES = "mark_discord_responses_total"
+RATE_LIMITED = "mark_discord_rate_limited_total"
+UPDATES = "mark_status_updates_total"
+SKIPS = "mark_status_skips_total"
+ERRORS = "mark_errors_total"
 
 
 class DiscordStatusManager:
     """Manages Discord custom status updates"""
 
-    def __init__(self, settings, token):
+    def __init__(self, settings, token, transport=None, limiter=None):
         self.settings = settings
         self.token = token
+        self.transport = transport or DiscordTransport(
+            token, base_url=os.getenv("DISCORD_API_URL", DISCORD_API)
+        )
+        self.limiter = limiter or RateLimiter()
         self.last_status = (None, None, None)
         self.last_status_time = 0
 
+    def retry_after(self, update_interval=0):
+        """Seconds until a status update may be sent and will succeed"""
+        elapsed = time.time() - self.last_status_time
+        return max(
+            self.limiter.delay(STATUS_ROUTE), update_interval - elapsed, 0
+        )
+
     def set_custom_status(self, emoji: str, text: str, status_type: str = "online"):
         """Set a custom status on Discord"""
+        status_type, payload = self._prepare(emoji, text, status_type)
+        if payload is None:
+            return False
+
+        try:
+            with metrics.time(DISCORD_SECONDS):
+                resp = self.transport.patch_settings(payload)
+        except requests.RequestException as e:
+            metrics.inc(ERRORS, where="discord")
+            l.warning(f"Failed to set status: {e}")
+            return False
+        return self._finish(resp, emoji, text, status_type)
+
+    async def set_custom_status_async(
+        self, emoji: str, text: str, status_type: str = "online"
+    ):
+        """Set a custom status on Discord through an async transport"""
+        status_type, payload = self._prepare(emoji, text, status_type)
+        if payload is None:
+            return False
+
+        try:
+            with metrics.time(DISCORD_SECONDS):
+                resp = await self.transport.patch_settings(payload)
+        except requests.RequestException as e:
+            metrics.inc(ERRORS, where="discord")
+            l.warning(f"Failed to set status: {e}")
+            return False
+        return self._finish(resp, emoji, text, status_type)
+
+    def _prepare(self, emoji, text, status_type):
+        """
+        Validate the status type and build the payload. The payload is None
+        when Discord's rate limits would reject the request.
+        """
         # Validate status type
         status_type = status_type.lower()
         if status_type not in ["online", "idle", "dnd", "invisible"]:
             status_type = "online"
 
-        url = "https://discord.com/api/v9/users/@me/settings"
-        headers = {
-            "Authorization": self.token,
-            "Content-Type": "application/json",
-        }
+        # Only send when Discord's rate limits will let the request through
+        wait = self.limiter.delay(STATUS_ROUTE)
+        if wait > 0:
+            metrics.inc(SKIPS, reason="rate_limited")
+            l.info(f"Rate limited; status update held for {wait:.2f}s")
+            return status_type, None
+
+        self.limiter.acquire(STATUS_ROUTE)
         payload = {
             "custom_status": {
                 "text": text,
@@ -75,13 +179,29 @@ class DiscordStatusManager:
             },
             "status": status_type,
         }
+        return status_type, payload
 
-        resp = requests.patch(url, json=payload, headers=headers)
+    def _finish(self, resp, emoji, text, status_type):
+        """Record the response of a status update"""
+        try:
+            body = resp.json() if resp.status_code == 429 else None
+        except ValueError:
+            body = None
+        self.limiter.update(STATUS_ROUTE, resp.status_code, resp.headers, body)
+        metrics.inc(DISCORD_RESPONSES, status=str(resp.status_code))
+
+        if resp.status_code == 429:
+            metrics.inc(RATE_LIMITED)
+            l.warning(
+                f"Rate limited by Discord; retrying in {self.limiter.delay(STATUS_ROUTE):.2f}s"
+            )
+            return False
         if resp.status_code != 200:
             l.warning(f"Failed to set status. HTTP {resp.status_code}: {resp.text}")
             return False
 
         # Update last status information
+        metrics.inc(UPDATES)
         self.last_status = (emoji, text, status_type)
         self.last_status_time = time.time()
 
@@ -100,12 +220,17 @@ class DiscordStatusManager:
         l.success(f"{dot} {Style.RESET_ALL}{Style.DIM}{emoji} {text}")
         return True
 
-    def reset_to_default(self):
-        """Reset status to the default defined in settings"""
+    def default_status(self):
+        """The default status defined in settings"""
         emoji, text, *maybe_type = self.settings["statuses"].get(
             "default", [FB_ICON(), FB_TEXT(), "online"]
         )
         status_type = maybe_type[0] if maybe_type else "online"
+        return (emoji, text, status_type)
+
+    def reset_to_default(self):
+        """Reset status to the default defined in settings"""
+        emoji, text, status_type = self.default_status()
         return self.set_custom_status(emoji=emoji, text=text, status_type=status_type)
 
 
@@ -135,33 +260,111 @@ class MarkApp:
 
     def __init__(self):
         self.settings = {}
+        self.settings_path = DEFAULT_SETTINGS_PATH
+        # Parsed settings files from earlier runs
+        self.settings_cache = jsonc.ParseCache()
+        self.config = None
         self.token = None
         self.status_manager = None
+        self.dispatcher = None
+        self.stabilizer = None
+        self.governor = None
+        self.metrics_server = None
         self.plugin_manager = None
+        self.apps = None
+        self.cache = None
+        self.probes = None
+        self.breakers = None
+        self.scheduler = None
+        self.recorder = None
+        self.idle_source = None
+        self.watcher = None
         self.update_interval = 5
-        self.retry_interval = 5
+        self.retry_interval = DEFAULT_POLL_INTERVAL
         self.observer = None
         self.debug = False
+        # Time and snapshot of the current tick, for the trace recorder
+        self._tick_time = 0.0
+        self._snapshot = Snapshot()
+
+    def parse_settings(self, settings_path):
+        """
+        Parse a settings file and compile it. Raises OSError, JSONDecodeError
+        or ConfigError if it can't be read or is invalid
+        """
+        # Reuse the result of an earlier parse if the file hasn't changed
+        cache = self.settings_cache
+        key = cache.key(settings_path) if cache else None
+        settings = cache.get(key) if cache else None
+        if settings is not None:
+            return settings, compile_config(settings)
+
+        with open(settings_path, "r", encoding="utf-8") as f:
+            settings = jsonc.loads(f.read())
+
+        # Validate the settings and resolve what plugins read every tick; only
+        # valid settings are cached
+        config = compile_config(settings)
+        if cache:
+            cache.put(key, settings)
+        return settings, config
 
     def load_settings(self, settings_path=None):
         """Load settings from the settings file"""
-        settings_path = settings_path or DEFAULT_SETTINGS_PATH
+        self.settings_path = settings_path or DEFAULT_SETTINGS_PATH
         try:
-            with open(settings_path, "r") as f:
-                # Strip comments from JSON
-                json_str = re.sub(r"/\*[\s\S]*?\*/", "", re.sub(r"//.*", "", f.read()))
-                self.settings = json.loads(json_str)
+            self.settings, self.config = self.parse_settings(self.settings_path)
 
             # Set intervals from settings
-            self.update_interval = self.settings.get("update_interval", 5)
+            self.update_interval = self.config.update_interval
             self.retry_interval = max(
-                MIN_RATE_LIMIT, self.settings.get("retry_interval", 0)
+                MIN_RATE_LIMIT,
+                self.settings.get("sampling", {}).get(
+                    "min_interval",
+                    self.settings.get("retry_interval", DEFAULT_POLL_INTERVAL),
+                ),
             )
             return True
-        except (FileNotFoundError, json.JSONDecodeError) as e:
+        except (OSError, json.JSONDecodeError, ConfigError) as e:
             l.error(f"Failed to load settings: {e}")
             return False
 
+    def apply_settings(self, update, debug=False):
+        """
+        Swap in settings reloaded by the settings watcher, between ticks.
+        Only plugins whose settings changed are rebuilt; if the new settings
+        are invalid, the current ones stay in effect
+        """
+        if update.error is not None:
+            metrics.inc(ERRORS, where="settings")
+            l.error(
+                f"Failed to reload settings, keeping the current ones: {update.error}"
+            )
+            return False
+
+        settings, config = update.value
+        rebuilt = self.plugin_manager.reconfigure(settings, config)
+        restart = sorted(
+            key
+            for key in set(self.settings) | set(settings)
+            if key not in LIVE_SETTINGS and self.settings.get(key) != settings.get(key)
+        )
+
+        self.settings, self.config = settings, config
+        self.update_interval = config.update_interval
+        self.status_manager.settings = settings
+        self.dispatcher.interval = config.update_interval
+        if self.idle_source:
+            self.idle_source.threshold = self.idle_timeout()
+
+        l.info(
+            "Reloaded settings; "
+            + (f"rebuilt plugins: {', '.join(rebuilt)}" if rebuilt else "no plugins changed")
+        )
+        if restart:
+            l.warning(f"Restart Mark to apply changes to: {', '.join(restart)}")
+        return True
+
     def load_env(self, env_path=None):
         """Load environment variables"""
         env_path = env_path or DEFAULT_ENV_PATH
@@ -172,8 +375,12 @@ class MarkApp:
             return False
         return True
 
-    def setup(self, debug=False):
-        """Set up the application"""
+    def setup(self, debug=False, use_asyncio=False, record=None):
+        """
+        Set up the application. With use_asyncio, probes and status updates
+        use the asyncio engine's runner and transport instead. With record,
+        every tick is appended to that trace file
+        """
         self.debug = debug
         if debug:
             print("─" * os.get_terminal_size().columns)
@@ -187,8 +394,82 @@ class MarkApp:
             l.error("Failed to load environment variables")
             return False
 
-        self.status_manager = DiscordStatusManager(self.settings, self.token)
-        self.plugin_manager = PluginManager(self.settings, debug=debug)
+        # Index running apps once; launch/terminate notifications keep it current
+        self.apps = AppIndex(WorkspaceAppSource())
+        self.apps.start()
+
+        # Cache slow-changing probe results between ticks
+        cache_settings = self.settings.get("cache", {})
+        self.cache = ProbeCache(
+            size=cache_settings.get("size", DEFAULT_SIZE),
+            ttls=cache_settings.get("ttl", {}),
+        )
+
+        # Run probes concurrently, each bounded by its deadline
+        probe_settings = self.settings.get("probes", {})
+        self.probes = (AsyncProbeRunner if use_asyncio else ProbeRunner)(
+            workers=probe_settings.get("workers", DEFAULT_WORKERS),
+            timeout=probe_settings.get("timeout", DEFAULT_TIMEOUT),
+            timeouts=probe_settings.get("timeouts", {}),
+        )
+        # Back off from apps that keep failing to answer
+        self.breakers = BreakerBoard(**probe_settings.get("breaker", {}))
+
+        # Sample less while the user is away or sampling gets expensive
+        sampling_settings = self.settings.get("sampling", {})
+        self.governor = SamplingGovernor(
+            min_interval=self.retry_interval,
+            max_interval=max(
+                self.retry_interval,
+                sampling_settings.get("max_interval", DEFAULT_MAX_INTERVAL),
+            ),
+            idle_after=sampling_settings.get("idle_after", self.idle_timeout()),
+            cpu_target=sampling_settings.get("cpu_target", DEFAULT_CPU_TARGET),
+            idle_time=get_idle_time,
+            watch_interval=max(
+                MIN_RATE_LIMIT,
+                sampling_settings.get("watch_interval", DEFAULT_WATCH_INTERVAL),
+            ),
+        )
+
+        # Only commit statuses that stick, so app-switch flapping is ignored
+        stabilize_settings = self.settings.get("stabilize", {})
+        self.stabilizer = Stabilizer(
+            samples=stabilize_settings.get("samples", DEFAULT_SAMPLES),
+            window=stabilize_settings.get("window", DEFAULT_WINDOW),
+            interval=stabilize_settings.get("interval", DEFAULT_INTERVAL),
+            plugins=stabilize_settings.get("plugins", {}),
+        )
+
+        base_url = os.getenv("DISCORD_API_URL", DISCORD_API)
+        self.status_manager = DiscordStatusManager(
+            self.settings,
+            self.token,
+            transport=(AsyncDiscordTransport if use_asyncio else DiscordTransport)(
+                self.token, base_url=base_url
+            ),
+        )
+        # Send updates in the background so sampling never waits on Discord;
+        # the asyncio engine starts its own dispatcher on its event loop
+        if not use_asyncio:
+            self.dispatcher = StatusDispatcher(
+                self.status_manager, interval=self.update_interval
+            ).start()
+        self.plugin_manager = PluginManager(
+            self.settings,
+            debug=debug,
+            collect=self._collect,
+            clock=self._clock,
+            config=self.config,
+        )
+
+        if record:
+            try:
+                self.recorder = TraceRecorder(record)
+            except OSError as e:
+                l.error(f"Failed to open trace file: {e}")
+                return False
+            l.info(f"Recording ticks to {record}")
 
         # Set up shutdown handlers
         if debug:
@@ -234,37 +515,128 @@ class MarkApp:
             print("\033[?25h", end="")  # Show cursor
             sys.exit(0)
 
+        # Stop sampling so nothing replaces the final status
+        if self.scheduler:
+            self.scheduler.stop()
+        if self.watcher:
+            self.watcher.close()
+        if self.recorder:
+            recorder, self.recorder = self.recorder, None
+            recorder.close()
+            l.info(f"Recorded {recorder.ticks} ticks to {recorder.path}")
+
+        if self.stabilizer and self.stabilizer.suppressed:
+            l.info(
+                f"Skipped {self.stabilizer.suppressed} transient status updates this session"
+            )
+
         # Check if we need to wait for rate limiting
-        current_time = time.time()
-        elapsed = current_time - self.status_manager.last_status_time
-        remaining_time = max(0, MIN_RATE_LIMIT - elapsed)
+        remaining_time = self.status_manager.retry_after()
 
         if remaining_time > 0:
             l.info(
                 f"Waiting {remaining_time:.2f} seconds before final status reset to avoid rate limits..."
             )
-            # Calculate fractional and whole parts of remaining_time
-            whole = int(remaining_time)
-            fractional = remaining_time - whole
-
-            # First, wait the fractional part if any
-            if fractional > 0:
-                time.sleep(fractional)
-
-            # Then, wait each whole second with per-second updates
-            for seconds_remaining in range(whole, 0, -1):
-                l.info(f"{seconds_remaining} seconds remaining...")
-                time.sleep(1)
 
-        # Reset to default status
-        self.status_manager.reset_to_default()
-        l.success("Final status reset. Exiting now.")
+        # Reset to default status through the dispatcher, which sends it as
+        # soon as the rate limit allows
+        if self.dispatcher:
+            ticket = self.dispatcher.post(
+                self.status_manager.default_status(), interval=0
+            )
+            deadline = time.monotonic() + remaining_time + SHUTDOWN_GRACE
+            while not self.dispatcher.wait(ticket, timeout=1):
+                if not self._final_reset_pending(deadline):
+                    break
+            else:
+                l.success("Final status reset. Exiting now.")
+            self.dispatcher.stop()
+        else:
+            self.status_manager.reset_to_default()
+            l.success("Final status reset. Exiting now.")
 
         # Show cursor
         print("\033[?25h", end="")
         sys.exit(0)
 
-    def run(self, fast=False, debug=False):
+    async def graceful_shutdown_async(self):
+        """
+        Handle graceful shutdown in the asyncio engine. Returns once the final
+        status is reset; the caller exits
+        """
+        print("\nShutdown signal received. Cleaning up...")
+
+        # Stop sampling so nothing replaces the final status
+        if self.scheduler:
+            self.scheduler.stop()
+        if self.watcher:
+            self.watcher.close()
+        if self.recorder:
+            recorder, self.recorder = self.recorder, None
+            recorder.close()
+            l.info(f"Recorded {recorder.ticks} ticks to {recorder.path}")
+
+        # Clear screen and show logo
+        os.system("clear" if os.name == "posix" else "cls")
+        print_logo()
+
+        if self.stabilizer.suppressed:
+            l.info(
+                f"Skipped {self.stabilizer.suppressed} transient status updates this session"
+            )
+
+        remaining_time = self.status_manager.retry_after()
+        if remaining_time > 0:
+            l.info(
+                f"Waiting {remaining_time:.2f} seconds before final status reset to avoid rate limits..."
+            )
+
+        ticket = self.dispatcher.post(self.status_manager.default_status(), interval=0)
+        deadline = time.monotonic() + remaining_time + SHUTDOWN_GRACE
+        while not await self.dispatcher.wait(ticket, timeout=1):
+            if not self._final_reset_pending(deadline):
+                break
+        else:
+            l.success("Final status reset. Exiting now.")
+
+        self.dispatcher.stop()
+        self.probes.close()
+        await self.probes.wait_closed()
+        await self.status_manager.transport.close()
+
+    def _final_reset_pending(self, deadline):
+        """Log the wait for the final reset; returns False once it timed out"""
+        if time.monotonic() >= deadline:
+            l.warning("Final status reset timed out")
+            return False
+        remaining_time = self.status_manager.retry_after()
+        if remaining_time >= 1:
+            l.info(f"{remaining_time:.0f} seconds remaining...")
+        return True
+
+    def start_metrics(self):
+        """Start recording metrics and serve them in the Prometheus text format"""
+        metrics_settings = self.settings.get("metrics", {})
+        metrics.enable()
+        try:
+            self.metrics_server = MetricsServer(
+                metrics,
+                host=metrics_settings.get("host", DEFAULT_HOST),
+                port=metrics_settings.get("port", DEFAULT_PORT),
+            ).start()
+        except OSError as e:
+            l.warning(f"Failed to start metrics endpoint: {e}")
+            return
+        l.info(f"Serving metrics at {self.metrics_server.url}")
+
+    def run(
+        self,
+        fast=False,
+        debug=False,
+        use_asyncio=False,
+        serve_metrics=False,
+        record=None,
+    ):
         """Run the application"""
         # Clear screen
         os.system("clear" if os.name == "posix" else "cls")
@@ -278,10 +650,13 @@ class MarkApp:
                     "Verbose mode enabled... to turn off, run mark without the --verbose/-v flag"
                 )
 
-            if not self.setup(debug):
+            if not self.setup(debug, use_asyncio, record):
                 l.error("Failed to set up application. Exiting.")
                 return
 
+            if serve_metrics:
+                self.start_metrics()
+
             if not fast:
                 self.show_startup_screen()
 
@@ -299,7 +674,13 @@ class MarkApp:
             time.sleep(3)
 
             # Main loop
-            self.status_update_loop(debug)
+            if use_asyncio:
+                asyncio.run(self.status_update_loop_async(debug))
+                # Show cursor
+                print("\033[?25h", end="")
+                sys.exit(0)
+            else:
+                self.status_update_loop(debug)
 
         except Exception as e:
             # Show cursor before exiting
@@ -307,67 +688,284 @@ class MarkApp:
             l.error(f"An error occurred: {e}")
             sys.exit(1)
 
+    def idle_timeout(self):
+        """Seconds of inactivity before the idle status is shown"""
+        return self.config.statuses.idle.timeout
+
+    def event_sources(self):
+        """Event sources that wake the main loop"""
+        self.idle_source = IdleEventSource(get_idle_time, self.idle_timeout())
+        self.watcher = SettingsWatcher(self.settings_path, self.parse_settings)
+        sources = [WorkspaceEventSource(), self.idle_source, self.watcher]
+        # Wake up when input resumes after the governor stretched the interval
+        if self.governor and self.governor.idle_after != self.idle_timeout():
+            sources.append(IdleEventSource(get_idle_time, self.governor.idle_after))
+        return sources
+
     def status_update_loop(self, debug=False):
-        """Main status update loop"""
-        while True:
-            # Skip if plugin_manager or status_manager aren't initialized
-            if not self.plugin_manager or not self.status_manager:
-                l.error(
-                    "Plugin manager or status manager not initialized. Retrying in 5 seconds..."
+        """Main status update loop, woken by app, media and idle events"""
+        self.scheduler = Scheduler(
+            EventBus(pump=pump),
+            lambda events: self.tick(events, debug),
+            poll_interval=self.retry_interval,
+            sources=self.event_sources(),
+            governor=self.governor,
+        )
+        self.scheduler.run()
+
+    async def status_update_loop_async(self, debug=False):
+        """
+        Main status update loop on the asyncio engine: probes, status updates,
+        timers and event sources all run as tasks on one event loop. Returns
+        after a shutdown signal, once the final status is reset and the loop
+        has stopped
+        """
+        loop = asyncio.get_running_loop()
+        shutdown = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, shutdown.set)
+        if self.observer:
+            self.observer.shutdown_callback = lambda: loop.call_soon_threadsafe(
+                shutdown.set
+            )
+
+        self.dispatcher = AsyncStatusDispatcher(
+            self.status_manager, interval=self.update_interval
+        ).start()
+
+        self.scheduler = AsyncScheduler(
+            AsyncEventBus(loop),
+            lambda events: self.tick_async(events, debug),
+            poll_interval=self.retry_interval,
+            sources=self.event_sources(),
+            pump=pump,
+            governor=self.governor,
+        )
+        loop_task = asyncio.create_task(self.scheduler.run())
+
+        await shutdown.wait()
+        await self.graceful_shutdown_async()
+        await loop_task
+
+    def tick(self, events, debug=False):
+        """
+        Sample the current status once and queue it for the dispatcher.
+        Returns the delay before the next tick when sampling was not possible.
+        """
+        context = self._begin_tick(events, debug)
+        if context is None:
+            return 5
+
+        try:
+            # Get status from plugin manager; it collects whatever else the
+            # candidate plugins need in one round trip
+            with metrics.time(TICK_SECONDS):
+                status = self.plugin_manager.get_status(context)
+            self._record(context, status)
+            return self._queue_status(status, events, debug)
+        except Exception as e:
+            metrics.inc(ERRORS, where="tick")
+            l.error("Error in status update loop: " + str(e))
+
+        return None
+
+    async def tick_async(self, events, debug=False):
+        """Same as tick, for the asyncio engine"""
+        context = self._begin_tick(events, debug)
+        if context is None:
+            return 5
+
+        try:
+            with metrics.time(TICK_SECONDS):
+                status = await self.plugin_manager.get_status_async(
+                    context, self._collect_async
                 )
-                time.sleep(5)
-                continue
+            self._record(context, status)
+            return self._queue_status(status, events, debug)
+        except Exception as e:
+            metrics.inc(ERRORS, where="tick")
+            l.error("Error in status update loop: " + str(e))
+
+        return None
+
+    def _begin_tick(self, events, debug=False):
+        """
+        Drop cached probe results the events made stale and return the global
+        plugin context, or None if the app isn't set up
+        """
+        # Skip if plugin_manager or status_manager aren't initialized
+        if not self.plugin_manager or not self.status_manager or not self.dispatcher:
+            l.error(
+                "Plugin manager or status manager not initialized. Retrying in 5 seconds..."
+            )
+            return None
+
+        if debug and events:
+            l.debug("Woken by " + ", ".join(event.kind for event in events))
+
+        # Swap in the latest reloaded settings before sampling with them
+        updates = [event.data for event in events if event.kind == SETTINGS]
+        if updates:
+            self.apply_settings(updates[-1], debug)
+
+        kinds = {event.kind for event in events}
+        if FOCUS in kinds:
+            self.cache.invalidate(FOCUS_CHANGED)
+        if MEDIA in kinds:
+            self.cache.invalidate(MEDIA_CHANGED)
+
+        self._tick_time = time.time()
+        self._snapshot = Snapshot()
+
+        return {
+            "_name": frontmost_bundle(),
+            "_idle": get_idle_time(),
+            "_running": self.apps.bundles(),
+            "_enabled": self.config.statuses.enabled,
+        }
 
-            try:
-                # Get status from plugin manager
-                context = {
-                    "_name": get_frontmost_bundle(),
-                    "_idle": get_idle_time(),
-                    "_enabled": self.settings.get("statuses", {})
-                    .get("plugins", {})
-                    .get("_enabled", []),
-                }
-
-                emoji, text, status_type = self.plugin_manager.get_status(context)
-
-                # Check if status has changed
-                current_status = (emoji, text, status_type)
-                now = time.time()
-
-                if (
-                    current_status != self.status_manager.last_status
-                    and (now - self.status_manager.last_status_time)
-                    > self.update_interval
-                ):
-                    if debug:
-                        l.debug(
-                            "Updating Discord status to: "
-                            + emoji
-                            + " "
-                            + text
-                            + " (type: "
-                            + status_type
-                            + ")"
-                        )
-
-                    self.status_manager.set_custom_status(emoji, text, status_type)
-
-                    if debug:
-                        l.success(
-                            "Updated Discord status to: "
-                            + emoji
-                            + " "
-                            + text
-                            + " (type: "
-                            + status_type
-                            + ")"
-                        )
-                elif debug:
-                    l.debug("Discord status is already up to date; skipping update.")
-            except Exception as e:
-                l.error("Error in status update loop: " + str(e))
-
-            time.sleep(self.retry_interval)
+    def _collect(self, fields):
+        """Take the snapshot of the given fields for the plugin manager"""
+        self._snapshot = take_snapshot(
+            fields,
+            runner=self.probes,
+            apps=self.apps,
+            cache=self.cache,
+            breakers=self.breakers,
+        )
+        return self._snapshot
+
+    async def _collect_async(self, fields):
+        """Same as _collect, for the asyncio engine"""
+        self._snapshot = await take_snapshot_async(
+            fields,
+            runner=self.probes,
+            apps=self.apps,
+            cache=self.cache,
+            breakers=self.breakers,
+        )
+        return self._snapshot
+
+    def _clock(self):
+        """
+        The plugins' clock. Remembers the last time they read, so a recorded
+        tick replays with the exact time its status showed
+        """
+        self._tick_time = time.time()
+        return self._tick_time
+
+    def _record(self, context, status):
+        """Append the tick to the trace file, if recording"""
+        if not self.recorder:
+            return
+        try:
+            self.recorder.record(
+                TraceEntry(
+                    self._tick_time,
+                    context,
+                    self._snapshot,
+                    status,
+                    self.plugin_manager.matched,
+                )
+            )
+        except (OSError, TypeError, ValueError) as e:
+            l.warning(f"Failed to record tick, recording stopped: {e}")
+            self.recorder.close()
+            self.recorder = None
+
+    def replay(self, trace_path, debug=False):
+        """
+        Feed a recorded trace through the plugins at full speed, with the
+        current settings and the recorded times, and report every tick whose
+        status differs from the recorded one. Returns True if none differ
+        """
+        if not self.load_settings():
+            return False
+        try:
+            return replay_trace(trace_path, self.settings, debug=debug) == 0
+        except (OSError, ValueError) as e:
+            l.error(f"Failed to replay trace: {e}")
+            return False
+
+    def _queue_status(self, status, events, debug=False):
+        """
+        Hand a sampled status to the dispatcher once it is stable. Returns the
+        delay before the next sample while it is still settling
+        """
+        emoji, text, status_type = status
+        if debug:
+            l.debug("Probe cache:", self.cache.stats())
+            if breakers := self.breakers.describe():
+                l.debug("Open circuit breakers:", breakers)
+            l.debug("Sampling:", self.governor.stats())
+
+        # Re-render exactly when the status would change by itself (e.g. the
+        # shown time), instead of waiting for the next poll
+        if self.scheduler:
+            next_change = self.plugin_manager.next_change()
+            self.scheduler.wake_at("status", next_change)
+            if debug and next_change is not None:
+                l.debug(f"Status changes by itself in {next_change - time.time():.2f}s")
+
+        # Window titles and tab URLs change without an event, so keep polling
+        # often while the status shows one
+        self.governor.watching = self.plugin_manager.watching()
+
+        # Hold new statuses until they have been stable for a while; the
+        # current plugin re-rendering at a clock boundary or for edited
+        # settings isn't flapping and goes out right away
+        suppressed = self.stabilizer.suppressed
+        immediate = bool(events) and all(
+            event.kind in (CLOCK, SETTINGS) for event in events
+        )
+        if (
+            self.stabilizer.offer(status, self.plugin_manager.matched, immediate=immediate)
+            is None
+        ):
+            if self.stabilizer.suppressed > suppressed:
+                metrics.inc(SKIPS, reason="transient")
+            if debug and self.stabilizer.suppressed > suppressed:
+                l.debug(
+                    f"Suppressed a transient status ({self.stabilizer.suppressed} so far)"
+                )
+            if self.stabilizer.pending() is not None:
+                if debug:
+                    seen, needed = self.stabilizer.progress()
+                    l.debug(f"Holding new status until it is stable ({seen}/{needed})")
+                return self.stabilizer.next_check()
+
+        # The dispatcher replaces any update that is still waiting on the
+        # rate limit, and drops the status if it is unchanged
+        current_status = (emoji, text, status_type)
+        pending = self.dispatcher.pending()
+        self.dispatcher.post(current_status)
+
+        if current_status == self.status_manager.last_status:
+            metrics.inc(SKIPS, reason="unchanged")
+            if debug and pending is None:
+                l.debug("Discord status is already up to date; skipping update.")
+            return None
+
+        if pending is not None and pending != current_status:
+            metrics.inc(SKIPS, reason="superseded")
+        if debug:
+            l.debug(
+                "Queued Discord status: "
+                + emoji
+                + " "
+                + text
+                + " (type: "
+                + status_type
+                + ")"
+            )
+            if pending is not None and pending != current_status:
+                l.debug(
+                    f"Replaced unsent status ({self.dispatcher.superseded} superseded so far)"
+                )
+            if events:
+                latency = time.monotonic() - min(event.time for event in events)
+                l.debug(f"Event to queue latency: {latency * 1000:.0f}ms")
+        return None
 
     def show_startup_screen(self):
         """Show the startup screen with space to start prompt"""
@@ -434,10 +1032,23 @@ def print_logo():
 @app.flag("verbose", help="Enable verbose mode")
 @app.flag("version", help="Get the version of Mark")
 @app.flag("getbundle", help="Get the bundle ID of the active app")
+@app.flag("asyncio", help="Run on the asyncio engine")
+@app.flag("metrics", help="Serve latency histograms and counters for Prometheus")
+@app.option("record", default="", help="Record every tick to this trace file")
+@app.option("replay", default="", help="Replay a recorded trace file offline and exit")
 @app.alias("fast", "f")
 @app.alias("version", "v")
 @app.alias("getbundle", "gb")
-def run(fast: bool, verbose: bool, version: bool, getbundle: bool):
+def run(
+    fast: bool,
+    verbose: bool,
+    version: bool,
+    getbundle: bool,
+    asyncio: bool,
+    metrics: bool,
+    record: str,
+    replay: str,
+):
     """Initialize Mark"""
     if version:
         print(f"Mark v{VERSION}")
@@ -456,9 +1067,17 @@ def run(fast: bool, verbose: bool, version: bool, getbundle: bool):
         except KeyboardInterrupt:
             pass
         sys.exit(0)
+    elif replay:
+        sys.exit(0 if MarkApp().replay(replay, debug=verbose) else 1)
 
     mark = MarkApp()
-    mark.run(fast=fast, debug=verbose)
+    mark.run(
+        fast=fast,
+        debug=verbose,
+        use_asyncio=asyncio,
+        serve_metrics=metrics,
+        record=record or None,
+    )
 
 
 if __name__ == "__main__":
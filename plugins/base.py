@@ -1,28 +1,64 @@
+import time
 from abc import ABC, abstractmethod
-from datetime import datetime
-from utils.constants import FB_ICON, DEFAULT_SEPARATOR, DEFAULT_TIME_FORMAT
+from collections.abc import Callable, Mapping
+from utils.config import Config, PluginConfig, TimePolicy, compile_config, compile_plugin
+from utils.snapshot import Snapshot
 from utils.types import PluginID, PluginStatus, PluginContext, PluginSettings
 
 
 class Plugin(ABC):
-    def __init__(self, id: PluginID, settings: PluginSettings):
+    def __init__(
+        self, id: PluginID, settings: PluginSettings, config: Config | None = None
+    ):
         """
-        Base class for all plugins.
+        Base class for all plugins. Plugins read the compiled config, which
+        the plugin manager compiles once for all of them.
         """
         self.id: PluginID = id
         self.settings: PluginSettings = settings
-        self.pcfg: dict[str, any] = settings["statuses"]["plugins"].get(id, {})
-        self.app_statuses: dict[str, any] = settings["statuses"].get("apps", {})
+        self.config: Config = config or compile_config(settings)
+        self.pcfg: PluginConfig = self.config.statuses.plugins.get(id) or compile_plugin(
+            id, {}
+        )
+        self.app_statuses: Mapping[str, PluginStatus] = self.config.statuses.apps
+        self.time_policy: TimePolicy = self.config.statuses.time
+        # Snapshot fields this plugin reads in gather_context().
+        self.fields: set[str] = set()
+        # Current time.time(); replays set it to the recorded tick times.
+        self.clock: Callable[[], float] = time.time
+
+    def config_key(self, config: Config) -> tuple:
+        """
+        The parts of the compiled config this plugin is built from. When
+        settings are reloaded, the plugin is only rebuilt if they changed.
+        Default behavior: its own section, the per-app statuses and the time
+        policy.
+        """
+        return (
+            config.statuses.plugins.get(self.id),
+            config.statuses.apps,
+            config.statuses.time,
+        )
 
-    def get_context(self, global_context: PluginContext) -> PluginContext:
+    def get_context(
+        self, global_context: PluginContext, snapshot: Snapshot
+    ) -> PluginContext:
         """
         Flatten context: include all global keys starting with '_' plus all keys
         returned by the plugin's gather_context().
         """
         flat_context = {k: v for k, v in global_context.items() if k.startswith("_")}
-        flat_context.update(self.gather_context())
+        flat_context.update(self.gather_context(snapshot))
         return flat_context
 
+    def prefilter(self, global_context: PluginContext) -> bool:
+        """
+        Cheap first phase, run before any context is gathered. Sees only the
+        global '_' keys. Return False when this plugin cannot match, so its
+        snapshot fields are not collected and it costs nothing this tick.
+        """
+        return True
+
     def supports(self, context: PluginContext) -> bool:
         """
         Return True if this plugin should be active.
@@ -37,35 +73,48 @@ class Plugin(ABC):
         """
         pass
 
-    def gather_context(self) -> PluginContext:
+    def next_change(self, context: PluginContext) -> float | None:
+        """
+        Return the time.time() instant at which build_status() would next
+        return something different for the same context, or None if its
+        output only changes with the context. Default behavior: the next
+        change of the time shown by _time().
+        """
+        return self._next_time_change()
+
+    def gather_context(self, snapshot: Snapshot) -> PluginContext:
         """
-        Retrieve plugin-specific context.
-        Override this method if your plugin needs extra data.
+        Retrieve plugin-specific context from this tick's snapshot.
+        Override this method if your plugin needs extra data, and list the
+        snapshot fields it reads in self.fields.
         """
         return {}
 
     def _time(self) -> str:
-        tformat = self.settings["statuses"].get("time_format", DEFAULT_TIME_FORMAT)
-        return (
-            datetime.now().strftime(tformat)
-            if self.settings["statuses"].get("show_time")
-            else ""
-        )
+        return self.time_policy.render(self.clock())
+
+    def _next_time_change(self) -> float | None:
+        """
+        Return when the time shown by _time() next changes: the next second,
+        minute, hour or day boundary, depending on the finest unit in the
+        time format.
+        """
+        return self.time_policy.next_change(self.clock())
 
     def _sep(self) -> str:
-        return (
-            self.settings["statuses"].get("separator", DEFAULT_SEPARATOR)
-            if self.settings["statuses"].get("show_time")
-            else ""
-        )
+        return self.time_policy.separator
 
-    def _status(self, app_name: str) -> list[str]:
+    def _degraded_status(self, app_name: str) -> PluginStatus:
+        """
+        Return the app's default status, for use while its probes are skipped
+        because its circuit breaker is open.
         """
-        Return the default [emoji, text, type] for a given app from the apps config,
+        emoji, text, status_type = self._status(app_name)
+        return (emoji, f"{text}{self._sep()}{self._time()}", status_type)
+
+    def _status(self, app_name: str) -> PluginStatus:
+        """
+        Return the default (emoji, text, type) for a given app from the apps config,
         falling back to defaults if not found.
         """
-        emoji, text, *maybe_type = self.app_statuses.get(
-            app_name, [FB_ICON(), f"{app_name}", "online"]
-        )
-        status_type = maybe_type[0] if maybe_type else "online"
-        return [emoji, text, status_type]
+        return self.config.statuses.app_status(app_name)
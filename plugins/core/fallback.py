@@ -1,15 +1,17 @@
 from plugins.base import Plugin
+from utils.config import Config
 from utils.types import PluginID, PluginStatus, PluginContext, PluginSettings
-from utils.constants import FB_ICON, FB_TEXT
 
 
 class FallbackPlugin(Plugin):
 
-    def __init__(self, settings: PluginSettings) -> None:
-        super().__init__(PluginID("fallback"), settings)
-        self.default_emoji, self.default_text = settings["statuses"].get(
-            "default", [FB_ICON(), FB_TEXT()]
-        )
+    def __init__(self, settings: PluginSettings, config: Config | None = None) -> None:
+        super().__init__(PluginID("fallback"), settings, config)
+        emoji, text, _ = self.config.statuses.default
+        self.default_status: PluginStatus = (emoji, text, "online")
+
+    def config_key(self, config: Config) -> tuple:
+        return (*super().config_key(config), config.statuses.default)
 
     def supports(self, context: PluginContext) -> bool:
         """
@@ -29,14 +31,10 @@ class FallbackPlugin(Plugin):
 
     def _get_app_status(self, context: dict) -> tuple[str, str, str]:
         """
-        Return [emoji, text, status_type] from the app config
+        Return (emoji, text, status_type) from the app config
         or fallback to the default if no specific app config is found.
         """
-        emoji, text, *maybe_type = self.settings["statuses"]["apps"].get(
-            context["_name"], [self.default_emoji, self.default_text, "online"]
-        )
-        type = maybe_type[0] if maybe_type else "online"
-        return emoji, text, type
+        return self.app_statuses.get(context["_name"], self.default_status)
 
     def _format_status(
         self, emoji: str, text: str, status_type: str
@@ -1,16 +1,24 @@
 from math import floor
 from plugins.base import Plugin
+from utils.config import Config
+from utils.templates import Template
 from utils.types import PluginID, PluginStatus, PluginContext, PluginSettings
 
 class IdlePlugin(Plugin):
-    def __init__(self, settings: PluginSettings) -> None:
-        super().__init__(PluginID("idle"), settings)
+    def __init__(self, settings: PluginSettings, config: Config | None = None) -> None:
+        super().__init__(PluginID("idle"), settings, config)
 
-        self.idle_conf = settings["statuses"].get("idle", {})
+        self.idle_conf = self.config.statuses.idle
 
-        self.emoji, self.text = self.idle_conf.get("status", ["😴", "Away"])
-        self.timeout = self.idle_conf.get("timeout", 5) * 60
-        self.display_mode = self.idle_conf.get("display", "elapsed")
+        self.emoji, self.text = self.idle_conf.status
+        self.timeout = self.idle_conf.timeout
+        self.template: Template = self.idle_conf.template
+
+    def config_key(self, config: Config) -> tuple:
+        return (config.statuses.idle, config.statuses.time)
+
+    def prefilter(self, global_context: PluginContext) -> bool:
+        return self.supports(global_context)
 
     def supports(self, context: PluginContext) -> bool:
         """
@@ -23,14 +31,22 @@ class IdlePlugin(Plugin):
         Build an idle status using self.emoji, self.text, etc.
         """
 
-        # Use the shared time & separator helpers
-        current_time = self._time()
-        sep = self._sep()
-        idle_minutes = floor(context["_idle"] / 60)
-
-        if self.display_mode == "elapsed":
-            status_text = f"{self.text} ({idle_minutes}m){sep}{current_time}"
-        else:  # e.g. "normal"
-            status_text = f"{self.text}{sep}{current_time}"
-
+        status_text = self.template.render(
+            {
+                "text": lambda: self.text,
+                "minutes": lambda: floor(context["_idle"] / 60),
+                "sep": self._sep,
+                "time": self._time,
+            }
+        )
         return (self.emoji, status_text, "idle")
+
+    def next_change(self, context: PluginContext) -> float | None:
+        """
+        Besides the shown time, the elapsed minutes change every time the
+        idle time reaches another full minute.
+        """
+        changes = [super().next_change(context) if self.template.uses("time") else None]
+        if self.template.uses("minutes"):
+            changes.append(self.clock() + 60 - context["_idle"] % 60)
+        return min((change for change in changes if change is not None), default=None)
@@ -1,69 +1,94 @@
 from plugins.base import Plugin
+from utils.config import BrowserConfig, Config
 from utils.types import PluginID, PluginStatus, PluginContext, PluginSettings
 from utils.plugins import PluginHelpers
+from utils.templates import DISPLAY_TEMPLATES, Template
 
 from urllib.parse import urlparse
-from utils.ascript import arc_tab_url, arc_tab_title, running
+from utils.snapshot import ARC_TITLE, ARC_URL, PROCESSES, Snapshot
 
 
 class BrowserPlugin(Plugin):
-    def __init__(self, settings: PluginSettings):
-        super().__init__(PluginID("browser"), settings)
+    pcfg: BrowserConfig
+
+    def __init__(self, settings: PluginSettings, config: Config | None = None):
+        super().__init__(PluginID("browser"), settings, config)
+        self.template: Template = self.pcfg.template
+        # Shown when the tab has no title or URL for the template
+        self.app_template: Template = Template(DISPLAY_TEMPLATES["browser"]["none"])
+        self.uses_url: bool = self.template.uses("url") or self.template.uses("domain")
+
+        # Only probe the tab's title and URL if something shows them
+        if "company.thebrowser.browser" in self.pcfg.app_set:
+            self.fields.add(PROCESSES)
+            if self.pcfg.use_special or self.uses_url:
+                self.fields.add(ARC_URL)
+            if self.template.uses("title"):
+                self.fields.add(ARC_TITLE)
+
+    def prefilter(self, global_context: PluginContext) -> bool:
+        return self.supports(global_context)
 
     def supports(self, context: PluginContext) -> bool:
-        return context["_name"] in self.pcfg.get("apps", [""])
+        return context["_name"] in self.pcfg.app_set
 
-    def gather_context(self) -> PluginContext:
-        apps = self.pcfg.get("apps", [])
+    def gather_context(self, snapshot: Snapshot) -> PluginContext:
+        apps = self.pcfg.apps
         mapping = {
             "company.thebrowser.browser": (
-                lambda: running("company.thebrowser.browser"),
-                lambda: self._build_browser_context(),
+                lambda: snapshot.running("company.thebrowser.browser"),
+                lambda: self._build_browser_context(snapshot),
             )
         }
         return PluginHelpers.gather_context(apps, mapping)
 
-    def _build_browser_context(self) -> PluginContext:
-        return {"url": arc_tab_url(), "title": arc_tab_title()}
+    def _build_browser_context(self, snapshot: Snapshot) -> PluginContext:
+        return {
+            "url": snapshot.arc_url,
+            "title": snapshot.arc_title,
+            "degraded": snapshot.is_degraded("company.thebrowser.browser"),
+        }
 
     def build_status(self, context: PluginContext) -> PluginStatus:
-        sep = self._sep()
-        current_time = self._time()
         app_name = context["_name"]
+        if context.get(app_name, {}).get("degraded"):
+            return self._degraded_status(app_name)
         emoji, default_text, default_type = self._status(app_name)
 
-        prefix_text = f"{default_text} " if self.pcfg.get("prefix", True) else ""
+        prefix_text = f"{default_text} " if self.pcfg.prefix else ""
 
         data = PluginHelpers.prioritize_context(
-            context, self.pcfg.get("apps", []), ["url", "title"]
+            context, self.pcfg.apps, ["url", "title"]
         )
         url = data.get("url", "")
         title = data.get("title", "")
 
-        # Special handling for known domains
-        if url and self.pcfg.get("use_special", True):
-            parsed = urlparse(url)
-            domain = parsed.netloc.lower().removeprefix("www.")
-            special_urls = self.pcfg.get("special_statuses", {})
-            if domain in special_urls:
-                sp_emoji, sp_text, *maybe_type = special_urls[domain]
-                sp_type = maybe_type[0] if maybe_type else "online"
+        # Special handling for known websites
+        if url and self.pcfg.use_special:
+            special = self.pcfg.rules.match(url)
+            if special is not None:
+                sp_emoji, sp_text, sp_type = special
                 return (
                     sp_emoji,
                     PluginHelpers.format_status(
-                        prefix_text, sp_text, sep, current_time
+                        prefix_text, sp_text, self._sep(), self._time()
                     ),
                     sp_type,
                 )
 
-        # Fallback to display title or URL
-        if self.pcfg.get("display", "none") == "title" and title:
-            text = PluginHelpers.format_status(prefix_text, title, sep, current_time)
-        elif self.pcfg.get("display", "none") == "url" and url:
-            parsed = urlparse(url)
-            domain = parsed.netloc.lower().removeprefix("www.")
-            text = PluginHelpers.format_status(prefix_text, domain, sep, current_time)
-        else:
-            text = PluginHelpers.format_status(default_text, "", sep, current_time)
-
+        # Fall back to the template, or to the app if the tab has nothing to show
+        template = self.template
+        if (template.uses("title") and not title) or (self.uses_url and not url):
+            template = self.app_template
+        text = template.render(
+            {
+                "app": lambda: default_text,
+                "prefix": lambda: prefix_text,
+                "title": lambda: title,
+                "url": lambda: url,
+                "domain": lambda: urlparse(url).netloc.lower().removeprefix("www."),
+                "sep": self._sep,
+                "time": self._time,
+            }
+        )
         return (emoji, text, default_type)
@@ -1,18 +1,43 @@
 from plugins.base import Plugin
+from utils.config import Config, MusicConfig
 from utils.types import PluginID, PluginStatus, PluginContext, PluginSettings
 from utils.plugins import PluginHelpers
+from utils.templates import Template
 
-from utils.ascript import (
-    spotify_track,
-    apple_music_track,
-    running,
-)
+from utils.snapshot import PROCESSES, TRACK_APPS, Snapshot, track_field
+
+# Value of the context "source" key for each supported media app.
+SOURCES = {
+    "com.spotify.client": "spotify",
+    "com.apple.music": "music",
+}
 
 
 class MusicPlugin(Plugin):
-    def __init__(self, settings: PluginSettings) -> None:
-        super().__init__(PluginID("music"), settings)
-        self.display_mode: str = self.pcfg.get("display", "artist_title")
+    pcfg: MusicConfig
+
+    def __init__(self, settings: PluginSettings, config: Config | None = None) -> None:
+        super().__init__(PluginID("music"), settings, config)
+        self.template: Template = self.pcfg.template
+
+        self.fields.add(PROCESSES)
+        for app in self.pcfg.apps:
+            if app in TRACK_APPS:
+                self.fields.add(track_field(app))
+
+    def prefilter(self, global_context: PluginContext) -> bool:
+        """
+        Return False if none of the music apps can show a status: not focused
+        (when "focused" counts) and not running (when "playing" counts).
+        """
+        apps = self.pcfg.apps
+        when = self.pcfg.when
+        if when in ["focused", "both"] and global_context.get("_name", "") in self.pcfg.app_set:
+            return True
+        if when in ["playing", "both"]:
+            running = global_context.get("_running")
+            return running is None or any(app in running for app in apps)
+        return False
 
     def supports(self, context: PluginContext) -> bool:
         """
@@ -25,48 +50,49 @@ class MusicPlugin(Plugin):
         focused_check: bool = False
         playing_check: bool = False
 
-        if self.pcfg.get("when", "playing") in ["focused", "both"]:
-            focused_check = context.get("_name", "") in self.pcfg.get("apps", [])
+        if self.pcfg.when in ["focused", "both"]:
+            focused_check = context.get("_name", "") in self.pcfg.app_set
 
-        if self.pcfg.get("when", "playing") in ["playing", "both"]:
+        if self.pcfg.when in ["playing", "both"]:
             playing_check = any(
                 context.get(app, {}).get("is_playing", False)
-                for app in self.pcfg.get("apps", [])
+                for app in self.pcfg.apps
             )
 
         return focused_check or playing_check
 
-    def gather_context(self) -> PluginContext:
+    def gather_context(self, snapshot: Snapshot) -> PluginContext:
         def get_track_info(app_id: str) -> PluginContext:
-            track_info: tuple[str, str, bool] | None = None
-            source: str | None = None
-
-            if app_id == "com.spotify.client":
-                track_info = spotify_track()
-                source = "spotify"
-            elif app_id == "com.apple.music":
-                track_info = apple_music_track()
-                source = "music"
-            else:
+            if app_id not in SOURCES:
                 return {}
 
+            track_info: tuple[str, str, bool] = snapshot.track(app_id)
+            source: str = SOURCES[app_id]
+
             return {
                 "track_title": track_info[0],
                 "track_artist": track_info[1],
                 "is_playing": track_info[2],
                 "source": source,
+                "degraded": snapshot.is_degraded(app_id),
             }
 
-        apps = self.pcfg.get("apps", [])
+        apps = self.pcfg.apps
         return PluginHelpers.gather_context(
             apps,
-            {app: (lambda: running(app), lambda: get_track_info(app)) for app in apps},
+            {
+                app: (
+                    lambda app=app: snapshot.running(app),
+                    lambda app=app: get_track_info(app),
+                )
+                for app in apps
+            },
         )
 
     def build_status(self, context: PluginContext) -> PluginStatus:
         # Look for a running track
         playing_data, playing_app = None, None
-        for app in self.pcfg.get("apps", []):
+        for app in self.pcfg.apps:
             data = context.get(app, {})
             if data.get("is_playing", False):
                 playing_data = data
@@ -74,45 +100,36 @@ class MusicPlugin(Plugin):
                 break
 
         if not playing_data:
+            # A focused app we can't ask about shouldn't claim to be paused
+            app_name = context.get("_name", "")
+            if context.get(app_name, {}).get("degraded"):
+                return self._degraded_status(app_name)
             return self._build_paused()
 
-        # Clean up track title and get artist name
-        title = (
-            PluginHelpers.clean(playing_data.get("track_title", ""))
-            if self.pcfg.get("remove_extras", True)
-            else playing_data.get("track_title", "")
-        )
-        artist = playing_data.get("track_artist", "")
-
         emoji, default_text, default_type = self._status(playing_app)
-        formatted_text = self._format_text(default_text, title, artist)
+        formatted_text = self._format_text(default_text, playing_data)
         return (emoji, formatted_text, default_type)
 
     def _build_paused(self) -> PluginStatus:
-        emoji, text, type_ = self._status(self.pcfg.get("apps", [""])[0])
+        emoji, text, type_ = self._status(self.pcfg.apps[0] if self.pcfg.apps else "")
         sep = self._sep()
         current_time = self._time()
-        text = f"{text + ' ' if self.pcfg.get('prefix', True) else ''}paused{sep}{current_time}"
+        text = f"{text + ' ' if self.pcfg.prefix else ''}paused{sep}{current_time}"
         return (emoji, text, type_)
 
-    def _format_text(self, prefix_text: str, title: str, artist: str) -> str:
-        prefix_str = prefix_text + " to " if self.pcfg.get("prefix", True) else ""
-        sep = self._sep()
-        current_time = self._time()
-        if self.display_mode == "title":
-            return PluginHelpers.format_status(
-                prefix_str, title or "[no title]", sep, current_time
-            )
-        elif self.display_mode == "artist":
-            return PluginHelpers.format_status(
-                prefix_str, artist or "[no artist]", sep, current_time
-            )
-        elif self.display_mode == "both":
-            return PluginHelpers.format_status(
-                prefix_str,
-                f"{title or '[no title]'} by {artist or '[no artist]'}",
-                sep,
-                current_time,
-            )
-        else:
-            return f"{prefix_text}{current_time}"
+    def _format_text(self, app_text: str, data: dict) -> str:
+        return self.template.render(
+            {
+                "app": lambda: app_text,
+                "prefix": lambda: f"{app_text} to " if self.pcfg.prefix else "",
+                "title": lambda: self._title(data) or "[no title]",
+                "artist": lambda: data.get("track_artist", "") or "[no artist]",
+                "sep": self._sep,
+                "time": self._time,
+            }
+        )
+
+    def _title(self, data: dict) -> str:
+        """The track title, without extras in brackets if remove_extras is set."""
+        title = data.get("track_title", "")
+        return PluginHelpers.clean(title) if self.pcfg.remove_extras else title
@@ -0,0 +1,46 @@
+from plugins.base import Plugin
+from utils.config import Config, RulesConfig
+from utils.rules import URL_APPS
+from utils.types import PluginID, PluginStatus, PluginContext, PluginSettings
+from utils.plugins import PluginHelpers
+
+from utils.snapshot import ARC_URL, FRONTMOST_TITLE, Snapshot
+
+
+class RulesPlugin(Plugin):
+    pcfg: RulesConfig
+
+    def __init__(self, settings: PluginSettings, config: Config | None = None):
+        super().__init__(PluginID("rules"), settings, config)
+        self.fields.add(FRONTMOST_TITLE)
+        if any(self.pcfg.rules.uses_url(app) for app in URL_APPS):
+            self.fields.add(ARC_URL)
+
+    def prefilter(self, global_context: PluginContext) -> bool:
+        return global_context["_name"] in self.pcfg.rules.apps
+
+    def get_context(
+        self, global_context: PluginContext, snapshot: Snapshot
+    ) -> PluginContext:
+        """Match the rules while the snapshot is at hand; supports() only checks the result."""
+        context = super().get_context(global_context, snapshot)
+        # The URL is that of Arc's active tab; other apps' rules only see their title
+        url = context["url"] if context["_name"] in URL_APPS else ""
+        context["status"] = self.pcfg.rules.match(context["_name"], context["title"], url)
+        return context
+
+    def gather_context(self, snapshot: Snapshot) -> PluginContext:
+        return {"title": snapshot.frontmost_title, "url": snapshot.arc_url}
+
+    def supports(self, context: PluginContext) -> bool:
+        return context.get("status") is not None
+
+    def build_status(self, context: PluginContext) -> PluginStatus:
+        emoji, text, status_type = context["status"]
+        _, default_text, _ = self._status(context["_name"])
+        prefix_text = f"{default_text} " if self.pcfg.prefix else ""
+        return (
+            emoji,
+            PluginHelpers.format_status(prefix_text, text, self._sep(), self._time()),
+            status_type,
+        )
@@ -1,44 +1,104 @@
+import time
+from collections.abc import Awaitable, Callable, Iterable
 from typing import NewType
 
-from .core.fallback import FallbackPlugin
-from .core.idle import IdlePlugin
-
-from .extra.browser import BrowserPlugin
-from .extra.code import CodePlugin
-from .extra.music import MusicPlugin
-
 from .base import Plugin
+from .registry import PluginRegistry
 
+from utils.config import Config, compile_config
 from utils.types import PluginContext, PluginStatus, PluginSettings
-from utils.constants import FB_ICON, FB_TEXT, l
+from utils.constants import l
+from utils.metrics import metrics
+from utils.snapshot import Snapshot, polled, take_snapshot
 
 PluginID = NewType("PluginID", str)
 
-PLUGINS: dict[PluginID, Plugin] = {
-    PluginID("idle"): IdlePlugin,
-    PluginID("fallback"): FallbackPlugin,
-    PluginID("music"): MusicPlugin,
-    PluginID("browser"): BrowserPlugin,
-    PluginID("code"): CodePlugin,
-}
+# Seconds each plugin spends per stage (gather_context, supports, build_status).
+PLUGIN_SECONDS = "mark_plugin_seconds"
+
+# Plugin classes by ID; only the plugins that are enabled get imported.
+PLUGINS = PluginRegistry()
 
 
 
 class PluginManager:
-    def __init__(self, settings: PluginSettings, debug: bool = False):
+    def __init__(
+        self,
+        settings: PluginSettings,
+        debug: bool = False,
+        collect: Callable[[Iterable[str]], Snapshot] = take_snapshot,
+        clock: Callable[[], float] = time.time,
+        config: Config | None = None,
+    ):
         self.settings: PluginSettings = settings
+        # Compiled settings, shared by all plugins.
+        self.config: Config = config or compile_config(settings)
         self.debug: bool = debug
+        # Takes the snapshot of the fields needed this tick.
+        self.collect: Callable[[Iterable[str]], Snapshot] = collect
+        # Current time.time() for all plugins.
+        self.clock: Callable[[], float] = clock
+
+        self.plugins: list[Plugin] = self._build(settings, self.config, {})
+        # ID of the plugin that produced the last status; None for the default.
+        self.matched: PluginID | None = None
+        self._matched_plugin: Plugin | None = None
+        self._matched_context: PluginContext = {}
 
+        # Snapshot fields any enabled plugin may need.
+        self.fields: frozenset[str] = self._fields(self.plugins)
+
+        if self.debug:
+            PLUGINS.log_import_times()
+
+    def reconfigure(self, settings: PluginSettings, config: Config) -> list[PluginID]:
+        """
+        Switch to new settings. Only plugins whose part of the config changed
+        (or that were just enabled) are built again; the others are kept.
+        Returns the IDs of the plugins that were built.
+        """
+        current = {plugin.id: plugin for plugin in self.plugins}
+        plugins = self._build(settings, config, current)
+        rebuilt = [plugin.id for plugin in plugins if current.get(plugin.id) is not plugin]
+
+        self.settings, self.config = settings, config
+        self.plugins = plugins
+        self.fields = self._fields(plugins)
+        self.matched = None
+        self._matched_plugin = None
+        self._matched_context = {}
+        return rebuilt
+
+    def _build(
+        self,
+        settings: PluginSettings,
+        config: Config,
+        current: dict[PluginID, Plugin],
+    ) -> list[Plugin]:
+        """
+        Instantiate the enabled plugins in priority order, reusing plugins
+        from current whose part of the config is unchanged.
+        """
         plugins: list[Plugin] = []
-        plugin_settings: dict = settings.get("statuses", {}).get("plugins", {})
+        plugin_settings = config.statuses.plugins
         enabled_plugins: list[PluginID] = [
-            PluginID(pid) for pid in plugin_settings.get("_enabled", [])
+            PluginID(pid) for pid in config.statuses.enabled
         ]
 
+        def make(plugin_id: PluginID, plugin_cls: type[Plugin]) -> Plugin:
+            plugin = current.get(plugin_id)
+            if plugin is not None and plugin.config_key(config) == plugin.config_key(plugin.config):
+                plugin.settings, plugin.config = settings, config
+                return plugin
+            plugin = plugin_cls(settings, config)
+            # Plugins show the time of the manager's clock (recorded times in replays).
+            plugin.clock = self.clock
+            self._log_successfully_initialized(plugin_id, len(plugins) + 1, len(enabled_plugins))
+            return plugin
+
         # Always include IdlePlugin first.
         try:
-            plugins.append(IdlePlugin(settings))
-            self._log_successfully_initialized('idle', len(plugins), len(enabled_plugins))
+            plugins.append(make(PluginID("idle"), PLUGINS[PluginID("idle")]))
         except Exception as e:
             self._log_failed_to_initialize('idle', len(plugins), len(enabled_plugins), e)
 
@@ -46,8 +106,7 @@ class PluginManager:
             try:
                 if plugin_id.strip():
                     if plugin_id in plugin_settings and plugin_id in PLUGINS:
-                        plugins.append(PLUGINS[plugin_id](settings))
-                        self._log_successfully_initialized(plugin_id, len(plugins), len(enabled_plugins))
+                        plugins.append(make(plugin_id, PLUGINS[plugin_id]))
                     elif plugin_id not in PLUGINS:
                         self._log_warning(plugin_id, len(plugins), len(enabled_plugins), "not found in library")
                     elif plugin_id not in plugin_settings:
@@ -57,17 +116,13 @@ class PluginManager:
 
         # Always add FallbackPlugin last.
         try:
-            plugins.append(FallbackPlugin(settings))
-            self._log_successfully_initialized('fallback', len(plugins), len(enabled_plugins))
+            plugins.append(make(PluginID("fallback"), PLUGINS[PluginID("fallback")]))
         except Exception as e:
             self._log_failed_to_initialize('fallback', len(plugins), len(enabled_plugins), e)
 
-
-        if debug:
+        if self.debug:
             l.debug(f"Successfully initialized {len(plugins)} plugins")
-
-
-        self.plugins: list[Plugin] = plugins
+        return plugins
 
     def _log_successfully_initialized(self, plugin_id: str, current: int, total: int):
         if self.debug:
@@ -83,27 +138,112 @@ class PluginManager:
 
     def get_status(self, context: PluginContext) -> PluginStatus:
         """
-        Iterate over plugins and for the first one that supports the current context,
-        build a flattened context (global keys and plugin-specific keys) and return its status.
+        Resolve the status in two phases. First, every plugin's prefilter()
+        sees only the global context. Then, for the first candidate that
+        supports its flattened context (global keys and plugin-specific keys),
+        return its status.
+
+        The snapshot is taken lazily, when the first candidate that declares
+        fields is reached, and covers the fields of all remaining candidates
+        in one round trip.
+        """
+        candidates = self._candidates(context)
+        snapshot = Snapshot()
+        collected = False
+
+        for index, plugin in enumerate(candidates):
+            if plugin.fields and not collected:
+                snapshot = self.collect(self._fields(candidates[index:]))
+                collected = True
+            if (status := self._match(plugin, context, snapshot)) is not None:
+                return status
+        return self._default_status()
+
+    async def get_status_async(
+        self,
+        context: PluginContext,
+        collect: Callable[[Iterable[str]], Awaitable[Snapshot]],
+    ) -> PluginStatus:
+        """
+        Same as get_status, for the asyncio engine: the snapshot is taken by
+        awaiting collect.
+        """
+        candidates = self._candidates(context)
+        snapshot = Snapshot()
+        collected = False
+
+        for index, plugin in enumerate(candidates):
+            if plugin.fields and not collected:
+                snapshot = await collect(self._fields(candidates[index:]))
+                collected = True
+            if (status := self._match(plugin, context, snapshot)) is not None:
+                return status
+        return self._default_status()
+
+    def _candidates(self, context: PluginContext) -> list[Plugin]:
+        candidates = [plugin for plugin in self.plugins if plugin.prefilter(context)]
+        if self.debug:
+            l.debug(
+                "Candidate plugins:",
+                [plugin.__class__.__name__ for plugin in candidates],
+            )
+        return candidates
+
+    def _fields(self, plugins: list[Plugin]) -> frozenset[str]:
+        return frozenset().union(*(plugin.fields for plugin in plugins))
+
+    def _match(
+        self, plugin: Plugin, context: PluginContext, snapshot: Snapshot
+    ) -> PluginStatus | None:
+        with metrics.time(PLUGIN_SECONDS, plugin=plugin.id, stage="gather_context"):
+            flat_context = plugin.get_context(context, snapshot)
+        if self.debug:
+            l.debug(
+                f"Checking plugin {plugin.__class__.__name__} with context:",
+                flat_context,
+            )
+        with metrics.time(PLUGIN_SECONDS, plugin=plugin.id, stage="supports"):
+            supported = plugin.supports(flat_context)
+        if not supported:
+            return None
+        with metrics.time(PLUGIN_SECONDS, plugin=plugin.id, stage="build_status"):
+            status = plugin.build_status(flat_context)
+        self.matched = plugin.id
+        self._matched_plugin, self._matched_context = plugin, flat_context
+        if self.debug:
+            l.success(
+                f"Plugin {plugin.__class__.__name__} matched. Returning status:",
+                status,
+            )
+        return status
+
+    def next_change(self) -> float | None:
         """
-        for plugin in self.plugins:
-            flat_context = plugin.get_context(context)
+        The time.time() instant at which the last status would change by
+        itself (e.g. the shown time), or None.
+        """
+        if self._matched_plugin is None:
+            return None
+        try:
+            return self._matched_plugin.next_change(self._matched_context)
+        except Exception as e:
             if self.debug:
-                l.debug(
-                    f"Checking plugin {plugin.__class__.__name__} with context:",
-                    flat_context,
-                )
-            if plugin.supports(flat_context):
-                if self.debug:
-                    l.success(
-                        f"Plugin {plugin.__class__.__name__} matched. Returning status:",
-                        plugin.build_status(flat_context),
-                    )
-                return plugin.build_status(flat_context)
-        emoji, text, *maybe_type = self.settings["statuses"].get(
-            "default", [FB_ICON(), FB_TEXT(), "online"]
-        )
+                l.error(f"Plugin {self.matched} failed to report its next change: {e}")
+            return None
+
+    def watching(self) -> bool:
+        """
+        True if the last status came from a plugin that reads fields no event
+        reports a change of (window titles, tab URLs), so it goes stale unless
+        sampled again soon.
+        """
+        if self._matched_plugin is None:
+            return False
+        return any(polled(name) for name in self._matched_plugin.fields)
+
+    def _default_status(self) -> PluginStatus:
+        self.matched = None
+        self._matched_plugin = None
         if self.debug:
             l.debug("No plugin matched context. Using default status.")
-        status_type = maybe_type[0] if maybe_type else "online"
-        return emoji, text, status_type
+        return self.config.statuses.default
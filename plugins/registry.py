@@ -0,0 +1,102 @@
+import importlib
+import time
+from importlib.metadata import EntryPoint, entry_points
+
+from utils.constants import l
+from utils.types import PluginID
+
+# Entry point group other packages register plugins under, e.g. in pyproject.toml:
+#   [project.entry-points."mark.plugins"]
+#   weather = "mark_weather:WeatherPlugin"
+ENTRY_POINT_GROUP = "mark.plugins"
+
+# Built-in plugins, by ID, as "module:class".
+BUILTIN_PLUGINS: dict[PluginID, str] = {
+    PluginID("idle"): "plugins.core.idle:IdlePlugin",
+    PluginID("fallback"): "plugins.core.fallback:FallbackPlugin",
+    PluginID("music"): "plugins.extra.music:MusicPlugin",
+    PluginID("browser"): "plugins.extra.browser:BrowserPlugin",
+    PluginID("code"): "plugins.extra.code:CodePlugin",
+    PluginID("rules"): "plugins.extra.rules:RulesPlugin",
+}
+
+
+class PluginRegistry:
+    """
+    Plugin classes by ID, imported the first time they are asked for, so
+    only enabled plugins cost anything at startup. Besides the built-in
+    plugins, plugins installed by other packages are found through the
+    ENTRY_POINT_GROUP entry points, which are only read when an ID that
+    isn't built in is looked up.
+
+    Behaves like a read-only dict of plugin classes: `pid in registry`
+    doesn't import anything, `registry[pid]` imports the plugin.
+    """
+
+    def __init__(
+        self,
+        builtin: dict[PluginID, str] = BUILTIN_PLUGINS,
+        group: str = ENTRY_POINT_GROUP,
+    ):
+        self.builtin: dict[PluginID, str] = dict(builtin)
+        self.group: str = group
+        self._external: dict[PluginID, EntryPoint] | None = None
+        self._classes: dict[PluginID, type] = {}
+        # Seconds each plugin took to import, by ID, in import order.
+        self.import_times: dict[PluginID, float] = {}
+
+    def __contains__(self, plugin_id: object) -> bool:
+        return plugin_id in self.builtin or plugin_id in self._entry_points()
+
+    def __getitem__(self, plugin_id: PluginID) -> type:
+        """The plugin class. Raises KeyError if unknown, ImportError if it fails to import."""
+        cls = self._classes.get(plugin_id)
+        if cls is not None:
+            return cls
+
+        start = time.perf_counter()
+        if plugin_id in self.builtin:
+            module, _, name = self.builtin[plugin_id].partition(":")
+            cls = getattr(importlib.import_module(module), name)
+        elif plugin_id in self._entry_points():
+            try:
+                cls = self._entry_points()[plugin_id].load()
+            except Exception as e:
+                raise ImportError(f"plugin {plugin_id!r} failed to load: {e}") from e
+        else:
+            raise KeyError(plugin_id)
+        self.import_times[plugin_id] = time.perf_counter() - start
+        self._classes[plugin_id] = cls
+        return cls
+
+    def ids(self) -> list[PluginID]:
+        """IDs of every available plugin, built-in first."""
+        return [*self.builtin, *(pid for pid in self._entry_points() if pid not in self.builtin)]
+
+    def source(self, plugin_id: PluginID) -> str:
+        """Where a plugin comes from: "built-in", or the package providing it."""
+        if plugin_id in self.builtin:
+            return "built-in"
+        entry_point = self._entry_points()[plugin_id]
+        return entry_point.dist.name if entry_point.dist else entry_point.value
+
+    def log_import_times(self):
+        """Log how long each plugin imported so far took to import."""
+        for plugin_id, seconds in self.import_times.items():
+            l.debug(
+                f"Plugin \033[0;36m{plugin_id.upper()}\033[0m ({self.source(plugin_id)}) imported in {seconds * 1000:.1f}ms"
+            )
+        if self.import_times:
+            l.debug(f"Plugins imported in {sum(self.import_times.values()) * 1000:.1f}ms")
+
+    def _entry_points(self) -> dict[PluginID, EntryPoint]:
+        if self._external is None:
+            self._external = {}
+            for entry_point in entry_points(group=self.group):
+                if entry_point.name in self.builtin:
+                    l.warning(
+                        f"Plugin {entry_point.name} from {entry_point.value} is ignored: a built-in plugin has that ID"
+                    )
+                    continue
+                self._external.setdefault(PluginID(entry_point.name), entry_point)
+        return self._external
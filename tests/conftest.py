@@ -0,0 +1,6 @@
+# Tests import the repo's modules the way mark.py does, from the repo root.
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,27 @@
+# Stand-in for the osascript script host, speaking the same protocol (see
+# utils.host.ScriptHost). A script is "<seconds> <result>": the host waits
+# that long, then answers with the result.
+
+import json
+import sys
+import time
+
+
+def main():
+    compiled: dict[str, str] = {}
+    for line in sys.stdin:
+        request = json.loads(line)
+        if "script" in request:
+            compiled[request["key"]] = request["script"]
+        script = compiled.get(request["key"])
+        if script is None:
+            response = {"id": request["id"], "ok": False, "error": "unknown script"}
+        else:
+            seconds, _, result = script.partition(" ")
+            time.sleep(float(seconds))
+            response = {"id": request["id"], "ok": True, "result": result}
+        print(json.dumps(response), flush=True)
+
+
+if __name__ == "__main__":
+    main()
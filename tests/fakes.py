@@ -0,0 +1,94 @@
+# Fake platform backends for the tests, so they run off macOS.
+#
+# install() registers stand-ins for the Cocoa bindings and for utils.system
+# in sys.modules. Call it before importing mark.py.
+
+import sys
+import time
+import types
+
+from utils.apps import AppEventSource, AppInfo
+from utils.events import EventSource
+from utils.snapshot import RECORD_SEP, UNIT_SEP
+
+RUNNING = [
+    "company.thebrowser.browser",
+    "com.microsoft.vscode",
+    "com.apple.finder",
+]
+
+URL = "https://github.com/domenicurso/mark/pulls"
+TITLE = "mark.py — mark"
+TRACK = f"Weightless{UNIT_SEP}Marconi Union"
+
+
+class FakeState:
+    """What the fake system reports; tests change it as they go."""
+
+    frontmost: str = "com.apple.finder"
+    idle: float = 0.0
+    running: list[str] = RUNNING
+
+
+class FakeAppSource(AppEventSource):
+    def list(self) -> list[AppInfo]:
+        return [
+            AppInfo(bundle, pid, bundle.rsplit(".", 1)[-1])
+            for pid, bundle in enumerate(FakeState.running, start=100)
+        ]
+
+
+class FakeEventSource(EventSource):
+    pass
+
+
+class FakeHost:
+    """Script host that answers snapshot scripts with canned values."""
+
+    spawns: int = 1
+
+    def run(self, script: str, timeout: float | None = None) -> str:
+        values = []
+        for fragment in script.split("set end of out to v")[:-1]:
+            if "URL of active tab" in fragment:
+                values.append(URL)
+            elif "current track" in fragment:
+                values.append(TRACK)
+            elif "first process whose frontmost" in fragment and "AXTitle" not in fragment:
+                values.append(FakeState.frontmost)
+            else:
+                values.append(TITLE)
+        return RECORD_SEP.join(values)
+
+    def close(self):
+        pass
+
+
+def _module(name: str, **attrs) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    return module
+
+
+def install():
+    """Register the fake backends in sys.modules."""
+
+    class NotificationCenter:
+        def addObserver_selector_name_object_(self, *args):
+            pass
+
+    class NSWorkspace:
+        @staticmethod
+        def sharedWorkspace():
+            return types.SimpleNamespace(notificationCenter=NotificationCenter)
+
+    sys.modules.setdefault("Cocoa", _module("Cocoa", NSLog=print, NSWorkspace=NSWorkspace))
+    sys.modules["utils.system"] = _module(
+        "utils.system",
+        WorkspaceAppSource=FakeAppSource,
+        WorkspaceEventSource=FakeEventSource,
+        frontmost_bundle=lambda: FakeState.frontmost,
+        get_frontmost_bundle=lambda: FakeState.frontmost,
+        get_idle_time=lambda: FakeState.idle,
+        pump=time.sleep,
+    )
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import os
+import signal
+import sys
+from pathlib import Path
+
+import pytest
+
+import fakes
+from fakes import FakeHost
+from tools.discord_stub import DiscordStub
+from utils.breaker import BreakerBoard
+from utils.dispatcher import AsyncStatusDispatcher
+from utils.host import AsyncScriptHost, ScriptTimeout
+from utils.probes import AsyncProbeRunner
+from utils.ratelimit import RateLimiter
+from utils.snapshot import ARC_URL, DEGRADED, FRESH, VSCODE_TITLE, take_snapshot_async
+from utils.transport import AsyncDiscordTransport
+
+fakes.install()
+
+import mark  # noqa: E402
+from mark import DiscordStatusManager, MarkApp  # noqa: E402
+
+FAKE_HOST = [sys.executable, str(Path(__file__).resolve().parent / "fake_host.py")]
+SETTINGS = {"statuses": {"default": ["🌞", "Existing"]}}
+
+
+@pytest.fixture
+def stub():
+    stub = DiscordStub().start()
+    yield stub
+    stub.stop()
+
+
+def sent_texts(stub: DiscordStub) -> list[str]:
+    return [json.loads(body)["custom_status"]["text"] for _, _, body in stub.requests]
+
+
+def status_manager(stub: DiscordStub, **transport) -> DiscordStatusManager:
+    return DiscordStatusManager(
+        SETTINGS,
+        "token",
+        transport=AsyncDiscordTransport("token", base_url=stub.url, **transport),
+        limiter=RateLimiter(min_interval=0.1),
+    )
+
+
+class HangingArcHost(FakeHost):
+    """Answers like FakeHost, except that Arc never answers before the deadline."""
+
+    async def wait_closed(self):
+        pass
+
+    async def run(self, script: str, timeout: float | None = None) -> str:
+        if "URL of active tab" in script:
+            await asyncio.sleep(timeout)
+            raise ScriptTimeout(f"Script did not finish within {timeout:.2f}s")
+        return FakeHost.run(self, script, timeout)
+
+
+def test_host_respawns_after_timeout():
+    async def main():
+        host = AsyncScriptHost(FAKE_HOST)
+        try:
+            assert await host.run("0 ready", timeout=5) == "ready"
+            with pytest.raises(ScriptTimeout):
+                await host.run("10 hung", timeout=0.2)
+            # The stuck host was killed; the next probe gets a new one
+            assert await host.run("0 again", timeout=5) == "again"
+            assert host.spawns == 2
+        finally:
+            host.close()
+            await host.wait_closed()
+
+    asyncio.run(main())
+
+
+def test_breaker_degrades_app_that_keeps_timing_out():
+    async def main():
+        runner = AsyncProbeRunner(workers=2, timeout=0.1, host_factory=HangingArcHost)
+        breakers = BreakerBoard(threshold=2, delay=60)
+        states = []
+        for _ in range(3):
+            snapshot = await take_snapshot_async(
+                [ARC_URL, VSCODE_TITLE], runner=runner, breakers=breakers
+            )
+            states.append((snapshot.state(ARC_URL), snapshot.state(VSCODE_TITLE)))
+        return states, breakers
+
+    states, breakers = asyncio.run(main())
+    # Two timeouts open Arc's breaker, so the third tick skips it at once,
+    # and VS Code is answered every time
+    assert states[2] == (DEGRADED, FRESH)
+    assert all(vscode == FRESH for _, vscode in states)
+    assert set(breakers.describe()) == {"company.thebrowser.browser"}
+
+
+def test_rate_limited_update_is_retried_after_retry_after():
+    stub = DiscordStub(limit=1, window=1).start()
+
+    async def main():
+        manager = status_manager(stub)
+        # Someone else used up the bucket, so Mark's first update gets a 429
+        await manager.transport.patch_settings({"custom_status": {"text": "elsewhere"}})
+        dispatcher = AsyncStatusDispatcher(manager, retry=0.05).start()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            assert await dispatcher.wait(dispatcher.post(("💻", "Coding", "online")), timeout=5)
+        finally:
+            dispatcher.stop()
+            await manager.transport.close()
+        return loop.time() - start, manager
+
+    try:
+        elapsed, manager = asyncio.run(main())
+    finally:
+        stub.stop()
+    assert stub.throttled == 1
+    assert sent_texts(stub) == ["elsewhere", "Coding", "Coding"]
+    # The retry waited out the Retry-After instead of hammering the API
+    assert elapsed >= 0.5
+    assert manager.last_status == ("💻", "Coding", "online")
+    # One keep-alive connection for every request
+    assert stub.connections == 1
+
+
+def test_dispatch_sends_only_the_latest_status(stub):
+    async def main():
+        manager = status_manager(stub)
+        dispatcher = AsyncStatusDispatcher(manager, interval=0.2).start()
+        try:
+            assert await dispatcher.wait(dispatcher.post(("🎵", "First", "online")), timeout=5)
+            # Held back by the update interval; each post replaces the last
+            dispatcher.post(("🌐", "Second", "online"))
+            ticket = dispatcher.post(("💻", "Third", "online"))
+            assert await dispatcher.wait(ticket, timeout=5)
+        finally:
+            dispatcher.stop()
+            await manager.transport.close()
+        return dispatcher
+
+    dispatcher = asyncio.run(main())
+    assert sent_texts(stub) == ["First", "Third"]
+    assert dispatcher.superseded == 1
+    assert dispatcher.sent == 2
+
+
+def test_shutdown_resets_status_and_joins_the_loop(stub, monkeypatch):
+    monkeypatch.setenv("DISCORD_TOKEN", "token")
+    monkeypatch.setenv("DISCORD_API_URL", stub.url)
+    monkeypatch.setattr(MarkApp, "setup_shutdown_handlers", lambda self: None)
+    monkeypatch.setattr(mark, "print_logo", lambda: None)
+    monkeypatch.setattr(mark.os, "system", lambda command: 0)
+
+    app = MarkApp()
+    assert app.setup(use_asyncio=True)
+    app.probes = AsyncProbeRunner(host_factory=HangingArcHost)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.5, os.kill, os.getpid(), signal.SIGTERM)
+        # Returns instead of exiting, once the loop has stopped
+        await asyncio.wait_for(app.status_update_loop_async(), 10)
+        return asyncio.all_tasks() - {asyncio.current_task()}
+
+    leftover = asyncio.run(main())
+    assert not leftover
+    assert app.scheduler._tasks == []
+    assert app.status_manager.transport.client.is_closed
+    assert sent_texts(stub)[-1] == app.status_manager.default_status()[1]
@@ -0,0 +1,79 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from utils import ascript
+from utils.host import ScriptHost, ScriptHostError, ScriptTimeout
+
+FAKE_HOST = [sys.executable, str(Path(__file__).resolve().parent / "fake_host.py")]
+
+
+@pytest.fixture
+def host():
+    host = ScriptHost(FAKE_HOST)
+    yield host
+    host.close()
+
+
+def test_host_answers_and_reuses_compiled_scripts(host):
+    assert host.run("0 ready", timeout=5) == "ready"
+    assert host.run("0 ready", timeout=5) == "ready"
+    assert host.run("0 other", timeout=5) == "other"
+    assert host.spawns == 1
+
+
+def test_concurrent_requests_share_one_host(host):
+    results: list[str] = []
+    threads = [
+        threading.Thread(target=lambda i=i: results.append(host.run(f"0.05 r{i}", timeout=5)))
+        for i in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert sorted(results) == sorted(f"r{i}" for i in range(8))
+    assert host.spawns == 1
+
+
+def test_host_respawns_after_timeout(host):
+    assert host.run("0 ready", timeout=5) == "ready"
+    started = time.monotonic()
+    with pytest.raises(ScriptTimeout):
+        host.run("10 hung", timeout=0.2)
+    assert time.monotonic() - started < 2
+    # The stuck host was killed; the next script gets a new one
+    assert host.run("0 again", timeout=5) == "again"
+    assert host.spawns == 2
+
+
+def test_host_that_cannot_start_raises():
+    with pytest.raises(ScriptHostError):
+        ScriptHost(["/nonexistent/host"]).run("0 x", timeout=1)
+
+
+def test_default_host_is_created_once(monkeypatch):
+    created: list[ScriptHost] = []
+
+    class SlowHost(ScriptHost):
+        def __init__(self):
+            # Widen the window in which a second thread could also create one
+            time.sleep(0.05)
+            super().__init__(FAKE_HOST)
+            created.append(self)
+
+    monkeypatch.setattr(ascript, "_host", None)
+    monkeypatch.setattr(ascript, "ScriptHost", SlowHost)
+    hosts: list[ScriptHost] = []
+    threads = [threading.Thread(target=lambda: hosts.append(ascript.default_host())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(created) == 1
+    assert all(host is created[0] for host in hosts)
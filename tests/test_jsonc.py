@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+from utils import jsonc
+
+TRICKY = [
+    '{"url": "https://example.com//path", // comment "with quotes\n "b": 1}',
+    '{"a": "\\"//", "b": "a//b"}',
+    '{"a": "x, ]", "b": [1, 2,\n],\n}',
+    '{"a": "/*", "b": "*/", "c": [1, /* x, ] */ 2,]}',
+    '{"a"://comment\n 1}',
+    '[\n  "x", // ]\n  // }\n]',
+]
+
+
+@pytest.mark.parametrize("text", TRICKY)
+def test_loads_matches_the_tokenizer(text):
+    assert jsonc.loads(text) == json.loads(jsonc.strip(text))
+
+
+def test_strings_keep_comment_like_text():
+    assert jsonc.loads('{"a": "https://x//y", "b": "/* c */", "c": "\\"//"} // d') == {
+        "a": "https://x//y",
+        "b": "/* c */",
+        "c": '"//',
+    }
+
+
+def test_trailing_commas_are_dropped():
+    assert jsonc.loads('{"a": [1, 2, ], "b": {"c": 3,}, // c\n}') == {"a": [1, 2], "b": {"c": 3}}
+    assert jsonc.loads('{"a": "x,]",}') == {"a": "x,]"}
+
+
+def test_errors_point_at_the_right_line():
+    with pytest.raises(json.JSONDecodeError) as error:
+        jsonc.loads('{\n  /* a\n  b */\n  // c\n  "a": 1\n  "b": 2\n}')
+    assert error.value.lineno == 6
+
+
+def test_unterminated_block_comment_is_rejected():
+    with pytest.raises(json.JSONDecodeError, match="Unterminated comment"):
+        jsonc.loads('{"a": 1} /* open')
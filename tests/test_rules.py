@@ -0,0 +1,37 @@
+import pytest
+
+from plugins.extra.rules import RulesPlugin
+from utils.config import ConfigError, compile_config
+from utils.snapshot import Snapshot
+
+ARC = "company.thebrowser.browser"
+FINDER = "com.apple.finder"
+
+
+def settings(*rules: dict) -> dict:
+    return {"statuses": {"plugins": {"_enabled": ["rules"], "rules": {"rules": list(rules)}}}}
+
+
+def test_url_rule_for_app_without_url_is_rejected():
+    with pytest.raises(ConfigError, match="url"):
+        compile_config(settings({"app": FINDER, "url": "github", "status": ["📂", "GitHub"]}))
+
+
+def test_url_placeholder_for_app_without_url_is_rejected():
+    with pytest.raises(ConfigError, match="url"):
+        compile_config(settings({"app": FINDER, "title": "x", "status": ["📂", "{url}"]}))
+
+
+def test_rules_match_the_frontmost_apps_title_and_url():
+    plugin = RulesPlugin(
+        settings(
+            {"app": ARC, "url": "github\\.com", "status": ["🔍", "GitHub"]},
+            {"app": FINDER, "title": "^$", "status": ["📂", "Finder"]},
+        )
+    )
+    snapshot = Snapshot(frontmost_title="", arc_url="https://github.com/domenicurso/mark")
+
+    context = plugin.get_context({"_name": ARC}, snapshot)
+    assert context["status"][1] == "GitHub"
+    context = plugin.get_context({"_name": FINDER}, snapshot)
+    assert context["status"][1] == "Finder"
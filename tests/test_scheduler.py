@@ -0,0 +1,163 @@
+import threading
+import time
+
+from utils.events import FOCUS, EventBus, EventSource
+from utils.governor import SamplingGovernor
+from utils.scheduler import Scheduler
+
+STATUS = ("🌐", "Browsing", "online")
+
+# Longest acceptable time from an event to the PATCH it causes; the fallback
+# poll is far longer, so only the event can get it out this fast.
+MAX_LATENCY = 0.1
+
+
+class FakeFocusSource(EventSource):
+    """Posts a FOCUS event every `spacing` seconds from its own thread."""
+
+    def __init__(self, count: int, spacing: float):
+        self.count: int = count
+        self.spacing: float = spacing
+        self.posted: list[float] = []
+        self._stop = threading.Event()
+
+    def start(self, bus: EventBus):
+        threading.Thread(target=self._run, args=(bus,), daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, bus: EventBus):
+        for i in range(self.count):
+            if self._stop.wait(self.spacing):
+                return
+            self.posted.append(time.monotonic())
+            bus.post(FOCUS, f"app.{i}")
+
+
+class FakeDispatcher:
+    """Sends every posted status at once, remembering when."""
+
+    def __init__(self):
+        self.patches: list[tuple[float, tuple[str, str, str]]] = []
+
+    def post(self, status: tuple[str, str, str]) -> int:
+        self.patches.append((time.monotonic(), status))
+        return len(self.patches)
+
+
+def run_scheduler(scheduler: Scheduler, seconds: float):
+    thread = threading.Thread(target=scheduler.run, daemon=True)
+    thread.start()
+    time.sleep(seconds)
+    scheduler.stop()
+    # Wake the loop from its wait so it sees the stop
+    scheduler.bus.post(FOCUS)
+    thread.join(1)
+    assert not thread.is_alive()
+
+
+def test_event_reaches_dispatcher_without_waiting_for_poll():
+    source = FakeFocusSource(count=5, spacing=0.05)
+    dispatcher = FakeDispatcher()
+    woken: list[list] = []
+
+    def tick(events):
+        woken.append(events)
+        if any(event.kind == FOCUS for event in events):
+            dispatcher.post(STATUS)
+        return None
+
+    scheduler = Scheduler(EventBus(), tick, poll_interval=30, sources=[source])
+    run_scheduler(scheduler, 0.4)
+
+    assert len(source.posted) == 5
+    # Each event gets its own PATCH, however close together they come
+    patch_times = [when for when, _ in dispatcher.patches[: len(source.posted)]]
+    latencies = [patched - posted for posted, patched in zip(source.posted, patch_times)]
+    assert len(latencies) == 5
+    assert max(latencies) < MAX_LATENCY, latencies
+    # The first tick runs at start, with no events; no poll ran after it
+    assert woken[0] == []
+
+
+def test_fallback_poll_is_short_while_watching():
+    governor = SamplingGovernor(min_interval=30, watch_interval=0.05, cpu_target=0)
+    ticks: list[float] = []
+
+    def tick(events):
+        ticks.append(time.monotonic())
+        governor.watching = True
+        return None
+
+    run_scheduler(Scheduler(EventBus(), tick, governor=governor), 0.4)
+
+    # Without events, a watched status is still sampled every watch_interval
+    assert len(ticks) >= 5
+    assert max(b - a for a, b in zip(ticks, ticks[1:-1])) < 0.05 + MAX_LATENCY
+
+
+def test_fallback_poll_is_long_otherwise():
+    governor = SamplingGovernor(min_interval=30, watch_interval=0.05, cpu_target=0)
+    ticks: list[float] = []
+
+    def tick(events):
+        ticks.append(time.monotonic())
+        return None
+
+    run_scheduler(Scheduler(EventBus(), tick, governor=governor), 0.3)
+
+    # Only the first tick and the one the stop's wake-up event caused
+    assert len(ticks) <= 2
+
+
+def test_watch_interval_never_exceeds_min_interval():
+    governor = SamplingGovernor(min_interval=2, watch_interval=5, cpu_target=0)
+    governor.watching = True
+    assert governor.interval() == 2
+
+
+def test_watch_interval_stretches_while_idle():
+    governor = SamplingGovernor(
+        min_interval=30, watch_interval=3, idle_after=60, cpu_target=0, idle_time=lambda: 120
+    )
+    governor.watching = True
+    assert governor.interval() == 6
+
+
+def test_event_is_not_held_while_under_cpu_target():
+    # Background work keeps a whole core busy; only the CPU spent inside the
+    # ticks counts against the 1% target, and the ticks are nearly free
+    governor = SamplingGovernor(min_interval=30, cpu_target=0.01, cpu_time=time.monotonic)
+    source = FakeFocusSource(count=3, spacing=0.1)
+    dispatcher = FakeDispatcher()
+
+    def tick(events):
+        if any(event.kind == FOCUS for event in events):
+            dispatcher.post(STATUS)
+        return None
+
+    run_scheduler(Scheduler(EventBus(), tick, sources=[source], governor=governor), 0.5)
+
+    assert len(source.posted) == 3
+    patch_times = [when for when, _ in dispatcher.patches[: len(source.posted)]]
+    latencies = [patched - posted for posted, patched in zip(source.posted, patch_times)]
+    assert len(latencies) == 3
+    assert max(latencies) < MAX_LATENCY, latencies
+    assert governor.usage < governor.cpu_target
+
+
+def test_ticks_are_held_while_over_cpu_target():
+    now, cpu = [0.0], [0.0]
+    governor = SamplingGovernor(cpu_target=0.01, cpu_time=lambda: cpu[0], clock=lambda: now[0])
+    for _ in range(10):
+        governor.begin()
+        cpu[0] += 0.01
+        now[0] += 0.1
+        governor.update()
+
+    # 10ms per tick at a 1% target spaces ticks a second apart
+    assert governor.usage > governor.cpu_target
+    assert abs(governor.hold() - 1.0) < 1e-9
+    now[0] += 0.4
+    assert abs(governor.hold() - 0.6) < 1e-9
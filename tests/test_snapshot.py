@@ -0,0 +1,138 @@
+import asyncio
+import time
+
+from fakes import FakeHost
+from utils.breaker import HALF_OPEN, BreakerBoard
+from utils.host import ScriptHostError, ScriptTimeout
+from utils.probes import AsyncProbeRunner, ProbeRunner
+from utils.snapshot import (
+    ARC_URL,
+    FRESH,
+    QUEUED,
+    RECORD_SEP,
+    TIMED_OUT,
+    VSCODE_TITLE,
+    take_snapshot,
+    take_snapshot_async,
+    track_field,
+)
+
+SPOTIFY = track_field("com.spotify.client")
+FIELDS = [ARC_URL, VSCODE_TITLE, SPOTIFY]
+
+# Probe timeout, and how long the Arc and Spotify probes take: together
+# longer than the timeout, each well within it.
+TIMEOUT = 0.2
+LATENCY = {"URL of active tab": 0.15, "current track": 0.1}
+
+
+def latency(script: str) -> float:
+    return next((seconds for marker, seconds in LATENCY.items() if marker in script), 0.0)
+
+
+class SlowHost(FakeHost):
+    def run(self, script: str, timeout: float | None = None) -> str:
+        time.sleep(latency(script))
+        return super().run(script, timeout)
+
+
+class AsyncSlowHost(FakeHost):
+    async def run(self, script: str, timeout: float | None = None) -> str:
+        await asyncio.sleep(latency(script))
+        return FakeHost.run(self, script, timeout)
+
+
+def test_queued_targets_get_their_full_deadline():
+    runner = ProbeRunner(workers=1, timeout=TIMEOUT, host_factory=SlowHost)
+    breakers = BreakerBoard(threshold=1)
+    try:
+        for _ in range(3):
+            snapshot = take_snapshot(FIELDS, runner=runner, breakers=breakers)
+            assert {name: snapshot.state(name) for name in FIELDS} == dict.fromkeys(FIELDS, FRESH)
+        assert not breakers.describe()
+    finally:
+        runner.close()
+
+
+def test_queued_targets_get_their_full_deadline_async():
+    async def main():
+        runner = AsyncProbeRunner(workers=1, timeout=TIMEOUT, host_factory=AsyncSlowHost)
+        for _ in range(3):
+            snapshot = await take_snapshot_async(FIELDS, runner=runner)
+            assert {name: snapshot.state(name) for name in FIELDS} == dict.fromkeys(FIELDS, FRESH)
+
+    asyncio.run(main())
+
+
+def test_target_without_a_host_is_cancelled_and_marked_queued():
+    class HungHost(FakeHost):
+        def run(self, script: str, timeout: float | None = None) -> str:
+            # Arc ignores the timeout, like a host stuck on an Apple Event
+            if "URL of active tab" in script:
+                time.sleep(1.0)
+            return super().run(script, timeout)
+
+    runner = ProbeRunner(workers=1, timeout=0.05, host_factory=HungHost)
+    breakers = BreakerBoard(threshold=1)
+    try:
+        snapshot = take_snapshot(FIELDS, runner=runner, breakers=breakers)
+        assert snapshot.state(ARC_URL) == TIMED_OUT
+        assert snapshot.state(VSCODE_TITLE) == QUEUED
+        assert snapshot.state(SPOTIFY) == QUEUED
+        # Only the app that ran and missed its deadline is held against it
+        assert set(breakers.describe()) == {"company.thebrowser.browser"}
+    finally:
+        runner.close()
+
+
+class FailingHost(FakeHost):
+    """Fails every Arc probe with the given exception, or garbles its output."""
+
+    def __init__(self, error: Exception | None = None):
+        super().__init__()
+        self.error: Exception | None = error
+
+    def run(self, script: str, timeout: float | None = None) -> str:
+        if "URL of active tab" not in script:
+            return super().run(script, timeout)
+        if self.error is not None:
+            raise self.error
+        return super().run(script, timeout) + RECORD_SEP + "extra"
+
+
+def arc_breaker_after(host: FakeHost, ticks: int = 3) -> BreakerBoard:
+    runner = ProbeRunner(workers=1, timeout=TIMEOUT, host_factory=lambda: host)
+    breakers = BreakerBoard(threshold=1)
+    try:
+        for _ in range(ticks):
+            take_snapshot([ARC_URL], runner=runner, breakers=breakers)
+    finally:
+        runner.close()
+    return breakers
+
+
+def test_timeouts_count_against_the_app():
+    breakers = arc_breaker_after(FailingHost(ScriptTimeout("timed out")))
+    assert "company.thebrowser.browser" in breakers.describe()
+
+
+def test_host_errors_do_not_count_against_the_app():
+    assert not arc_breaker_after(FailingHost(ScriptHostError("host died"))).describe()
+
+
+def test_garbled_output_does_not_count_against_the_app():
+    # The batched script returns one value too many, and so does every field
+    # on its own
+    assert not arc_breaker_after(FailingHost()).describe()
+
+
+def test_half_open_trial_without_a_host_is_given_back():
+    now = [0.0]
+    breakers = BreakerBoard(threshold=1, delay=1, clock=lambda: now[0])
+    breakers.failure("company.thebrowser.browser")
+    now[0] = 2.0
+    # The trial is let through, but the target never gets a host
+    assert breakers.allow("company.thebrowser.browser")
+    breakers.release("company.thebrowser.browser")
+    assert breakers.get("company.thebrowser.browser").state == HALF_OPEN
+    assert breakers.allow("company.thebrowser.browser")
@@ -0,0 +1,38 @@
+from utils.stabilizer import Stabilizer
+
+CODING = ("💻", "Coding – 10:00", "online")
+CODING_LATER = ("💻", "Coding – 10:01", "online")
+BROWSING = ("🌐", "Browsing – 10:00", "online")
+
+
+def stabilizer() -> Stabilizer:
+    stabilizer = Stabilizer(samples=3, window=10, clock=lambda: 0.0)
+    assert stabilizer.offer(CODING, "code") == CODING
+    return stabilizer
+
+
+def test_rerender_of_committed_plugin_goes_out_at_once():
+    s = stabilizer()
+    assert s.offer(CODING_LATER, "code", immediate=True) == CODING_LATER
+    assert s.pending() is None
+
+
+def test_clock_tick_does_not_commit_another_plugins_candidate():
+    s = stabilizer()
+    # A focus change starts a candidate from another plugin...
+    assert s.offer(BROWSING, "browser") is None
+    # ...and a clock tick while it is pending doesn't let it skip the wait
+    assert s.offer(BROWSING, "browser", immediate=True) is None
+    assert s.pending() == BROWSING
+    assert s.committed == CODING
+    # Flapping back still counts as suppressed
+    assert s.offer(CODING, "code") is None
+    assert s.suppressed == 1
+
+
+def test_candidate_from_another_plugin_commits_once_stable():
+    s = stabilizer()
+    for _ in range(2):
+        assert s.offer(BROWSING, "browser", immediate=True) is None
+    assert s.offer(BROWSING, "browser") == BROWSING
+    assert s.committed_source == "browser"
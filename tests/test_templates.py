@@ -0,0 +1,24 @@
+import pytest
+
+from utils.config import ConfigError, compile_config
+from utils.templates import Template
+
+
+def plugin_settings(pid: str, **section) -> dict:
+    return {"statuses": {"plugins": {"_enabled": [pid], pid: section}}}
+
+
+def test_template_with_spec_that_does_not_fit_is_rejected():
+    with pytest.raises(ConfigError, match="Unknown format code 'd'"):
+        compile_config(plugin_settings("browser", template="{prefix}{title:d}{sep}{time}"))
+
+
+def test_rule_status_with_spec_that_does_not_fit_is_rejected():
+    rule = {"app": "com.apple.finder", "title": "(?P<n>\\d+)", "status": ["📂", "{n:d} items"]}
+    with pytest.raises(ConfigError, match="status"):
+        compile_config(plugin_settings("rules", rules=[rule]))
+
+
+def test_specs_that_fit_their_values_render():
+    template = Template("{title:>6}|{minutes:03d}", ("title", "minutes"))
+    assert template.render({"title": lambda: "abc", "minutes": lambda: 7}) == "   abc|007"
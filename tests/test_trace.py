@@ -0,0 +1,67 @@
+import json
+
+from plugins.manager import PluginManager
+from utils.snapshot import Snapshot
+from utils.trace import TraceEntry, TraceRecorder, main, replay
+
+ARC = "company.thebrowser.browser"
+FINDER = "com.apple.finder"
+
+SETTINGS = {
+    "statuses": {
+        "plugins": {
+            "_enabled": ["rules"],
+            "rules": {
+                "rules": [
+                    {"app": ARC, "url": "github\\.com", "status": ["🔍", "GitHub"]},
+                    {"app": FINDER, "title": "Downloads", "status": ["📂", "Finder"]},
+                ]
+            },
+        }
+    }
+}
+
+TICKS = [
+    (ARC, Snapshot(frontmost_title="", arc_url="https://github.com/domenicurso/mark")),
+    (FINDER, Snapshot(frontmost_title="Downloads")),
+    (ARC, Snapshot(frontmost_title="", arc_url="https://github.com/")),
+]
+
+
+def record(path, changed: int = 0):
+    """Record TICKS as Mark would, with the last `changed` statuses altered."""
+    recorder = TraceRecorder(str(path))
+    for index, (app, snapshot) in enumerate(TICKS):
+        manager = PluginManager(SETTINGS, collect=lambda fields: snapshot, clock=lambda: 0.0)
+        context = {"_name": app, "_idle": 0.0, "_running": frozenset({app}), "_enabled": ["rules"]}
+        status = manager.get_status(context)
+        if index >= len(TICKS) - changed:
+            status = ("🌐", "Browsing", *status[2:])
+        recorder.record(TraceEntry(1_700_000_000.0 + index, context, snapshot, status, "rules"))
+    recorder.close()
+
+
+def test_replay_of_unchanged_trace_matches(tmp_path):
+    trace, settings = tmp_path / "trace.jsonl", tmp_path / "settings.jsonc"
+    record(trace)
+    settings.write_text(json.dumps(SETTINGS))
+
+    assert replay(str(trace), SETTINGS) == 0
+    assert main(["replay", str(trace), "--settings", str(settings)]) == 0
+
+
+def test_replay_counts_changed_statuses(tmp_path):
+    trace, settings = tmp_path / "trace.jsonl", tmp_path / "settings.jsonc"
+    record(trace, changed=2)
+    settings.write_text(json.dumps(SETTINGS))
+
+    assert replay(str(trace), SETTINGS) == 2
+    assert main(["replay", str(trace), "--settings", str(settings)]) == 1
+
+
+def test_replay_of_invalid_trace_fails(tmp_path):
+    trace, settings = tmp_path / "trace.jsonl", tmp_path / "settings.jsonc"
+    trace.write_text('{"v": 1}\n')
+    settings.write_text(json.dumps(SETTINGS))
+
+    assert main(["replay", str(trace), "--settings", str(settings)]) == 1
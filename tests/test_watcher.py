@@ -0,0 +1,42 @@
+import asyncio
+import threading
+
+from utils.events import SETTINGS, AsyncEventBus
+from utils.watcher import SettingsWatcher
+
+
+def test_async_poll_loads_off_the_event_loop(tmp_path):
+    path = tmp_path / "settings.jsonc"
+    path.write_text("{}")
+    loaded_on: list[int] = []
+
+    def load(settings_path):
+        loaded_on.append(threading.get_ident())
+        return settings_path
+
+    async def main():
+        watcher = SettingsWatcher(path, load, interval=0.01)
+        bus = AsyncEventBus(asyncio.get_running_loop())
+        path.write_text('{"update_interval": 5}')
+        try:
+            events = []
+            for _ in range(100):
+                await watcher.poll_async(bus)
+                if events := await bus.wait(0.01):
+                    break
+            return events, threading.get_ident()
+        finally:
+            watcher.close()
+
+    events, loop_thread = asyncio.run(main())
+
+    assert [event.kind for event in events] == [SETTINGS]
+    assert events[0].data.value == str(path)
+    assert loaded_on and loop_thread not in loaded_on
+
+
+def test_close_releases_the_watch(tmp_path):
+    watcher = SettingsWatcher(tmp_path / "settings.jsonc", lambda path: None)
+    watcher.close()
+    assert watcher.backend == "mtime"
+    watcher.close()
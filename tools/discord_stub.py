@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+# Local stand-in for the Discord API, for exercising Mark's transport
+# without touching discord.com. Point Mark at it with:
+#
+#   DISCORD_API_URL=http://127.0.0.1:8787/api/v9 ./mark.py
+
+import argparse
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep connections alive
+    server: "_Server"
+
+    def setup(self):
+        super().setup()
+        with self.server.stub.lock:
+            self.server.stub.connections += 1
+
+    def log_message(self, format, *args):
+        if self.server.stub.verbose:
+            super().log_message(format, *args)
+
+    def do_PATCH(self):
+        stub = self.server.stub
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+
+        with stub.lock:
+            stub.requests.append((self.command, self.path, body))
+            headers = stub.take_token()
+        if stub.latency:
+            time.sleep(stub.latency)
+
+        if headers.get("Retry-After"):
+            retry_after = float(headers["X-RateLimit-Reset-After"])
+            self._reply(
+                429,
+                {"message": "You are being rate limited.", "retry_after": retry_after, "global": False},
+                headers,
+            )
+            return
+
+        try:
+            payload = json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            self._reply(400, {"message": "400: Bad Request", "code": 50109}, headers)
+            return
+        self._reply(200, payload, headers)
+
+    def _reply(self, status: int, payload: dict, headers: dict | None = None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    stub: "DiscordStub"
+
+
+class DiscordStub:
+    """
+    Serves PATCH requests the way Discord's settings endpoint does, echoing
+    the payload back. Records every request and counts TCP connections, so
+    connection reuse can be checked.
+
+    If limit is set, requests are rate limited to `limit` per `window`
+    seconds with Discord's X-RateLimit-* headers, and requests over the limit
+    get a 429 with Retry-After.
+    """
+
+    BUCKET = "stub-settings-bucket"
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        limit: int | None = None,
+        window: float = 20.0,
+        verbose: bool = False,
+    ):
+        self.latency: float = latency
+        self.limit: int | None = limit
+        self.window: float = window
+        self.verbose: bool = verbose
+        self.requests: list[tuple[str, str, bytes]] = []
+        self.connections: int = 0
+        self.throttled: int = 0
+        self.lock = threading.Lock()
+
+        self._remaining: int = limit or 0
+        self._reset_at: float = 0.0
+
+        self._server = _Server((host, port), _Handler)
+        self._server.stub = self
+
+    def take_token(self) -> dict[str, str]:
+        """
+        Count a request against the bucket and return the rate limit headers
+        for its response; Retry-After is set if it is over the limit.
+        Caller holds the lock.
+        """
+        if self.limit is None:
+            return {}
+
+        now = time.monotonic()
+        if now >= self._reset_at:
+            self._remaining = self.limit
+            self._reset_at = now + self.window
+
+        headers = {
+            "X-RateLimit-Bucket": self.BUCKET,
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Reset-After": f"{self._reset_at - now:.3f}",
+        }
+        if self._remaining <= 0:
+            self.throttled += 1
+            headers["X-RateLimit-Remaining"] = "0"
+            headers["X-RateLimit-Scope"] = "user"
+            headers["Retry-After"] = str(math.ceil(self._reset_at - now))
+            return headers
+
+        self._remaining -= 1
+        headers["X-RateLimit-Remaining"] = str(self._remaining)
+        return headers
+
+    @property
+    def url(self) -> str:
+        """Base API URL to pass as the transport's base_url."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v9"
+
+    def start(self) -> "DiscordStub":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Discord API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before answering")
+    parser.add_argument("--limit", type=int, default=None, help="requests allowed per window")
+    parser.add_argument("--window", type=float, default=20.0, help="rate limit window in seconds")
+    args = parser.parse_args()
+
+    stub = DiscordStub(
+        args.host,
+        args.port,
+        latency=args.latency,
+        limit=args.limit,
+        window=args.window,
+        verbose=True,
+    )
+    print(f"Serving on {stub.url}")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
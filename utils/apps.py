@@ -0,0 +1,127 @@
+import threading
+import time
+from collections.abc import Callable
+from typing import NamedTuple
+
+from .constants import l
+
+LAUNCH = "launch"
+TERMINATE = "terminate"
+
+DEFAULT_RECONCILE_INTERVAL = 60.0
+
+
+class AppInfo(NamedTuple):
+    bundle: str
+    pid: int
+    name: str
+
+
+class AppEvent(NamedTuple):
+    kind: str  # LAUNCH or TERMINATE
+    app: AppInfo
+
+
+class AppEventSource:
+    """
+    Feed of running applications for an AppIndex.
+
+    list() returns every running app and is used for the initial build and
+    periodic reconciles; start() registers a callback for launch/terminate
+    events. Subclass this to plug in a platform backend or synthetic events.
+    """
+
+    def list(self) -> list[AppInfo]:
+        return []
+
+    def start(self, callback: Callable[[AppEvent], None]):
+        pass
+
+    def stop(self):
+        pass
+
+
+class AppIndex:
+    """
+    Index of running applications by bundle ID.
+
+    Built once from the source's list(), then kept current from launch and
+    terminate events. Every reconcile_interval seconds the next lookup rebuilds
+    the index from list() in case an event was missed.
+    """
+
+    def __init__(
+        self,
+        source: AppEventSource,
+        reconcile_interval: float = DEFAULT_RECONCILE_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.source: AppEventSource = source
+        self.reconcile_interval: float = reconcile_interval
+        self.clock: Callable[[], float] = clock
+
+        self._lock = threading.Lock()
+        self._apps: dict[str, dict[int, AppInfo]] = {}
+        self._bundles: frozenset[str] = frozenset()
+        self._last_reconcile: float | None = None
+
+    def start(self):
+        self.reconcile()
+        self.source.start(self.handle)
+
+    def stop(self):
+        self.source.stop()
+
+    def handle(self, event: AppEvent):
+        """Apply a single launch or terminate event."""
+        bundle = event.app.bundle.lower()
+        if not bundle:
+            return
+        with self._lock:
+            if event.kind == LAUNCH:
+                self._apps.setdefault(bundle, {})[event.app.pid] = event.app
+            elif event.kind == TERMINATE:
+                instances = self._apps.get(bundle, {})
+                instances.pop(event.app.pid, None)
+                if not instances:
+                    self._apps.pop(bundle, None)
+            self._bundles = frozenset(self._apps)
+
+    def reconcile(self):
+        """Rebuild the index from the source's list of running apps."""
+        try:
+            listed = self.source.list()
+        except Exception as e:
+            l.warning(f"Failed to list running apps: {e}")
+            return
+
+        apps: dict[str, dict[int, AppInfo]] = {}
+        for app in listed:
+            if app.bundle:
+                apps.setdefault(app.bundle.lower(), {})[app.pid] = app
+
+        with self._lock:
+            self._apps = apps
+            self._bundles = frozenset(apps)
+            self._last_reconcile = self.clock()
+
+    def bundles(self) -> frozenset[str]:
+        """Lowercased bundle IDs of every running app."""
+        self._maybe_reconcile()
+        return self._bundles
+
+    def running(self, bundle: str) -> bool:
+        self._maybe_reconcile()
+        return bundle.lower() in self._bundles
+
+    def get(self, bundle: str) -> AppInfo | None:
+        """Return one running instance of the app, or None."""
+        self._maybe_reconcile()
+        with self._lock:
+            instances = self._apps.get(bundle.lower())
+            return next(iter(instances.values())) if instances else None
+
+    def _maybe_reconcile(self):
+        last = self._last_reconcile
+        if last is None or self.clock() - last >= self.reconcile_interval:
+            self.reconcile()
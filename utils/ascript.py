@@ -1,9 +1,34 @@
-import subprocess
+import atexit
+import threading
+
+from .host import ScriptHost, ScriptHostError
+
+_host: ScriptHost | None = None
+_host_lock = threading.Lock()
+
+
+def default_host() -> ScriptHost:
+    """
+    Returns the shared script host, creating it on first use. Safe to call
+    from several probe threads at once; they all get the same host.
+    """
+    global _host
+    with _host_lock:
+        if _host is None:
+            _host = ScriptHost()
+            atexit.register(_host.close)
+        return _host
 
 
 def ascript(script: str) -> str:
-    result = subprocess.run(["osascript", "-e", script], capture_output=True, text=True)
-    return result.stdout.strip()
+    """
+    Runs an AppleScript through the shared script host.
+    Returns an empty string if the script fails or misses its deadline.
+    """
+    try:
+        return default_host().run(script).strip()
+    except ScriptHostError:
+        return ""
 
 
 def frontmost_title() -> str:
@@ -0,0 +1,74 @@
+// Mark script host
+//
+// Long-lived JXA process that compiles AppleScript sources once and runs them
+// on request. Speaks newline-delimited JSON over stdin/stdout:
+//
+//   request:  {"id": 1, "key": "3f2a...", "script": "tell application ..."}
+//   request:  {"id": 2, "key": "3f2a..."}            (script already compiled)
+//   response: {"id": 1, "ok": true, "result": "..."}
+//   response: {"id": 2, "ok": false, "error": "unknown script"}
+//
+// The "script" field only needs to be sent the first time a key is used; the
+// compiled NSAppleScript is kept around for the life of the process.
+
+ObjC.import("Foundation");
+
+const stdin = $.NSFileHandle.fileHandleWithStandardInput;
+const stdout = $.NSFileHandle.fileHandleWithStandardOutput;
+const compiled = {};
+const TYPE_UNICODE_TEXT = 0x75747874; // 'utxt'
+
+function reply(message) {
+  const line = JSON.stringify(message) + "\n";
+  stdout.writeData($(line).dataUsingEncoding($.NSUTF8StringEncoding));
+}
+
+function run(request) {
+  let script = compiled[request.key];
+  if (!script) {
+    if (request.script === undefined) {
+      return { id: request.id, ok: false, error: "unknown script" };
+    }
+    script = $.NSAppleScript.alloc.initWithSource(request.script);
+    const error = Ref();
+    if (!script.compileAndReturnError(error)) {
+      return { id: request.id, ok: false, error: "compile failed" };
+    }
+    compiled[request.key] = script;
+  }
+
+  const error = Ref();
+  const descriptor = script.executeAndReturnError(error);
+  if (!descriptor || descriptor.isNil()) {
+    return { id: request.id, ok: false, error: "execution failed" };
+  }
+  const text = descriptor.coerceToDescriptorType(TYPE_UNICODE_TEXT);
+  const result = text && !text.isNil() && !text.stringValue.isNil() ? text.stringValue.js : "";
+  return { id: request.id, ok: true, result: result };
+}
+
+let buffer = "";
+for (;;) {
+  const data = stdin.availableData;
+  if (data.length === 0) break; // EOF, parent went away
+
+  buffer += $.NSString.alloc.initWithDataEncoding(data, $.NSUTF8StringEncoding).js;
+  let newline;
+  while ((newline = buffer.indexOf("\n")) >= 0) {
+    const line = buffer.slice(0, newline);
+    buffer = buffer.slice(newline + 1);
+    if (!line.trim()) continue;
+
+    let request;
+    try {
+      request = JSON.parse(line);
+    } catch (e) {
+      continue;
+    }
+    try {
+      reply(run(request));
+    } catch (e) {
+      reply({ id: request.id, ok: false, error: String(e) });
+    }
+  }
+}
@@ -0,0 +1,149 @@
+import threading
+import time
+from collections.abc import Callable
+
+from .constants import l
+
+# Breaker states
+CLOSED = "closed"  # calls go through
+OPEN = "open"  # calls are skipped until the backoff delay has passed
+HALF_OPEN = "half_open"  # one trial call is let through
+
+DEFAULT_THRESHOLD = 3
+DEFAULT_DELAY = 5.0
+DEFAULT_MAX_DELAY = 300.0
+
+
+class CircuitBreaker:
+    """
+    Stops calling a target after repeated failures.
+
+    After threshold consecutive failures the breaker opens and calls are
+    skipped for delay seconds. Then a single trial call is allowed (half-open):
+    success closes the breaker, failure reopens it with the delay doubled,
+    up to max_delay.
+    """
+
+    def __init__(
+        self,
+        threshold: int = DEFAULT_THRESHOLD,
+        delay: float = DEFAULT_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.threshold: int = threshold
+        self.delay: float = delay
+        self.max_delay: float = max_delay
+        self.clock: Callable[[], float] = clock
+
+        self.failures: int = 0
+        self.opens: int = 0
+        self.retry_at: float = 0.0
+        self._state: str = CLOSED
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self.clock() >= self.retry_at:
+            return HALF_OPEN
+        return self._state
+
+    def allow(self) -> bool:
+        """Return True if a call may go through now."""
+        state = self.state
+        if state == HALF_OPEN and self._state == OPEN:
+            # Let exactly one trial through until it reports back.
+            self._state = HALF_OPEN
+            return True
+        return state == CLOSED
+
+    def record_success(self):
+        self.failures = 0
+        self.opens = 0
+        self._state = CLOSED
+
+    def record_failure(self):
+        self.failures += 1
+        if self._state == HALF_OPEN or self.failures >= self.threshold:
+            self.opens += 1
+            backoff = min(self.max_delay, self.delay * 2 ** (self.opens - 1))
+            self.retry_at = self.clock() + backoff
+            self._state = OPEN
+
+    def release(self):
+        """Give back a half-open trial call that never reached the target."""
+        if self._state == HALF_OPEN:
+            self._state = OPEN
+
+    def retry_in(self) -> float:
+        """Seconds until an open breaker lets a trial call through."""
+        return max(0.0, self.retry_at - self.clock()) if self._state == OPEN else 0.0
+
+
+class BreakerBoard:
+    """
+    Circuit breakers keyed by bundle ID, created on first use.
+    Logs every state change.
+    """
+
+    def __init__(
+        self,
+        threshold: int = DEFAULT_THRESHOLD,
+        delay: float = DEFAULT_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._factory: Callable[[], CircuitBreaker] = lambda: CircuitBreaker(
+            threshold, delay, max_delay, clock
+        )
+        self._lock = threading.Lock()
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, key: str) -> CircuitBreaker:
+        with self._lock:
+            if key not in self._breakers:
+                self._breakers[key] = self._factory()
+            return self._breakers[key]
+
+    def allow(self, key: str) -> bool:
+        with self._lock:
+            breaker = self._breakers.get(key)
+            return breaker is None or breaker.allow()
+
+    def success(self, key: str):
+        breaker = self.get(key)
+        with self._lock:
+            was = breaker.state
+            breaker.record_success()
+        if was != CLOSED:
+            l.success(f"{key} is responding again; resuming probes")
+
+    def failure(self, key: str):
+        breaker = self.get(key)
+        with self._lock:
+            was = breaker.state
+            breaker.record_failure()
+            now = breaker.state
+        if now == OPEN and was != OPEN:
+            l.warning(
+                f"{key} is not responding; skipping its probes for {breaker.retry_in():.0f}s"
+            )
+
+    def release(self, key: str):
+        """Neither a success nor a failure: the call never got as far as the app."""
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is not None:
+                breaker.release()
+
+    def describe(self) -> dict[str, dict[str, any]]:
+        """Current state of every breaker that is not closed."""
+        with self._lock:
+            return {
+                key: {
+                    "state": breaker.state,
+                    "failures": breaker.failures,
+                    "retry_in": round(breaker.retry_in(), 1),
+                }
+                for key, breaker in self._breakers.items()
+                if breaker.state != CLOSED
+            }
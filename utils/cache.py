@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from typing import Any
+
+# Invalidation tags
+FOCUS_CHANGED = "focus"
+MEDIA_CHANGED = "media"
+
+DEFAULT_SIZE = 128
+
+MISS = object()
+
+
+class ProbeCache:
+    """
+    Bounded LRU cache of probe results with per-probe TTLs.
+
+    TTLs are looked up by probe name, then by the part before ':' for
+    parametric probes (so "track" covers "track:com.spotify.client"). Probes
+    without a TTL are never cached. Entries can also carry tags and be dropped
+    early with invalidate(tag), e.g. when the frontmost app changes.
+    """
+
+    def __init__(
+        self,
+        size: int = DEFAULT_SIZE,
+        ttls: dict[str, float] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.size: int = size
+        self.ttls: dict[str, float] = dict(ttls or {})
+        self.clock: Callable[[], float] = clock
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[Any, float, frozenset[str]]] = OrderedDict()
+
+    def ttl(self, key: str) -> float:
+        if key in self.ttls:
+            return self.ttls[key]
+        return self.ttls.get(key.split(":", 1)[0], 0)
+
+    def get(self, key: str) -> Any:
+        """Return the cached value for key, or MISS if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= self.clock():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return MISS
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, value: Any, tags: Iterable[str] = ()):
+        ttl = self.ttl(key)
+        if ttl <= 0 or self.size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, self.clock() + ttl, frozenset(tags))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, tag: str) -> int:
+        """Drop every entry carrying the tag. Returns how many were dropped."""
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if tag in entry[2]]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,380 @@
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from types import MappingProxyType
+
+from .constants import DEFAULT_SEPARATOR, DEFAULT_TIME_FORMAT, FB_ICON, FB_TEXT
+from .rules import Rule, RuleSet, check_rule
+from .templates import DISPLAY_TEMPLATES, Template, plugin_template
+from .types import PluginStatus
+from .urlrules import UrlRules
+
+STATUS_TYPES = ("online", "idle", "dnd", "invisible")
+
+# strftime directives by the unit of time they show, finest first.
+SECOND_DIRECTIVES = ("%S", "%T", "%X", "%c", "%r", "%s")
+MINUTE_DIRECTIVES = ("%M", "%R")
+HOUR_DIRECTIVES = ("%H", "%I", "%k", "%l", "%p")
+
+# Time units a time format can change by.
+SECOND = "second"
+MINUTE = "minute"
+HOUR = "hour"
+DAY = "day"
+
+# Accepted "display" values, by plugin ID.
+DISPLAYS = {
+    "browser": ("title", "url", "none"),
+    "music": ("both", "artist", "title", "artist_title", "none"),
+    "code": ("both", "project", "file", "file_project", "none"),
+}
+IDLE_DISPLAYS = ("normal", "elapsed")
+MUSIC_WHEN = ("playing", "focused", "both")
+
+_EMPTY: Mapping = MappingProxyType({})
+
+
+def _empty() -> Mapping:
+    return _EMPTY
+
+
+class ConfigError(ValueError):
+    """Settings that don't describe a valid configuration."""
+
+
+@dataclass(frozen=True, slots=True)
+class TimePolicy:
+    """Whether and how statuses show the current time."""
+
+    show: bool = False
+    format: str = DEFAULT_TIME_FORMAT
+    # Separator between the status text and the time; empty when it isn't shown.
+    separator: str = ""
+    # Finest unit of time the format shows (SECOND, MINUTE, HOUR or DAY).
+    unit: str = MINUTE
+
+    def render(self, now: float) -> str:
+        """The time to show at time.time() instant now, or an empty string."""
+        return datetime.fromtimestamp(now).strftime(self.format) if self.show else ""
+
+    def next_change(self, now: float) -> float | None:
+        """When the shown time next changes after now, or None if no time is shown."""
+        if not self.show:
+            return None
+        now_dt = datetime.fromtimestamp(now)
+        if self.unit == SECOND:
+            start, step = now_dt.replace(microsecond=0), timedelta(seconds=1)
+        elif self.unit == MINUTE:
+            start, step = now_dt.replace(second=0, microsecond=0), timedelta(minutes=1)
+        elif self.unit == HOUR:
+            start = now_dt.replace(minute=0, second=0, microsecond=0)
+            step = timedelta(hours=1)
+        else:
+            start = now_dt.replace(hour=0, minute=0, second=0, microsecond=0)
+            step = timedelta(days=1)
+        return (start + step).timestamp()
+
+
+@dataclass(frozen=True, slots=True)
+class IdleConfig:
+    status: tuple[str, str] = ("😴", "Away")
+    # Seconds of inactivity before the idle status is shown.
+    timeout: float = 300.0
+    display: str = "elapsed"
+    # Status text; the built-in template of display unless one is set.
+    template: Template = Template(DISPLAY_TEMPLATES["idle"]["elapsed"])
+
+
+@dataclass(frozen=True, slots=True)
+class PluginConfig:
+    """
+    Settings of one plugin. Plugins without a dedicated config class read
+    their own keys from options, or through get() like a dict.
+    """
+
+    id: str
+    apps: tuple[str, ...] = ()
+    app_set: frozenset[str] = frozenset()
+    display: str = "none"
+    prefix: bool = True
+    options: Mapping[str, any] = field(default_factory=_empty)
+    # Status text of plugins that have templates; the built-in template of
+    # display unless one is set.
+    template: Template | None = None
+
+    def get(self, key: str, default: any = None) -> any:
+        return self.options.get(key, default)
+
+
+@dataclass(frozen=True, slots=True)
+class BrowserConfig(PluginConfig):
+    use_special: bool = True
+    # Statuses of special websites, by rule as written in the settings.
+    special: Mapping[str, PluginStatus] = field(default_factory=_empty)
+    # The same rules, compiled for matching URLs against.
+    rules: UrlRules = field(default_factory=UrlRules)
+
+
+@dataclass(frozen=True, slots=True)
+class MusicConfig(PluginConfig):
+    when: str = "playing"
+    remove_extras: bool = True
+
+
+@dataclass(frozen=True, slots=True)
+class RulesConfig(PluginConfig):
+    # Title and URL rules, compiled per app.
+    rules: RuleSet = field(default_factory=RuleSet)
+
+
+@dataclass(frozen=True, slots=True)
+class StatusConfig:
+    time: TimePolicy = TimePolicy()
+    default: PluginStatus = (FB_ICON(), FB_TEXT(), "online")
+    # Per-app statuses, by bundle ID.
+    apps: Mapping[str, PluginStatus] = field(default_factory=_empty)
+    idle: IdleConfig = IdleConfig()
+    # Enabled plugin IDs, highest priority first.
+    enabled: tuple[str, ...] = ()
+    plugins: Mapping[str, PluginConfig] = field(default_factory=_empty)
+
+    def app_status(self, bundle: str) -> PluginStatus:
+        """The configured status of an app, or a generic one named after it."""
+        status = self.apps.get(bundle)
+        return status if status is not None else (FB_ICON(), bundle, "online")
+
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    """
+    Compiled settings: validated once at load time, immutable, and with
+    everything plugins look up every tick resolved ahead of time.
+    """
+
+    update_interval: float = 5
+    colorblind: bool = False
+    statuses: StatusConfig = field(default_factory=StatusConfig)
+
+
+def compile_config(settings: dict) -> Config:
+    """
+    Compile the settings file's contents. Raises ConfigError, naming the
+    offending key, if they are invalid.
+    """
+    _expect(settings, dict, "settings")
+    statuses = settings.get("statuses")
+    if statuses is None:
+        raise ConfigError('settings: missing "statuses"')
+    return Config(
+        update_interval=_number(settings.get("update_interval", 5), "update_interval"),
+        colorblind=_expect(settings.get("colorblind", False), bool, "colorblind"),
+        statuses=_compile_statuses(statuses),
+    )
+
+
+def _compile_statuses(statuses: dict) -> StatusConfig:
+    _expect(statuses, dict, "statuses")
+
+    show = _expect(statuses.get("show_time", False), bool, "statuses.show_time")
+    tformat = _expect(
+        statuses.get("time_format", DEFAULT_TIME_FORMAT), str, "statuses.time_format"
+    )
+    separator = _expect(
+        statuses.get("separator", DEFAULT_SEPARATOR), str, "statuses.separator"
+    )
+    time = TimePolicy(
+        show=show,
+        format=tformat,
+        separator=separator if show else "",
+        unit=_time_unit(tformat),
+    )
+
+    apps = _expect(statuses.get("apps", {}), dict, "statuses.apps")
+    plugins = _expect(statuses.get("plugins", {}), dict, "statuses.plugins")
+    enabled = _strings(plugins.get("_enabled", []), "statuses.plugins._enabled")
+
+    return StatusConfig(
+        time=time,
+        default=_status(
+            statuses.get("default", [FB_ICON(), FB_TEXT()]), "statuses.default"
+        ),
+        apps=MappingProxyType(
+            {
+                bundle: _status(status, f"statuses.apps.{bundle}")
+                for bundle, status in apps.items()
+            }
+        ),
+        idle=_compile_idle(statuses.get("idle", {})),
+        enabled=enabled,
+        plugins=MappingProxyType(
+            {
+                pid: compile_plugin(pid, section)
+                for pid, section in plugins.items()
+                if pid != "_enabled"
+            }
+        ),
+    )
+
+
+def _compile_idle(idle: dict) -> IdleConfig:
+    _expect(idle, dict, "statuses.idle")
+    emoji, text = _status(idle.get("status", ["😴", "Away"]), "statuses.idle.status")[:2]
+    timeout = _number(idle.get("timeout", 5), "statuses.idle.timeout")
+    display = _choice(
+        idle.get("display", "elapsed"), IDLE_DISPLAYS, "statuses.idle.display"
+    )
+    return IdleConfig(
+        status=(emoji, text),
+        timeout=timeout * 60,
+        display=display,
+        template=_template("idle", display, idle, "statuses.idle"),
+    )
+
+
+def compile_plugin(pid: str, section: dict) -> PluginConfig:
+    """Compile the settings section of one plugin; {} gives its defaults."""
+    where = f"statuses.plugins.{pid}"
+    _expect(section, dict, where)
+    apps = _strings(section.get("apps", []), f"{where}.apps")
+    common = {
+        "id": pid,
+        "apps": apps,
+        "app_set": frozenset(apps),
+        "prefix": _expect(section.get("prefix", True), bool, f"{where}.prefix"),
+        "options": MappingProxyType(dict(section)),
+    }
+
+    display = section.get("display")
+    if display is not None and pid in DISPLAYS:
+        _choice(display, DISPLAYS[pid], f"{where}.display")
+
+    if pid == "browser":
+        special = _expect(
+            section.get("special_statuses", {}), dict, f"{where}.special_statuses"
+        )
+        statuses = {
+            rule: _status(status, f"{where}.special_statuses.{rule}")
+            for rule, status in special.items()
+        }
+        try:
+            rules = UrlRules(statuses)
+        except ValueError as e:
+            raise ConfigError(f"{where}.special_statuses: {e}") from None
+        return BrowserConfig(
+            **common,
+            display=display or "none",
+            template=_template(pid, display or "none", section, where),
+            use_special=_expect(
+                section.get("use_special", True), bool, f"{where}.use_special"
+            ),
+            special=MappingProxyType(statuses),
+            rules=rules,
+        )
+    if pid == "music":
+        return MusicConfig(
+            **common,
+            display=display or "artist_title",
+            template=_template(pid, display or "artist_title", section, where),
+            when=_choice(section.get("when", "playing"), MUSIC_WHEN, f"{where}.when"),
+            remove_extras=_expect(
+                section.get("remove_extras", True), bool, f"{where}.remove_extras"
+            ),
+        )
+    if pid == "rules":
+        return RulesConfig(
+            **common,
+            display=_expect(display or "none", str, f"{where}.display"),
+            rules=_compile_rules(section.get("rules", []), f"{where}.rules"),
+        )
+    if pid == "code":
+        return PluginConfig(
+            **common,
+            display=display or "file_project",
+            template=_template(pid, display or "file_project", section, where),
+        )
+    return PluginConfig(
+        **common, display=_expect(display or "none", str, f"{where}.display")
+    )
+
+
+def _template(pid: str, display: str, section: dict, where: str) -> Template:
+    source = section.get("template")
+    if source is not None:
+        _expect(source, str, f"{where}.template")
+    try:
+        return plugin_template(pid, display, source)
+    except ValueError as e:
+        raise ConfigError(f"{where}.template: {e}") from None
+
+
+def _compile_rules(rules: list, where: str) -> RuleSet:
+    _expect(rules, list, where)
+    compiled = []
+    for index, item in enumerate(rules):
+        here = f"{where}.{index}"
+        _expect(item, dict, here)
+        rule = Rule(
+            app=_expect(item.get("app"), str, f"{here}.app"),
+            title=_expect(item.get("title", ""), str, f"{here}.title"),
+            url=_expect(item.get("url", ""), str, f"{here}.url"),
+            status=_status(item.get("status"), f"{here}.status"),
+        )
+        if not rule.title and not rule.url:
+            raise ConfigError(f'{here}: expected a "title" or "url" pattern')
+        try:
+            check_rule(rule)
+        except ValueError as e:
+            raise ConfigError(f"{here}.{e}") from None
+        compiled.append(rule)
+    return RuleSet(compiled)
+
+
+def _time_unit(tformat: str) -> str:
+    if any(d in tformat for d in SECOND_DIRECTIVES):
+        return SECOND
+    if any(d in tformat for d in MINUTE_DIRECTIVES):
+        return MINUTE
+    if any(d in tformat for d in HOUR_DIRECTIVES):
+        return HOUR
+    return DAY
+
+
+def _status(value: any, where: str) -> PluginStatus:
+    """[emoji, text] or [emoji, text, type] as an (emoji, text, type) tuple."""
+    if (
+        not isinstance(value, list)
+        or len(value) not in (2, 3)
+        or not all(isinstance(item, str) for item in value)
+    ):
+        raise ConfigError(f"{where}: expected [emoji, text] or [emoji, text, type]")
+    emoji, text, *maybe_type = value
+    status_type = maybe_type[0].lower() if maybe_type else "online"
+    if status_type not in STATUS_TYPES:
+        raise ConfigError(
+            f"{where}: status type must be one of {', '.join(STATUS_TYPES)}, not {status_type!r}"
+        )
+    return (emoji, text, status_type)
+
+
+def _strings(value: any, where: str) -> tuple[str, ...]:
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ConfigError(f"{where}: expected a list of strings")
+    return tuple(value)
+
+
+def _choice(value: any, choices: tuple[str, ...], where: str) -> str:
+    if value not in choices:
+        raise ConfigError(f"{where}: must be one of {', '.join(choices)}, not {value!r}")
+    return value
+
+
+def _number(value: any, where: str) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+        raise ConfigError(f"{where}: expected a non-negative number")
+    return value
+
+
+def _expect(value: any, kind: type, where: str) -> any:
+    if not isinstance(value, kind):
+        raise ConfigError(f"{where}: expected {kind.__name__}, not {type(value).__name__}")
+    return value
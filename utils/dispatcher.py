@@ -0,0 +1,237 @@
+import asyncio
+import threading
+import time
+
+from .constants import MIN_RATE_LIMIT, l
+
+
+class StatusDispatcher:
+    """
+    Sends status updates on a background thread so that sampling never waits
+    on the network.
+
+    The mailbox holds a single slot: posting a status replaces any status
+    that has not been sent yet, so only the newest one goes out. The pending
+    status is sent as soon as the manager's rate limits allow it. A failed
+    send is retried after the limiter's delay (at least `retry` seconds),
+    unless a newer status has been posted in the meantime.
+    """
+
+    def __init__(self, manager, interval: float = 0, retry: float = MIN_RATE_LIMIT):
+        self.manager = manager
+        self.interval: float = interval
+        self.retry: float = retry
+
+        self.sent: int = 0
+        self.superseded: int = 0
+
+        self._cond = threading.Condition()
+        self._pending: tuple[int, tuple[str, str, str], float] | None = None
+        self._seq: int = 0
+        self._done: int = 0
+        self._retry_at: float = 0.0
+        self._stopped: bool = False
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "StatusDispatcher":
+        self._thread = threading.Thread(
+            target=self._run, name="status-dispatcher", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def post(self, status: tuple[str, str, str], interval: float | None = None) -> int:
+        """
+        Make status the next one to send, replacing any unsent status.
+        Returns a ticket to pass to wait().
+        """
+        with self._cond:
+            if self._pending is not None:
+                self.superseded += 1
+            self._seq += 1
+            self._pending = (
+                self._seq,
+                status,
+                self.interval if interval is None else interval,
+            )
+            self._cond.notify_all()
+            return self._seq
+
+    def pending(self) -> tuple[str, str, str] | None:
+        with self._cond:
+            return self._pending[1] if self._pending else None
+
+    def wait(self, ticket: int, timeout: float | None = None) -> bool:
+        """
+        Wait until the status posted with this ticket (or a newer one) has
+        been sent. Returns False on timeout.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self._done >= ticket, timeout)
+
+    def _delay(self, interval: float) -> float:
+        return max(
+            self.manager.retry_after(interval), self._retry_at - time.monotonic()
+        )
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+
+                # Hold the update until the rate limits allow it; a newer
+                # post wakes us up to check again
+                seq, status, interval = self._pending
+                if status != self.manager.last_status:
+                    wait = self._delay(interval)
+                    if wait > 0:
+                        self._cond.wait(wait)
+                        continue
+                self._pending = None
+
+            ok = self._send(status)
+
+            with self._cond:
+                if ok:
+                    self._done = max(self._done, seq)
+                    self._retry_at = 0.0
+                else:
+                    self._retry_at = time.monotonic() + self.retry
+                    if self._pending is None:
+                        # Nothing newer to send; retry this one
+                        self._pending = (seq, status, interval)
+                self._cond.notify_all()
+
+    def _send(self, status: tuple[str, str, str]) -> bool:
+        if status == self.manager.last_status:
+            return True
+        try:
+            ok = self.manager.set_custom_status(*status)
+        except Exception as e:
+            l.error(f"Error sending status update: {e}")
+            return False
+        if ok:
+            self.sent += 1
+        return ok
+
+
+class AsyncStatusDispatcher:
+    """
+    asyncio counterpart of StatusDispatcher: the same latest-wins mailbox,
+    drained by a task that awaits the manager's set_custom_status_async().
+    Waiting for the rate limit is a cancellable sleep.
+    """
+
+    def __init__(self, manager, interval: float = 0, retry: float = MIN_RATE_LIMIT):
+        self.manager = manager
+        self.interval: float = interval
+        self.retry: float = retry
+
+        self.sent: int = 0
+        self.superseded: int = 0
+
+        self._wake = asyncio.Event()
+        self._done_changed = asyncio.Event()
+        self._pending: tuple[int, tuple[str, str, str], float] | None = None
+        self._seq: int = 0
+        self._done: int = 0
+        self._retry_at: float = 0.0
+        self._task: asyncio.Task | None = None
+
+    _delay = StatusDispatcher._delay
+
+    def start(self) -> "AsyncStatusDispatcher":
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def post(self, status: tuple[str, str, str], interval: float | None = None) -> int:
+        """
+        Make status the next one to send, replacing any unsent status.
+        Returns a ticket to pass to wait().
+        """
+        if self._pending is not None:
+            self.superseded += 1
+        self._seq += 1
+        self._pending = (
+            self._seq,
+            status,
+            self.interval if interval is None else interval,
+        )
+        self._wake.set()
+        return self._seq
+
+    def pending(self) -> tuple[str, str, str] | None:
+        return self._pending[1] if self._pending else None
+
+    async def wait(self, ticket: int, timeout: float | None = None) -> bool:
+        """
+        Wait until the status posted with this ticket (or a newer one) has
+        been sent. Returns False on timeout.
+        """
+        async def sent():
+            while self._done < ticket:
+                self._done_changed.clear()
+                await self._done_changed.wait()
+
+        try:
+            await asyncio.wait_for(sent(), timeout)
+        except TimeoutError:
+            return False
+        return True
+
+    async def _run(self):
+        while True:
+            if self._pending is None:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+
+            # Hold the update until the rate limits allow it; a newer post
+            # wakes us up to check again
+            seq, status, interval = self._pending
+            if status != self.manager.last_status:
+                wait = self._delay(interval)
+                if wait > 0:
+                    self._wake.clear()
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), wait)
+                    except TimeoutError:
+                        pass
+                    continue
+            self._pending = None
+
+            ok = await self._send(status)
+            if ok:
+                self._done = max(self._done, seq)
+                self._retry_at = 0.0
+                self._done_changed.set()
+            else:
+                self._retry_at = time.monotonic() + self.retry
+                if self._pending is None:
+                    # Nothing newer to send; retry this one
+                    self._pending = (seq, status, interval)
+
+    async def _send(self, status: tuple[str, str, str]) -> bool:
+        if status == self.manager.last_status:
+            return True
+        try:
+            ok = await self.manager.set_custom_status_async(*status)
+        except Exception as e:
+            l.error(f"Error sending status update: {e}")
+            return False
+        if ok:
+            self.sent += 1
+        return ok
@@ -0,0 +1,179 @@
+import asyncio
+import threading
+import time
+from collections.abc import Callable
+from typing import Any, NamedTuple
+
+# Event kinds
+FOCUS = "focus"  # frontmost app changed; data is the new bundle ID
+MEDIA = "media"  # a media app changed track or playback state; data is its bundle ID
+IDLE = "idle"  # idle threshold crossed; data is True when the user went idle
+SETTINGS = "settings"  # settings file changed
+CLOCK = "clock"  # a timer set with Scheduler.wake_at fired; data is its name
+
+# Longest single slice spent in the pump callback before the queue is checked again.
+PUMP_SLICE = 0.25
+
+
+class Event(NamedTuple):
+    kind: str
+    data: Any
+    time: float
+
+
+class EventBus:
+    """
+    Thread-safe queue of events that wakes the main loop.
+
+    If a pump callback is given, wait() calls it in short slices instead of
+    blocking on a condition. This lets main-thread run loops deliver
+    notifications (which then post events) while the loop is waiting.
+    """
+
+    def __init__(
+        self,
+        pump: Callable[[float], None] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.pump: Callable[[float], None] | None = pump
+        self.clock: Callable[[], float] = clock
+        self._cond = threading.Condition()
+        self._events: list[Event] = []
+
+    def post(self, kind: str, data: Any = None):
+        with self._cond:
+            self._events.append(Event(kind, data, self.clock()))
+            self._cond.notify_all()
+
+    def wait(self, timeout: float) -> list[Event]:
+        """
+        Block until at least one event is posted or the timeout passes,
+        then return every pending event (possibly none).
+        """
+        deadline = self.clock() + timeout
+        with self._cond:
+            while not self._events:
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    break
+                if self.pump is None:
+                    self._cond.wait(remaining)
+                    continue
+                self._cond.release()
+                try:
+                    self.pump(min(remaining, PUMP_SLICE))
+                finally:
+                    self._cond.acquire()
+            events, self._events = self._events, []
+        return events
+
+
+class AsyncEventBus(EventBus):
+    """
+    EventBus for the asyncio engine. Events may still be posted from any
+    thread; wait() is a coroutine that wakes as soon as one arrives.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        super().__init__(clock=clock)
+        self.loop: asyncio.AbstractEventLoop = loop
+        self._wake = asyncio.Event()
+
+    def post(self, kind: str, data: Any = None):
+        super().post(kind, data)
+        if self.loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self._wake.set()
+        else:
+            self.loop.call_soon_threadsafe(self._wake.set)
+
+    async def wait(self, timeout: float) -> list[Event]:
+        """
+        Wait until at least one event is posted or the timeout passes,
+        then return every pending event (possibly none).
+        """
+        with self._cond:
+            ready = bool(self._events)
+        if not ready:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except TimeoutError:
+                pass
+        self._wake.clear()
+        with self._cond:
+            events, self._events = self._events, []
+        return events
+
+
+class EventSource:
+    """
+    Something that posts events to an EventBus.
+    Subclass this for platform notifications or synthetic events.
+
+    Sources that poll set interval and implement poll(); the asyncio engine
+    calls poll_async() from a timer instead of starting a thread per source.
+    Sources whose poll() blocks override poll_async() to keep the loop free.
+    """
+
+    interval: float | None = None
+
+    def start(self, bus: EventBus):
+        pass
+
+    def stop(self):
+        pass
+
+    def poll(self, bus: EventBus):
+        pass
+
+    async def poll_async(self, bus: EventBus):
+        self.poll(bus)
+
+
+class IdleEventSource(EventSource):
+    """
+    Polls an idle-time function on a background thread and posts an IDLE event
+    whenever the idle time crosses the threshold in either direction.
+    """
+
+    def __init__(
+        self,
+        idle_time: Callable[[], float],
+        threshold: float,
+        interval: float = 1.0,
+    ):
+        self.idle_time: Callable[[], float] = idle_time
+        self.threshold: float = threshold
+        self.interval: float = interval
+        self._idle: bool | None = None
+        self._stop = threading.Event()
+
+    def start(self, bus: EventBus):
+        self._stop.clear()
+        threading.Thread(target=self._run, args=(bus,), daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def poll(self, bus: EventBus):
+        try:
+            now_idle = self.idle_time() >= self.threshold
+        except Exception:
+            now_idle = self._idle
+        if self._idle is not None and now_idle != self._idle:
+            bus.post(IDLE, now_idle)
+        self._idle = now_idle
+
+    def _run(self, bus: EventBus):
+        while not self._stop.is_set():
+            self.poll(bus)
+            self._stop.wait(self.interval)
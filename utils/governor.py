@@ -0,0 +1,113 @@
+import resource
+import time
+from collections.abc import Callable
+
+DEFAULT_MIN_INTERVAL = 30.0
+DEFAULT_WATCH_INTERVAL = 3.0
+DEFAULT_MAX_INTERVAL = 300.0
+DEFAULT_IDLE_AFTER = 180.0
+DEFAULT_CPU_TARGET = 0.01  # fraction of one core
+
+# Weight of the newest measurement in the CPU usage average.
+USAGE_SMOOTHING = 0.3
+
+
+def process_cpu_time() -> float:
+    """CPU seconds (user and system) used by this process so far."""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+class SamplingGovernor:
+    """
+    Adapts how often Mark samples to what the user is doing and to what
+    sampling costs.
+
+    The fallback poll interval is min_interval while the user is active, or
+    watch_interval while watching is set (the status shows something no event
+    reports a change of, like a window title). Once the idle time passes
+    idle_after it stretches in proportion to the idle time, up to
+    max_interval, and snaps back as soon as there is input again.
+
+    The CPU each tick costs is measured between begin() and update(), so
+    work done between ticks does not count against sampling. While the
+    average goes over cpu_target the poll interval is stretched by the
+    overshoot, and hold() spaces ticks (including event-driven ones) so that
+    the CPU spent per tick stays within the target. Under the target, ticks
+    are never held.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = DEFAULT_MIN_INTERVAL,
+        max_interval: float = DEFAULT_MAX_INTERVAL,
+        idle_after: float = DEFAULT_IDLE_AFTER,
+        cpu_target: float = DEFAULT_CPU_TARGET,
+        idle_time: Callable[[], float] = lambda: 0.0,
+        cpu_time: Callable[[], float] = process_cpu_time,
+        clock: Callable[[], float] = time.monotonic,
+        watch_interval: float = DEFAULT_WATCH_INTERVAL,
+    ):
+        self.min_interval: float = min_interval
+        self.watch_interval: float = min(min_interval, watch_interval)
+        self.max_interval: float = max(min_interval, max_interval)
+        self.idle_after: float = idle_after
+        self.cpu_target: float = cpu_target
+        self.idle_time: Callable[[], float] = idle_time
+        self.cpu_time: Callable[[], float] = cpu_time
+        self.clock: Callable[[], float] = clock
+
+        # Whether the current status has to be watched by polling.
+        self.watching: bool = False
+
+        # Average fraction of a core used since the governor started.
+        self.usage: float = 0.0
+        # CPU seconds spent by the last tick.
+        self.cost: float = 0.0
+
+        self._last_time: float | None = None
+        self._tick_cpu: float | None = None
+
+    def interval(self) -> float:
+        """Seconds until the next fallback poll."""
+        interval = self.watch_interval if self.watching else self.min_interval
+        try:
+            idle = self.idle_time()
+        except Exception:
+            idle = 0.0
+        if self.idle_after > 0 and idle > self.idle_after:
+            interval *= idle / self.idle_after
+        if self.cpu_target > 0 and self.usage > self.cpu_target:
+            interval *= self.usage / self.cpu_target
+        return min(self.max_interval, interval)
+
+    def hold(self) -> float:
+        """Seconds to hold the next tick back to stay within the CPU target."""
+        if self._last_time is None or self.cpu_target <= 0 or self.usage <= self.cpu_target:
+            return 0.0
+        spacing = self.cost / self.cpu_target
+        return max(0.0, min(self.max_interval, spacing) - (self.clock() - self._last_time))
+
+    def begin(self):
+        """Start measuring a tick. Call right before it runs."""
+        self._tick_cpu = self.cpu_time()
+
+    def update(self):
+        """Measure the CPU used by the tick since begin(). Call after every tick."""
+        now = self.clock()
+        if self._tick_cpu is not None:
+            self.cost = max(0.0, self.cpu_time() - self._tick_cpu)
+            self._tick_cpu = None
+        if self._last_time is not None:
+            elapsed = now - self._last_time
+            if elapsed > 0:
+                usage = self.cost / elapsed
+                self.usage += USAGE_SMOOTHING * (usage - self.usage)
+        self._last_time = now
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "interval": round(self.interval(), 1),
+            "hold": round(self.hold(), 2),
+            "cpu": round(self.usage * 100, 2),
+        }
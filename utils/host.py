@@ -0,0 +1,291 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import subprocess
+import threading
+from pathlib import Path
+
+from .constants import l
+
+HOST_SCRIPT = Path(__file__).resolve().parent / "ascript_host.js"
+DEFAULT_COMMAND = ["osascript", "-l", "JavaScript", str(HOST_SCRIPT)]
+DEFAULT_TIMEOUT = 5.0
+
+
+class ScriptHostError(Exception):
+    """Raised when the script host could not run a script."""
+
+
+class ScriptTimeout(ScriptHostError):
+    """Raised when a script does not answer before its deadline."""
+
+
+class _Pending:
+    __slots__ = ("event", "response")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.response: dict | None = None
+
+
+class ScriptHost:
+    """
+    Long-lived script interpreter that keeps compiled scripts loaded.
+
+    Requests are newline-delimited JSON objects written to the host's stdin:
+    {"id", "key", "script"?}. The script source is only sent the first time a
+    key is used; afterwards the host runs its compiled copy. Responses
+    {"id", "ok", "result" | "error"} are matched back to callers by id, so
+    several threads may have requests in flight at once.
+
+    Any command speaking this protocol can be used as the host, which allows a
+    stand-in interpreter to replace osascript off macOS.
+    """
+
+    def __init__(self, command: list[str] | None = None, timeout: float = DEFAULT_TIMEOUT):
+        self.command: list[str] = list(command or DEFAULT_COMMAND)
+        self.timeout: float = timeout
+        self.spawns: int = 0
+
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._proc: subprocess.Popen | None = None
+        self._pending: dict[int, _Pending] = {}
+        self._compiled: set[str] = set()
+
+    def run(self, script: str, timeout: float | None = None) -> str:
+        """
+        Run a script and return its result as a string.
+        Raises ScriptTimeout if the deadline passes; the host is then respawned.
+        """
+        key = hashlib.sha1(script.encode()).hexdigest()
+        pending = _Pending()
+
+        with self._lock:
+            proc = self._ensure_started()
+            request_id = next(self._ids)
+            request = {"id": request_id, "key": key}
+            if key not in self._compiled:
+                request["script"] = script
+                self._compiled.add(key)
+            self._pending[request_id] = pending
+            try:
+                proc.stdin.write(json.dumps(request) + "\n")
+                proc.stdin.flush()
+            except OSError as e:
+                self._pending.pop(request_id, None)
+                self._discard(proc, f"pipe closed ({e})")
+                raise ScriptHostError(f"Script host pipe closed: {e}") from e
+
+        deadline = self.timeout if timeout is None else timeout
+        if not pending.event.wait(deadline):
+            with self._lock:
+                self._pending.pop(request_id, None)
+                self._discard(proc, f"request {request_id} missed its {deadline:.2f}s deadline")
+            raise ScriptTimeout(f"Script did not finish within {deadline:.2f}s")
+
+        response = pending.response
+        if response is None:
+            raise ScriptHostError("Script host exited before answering")
+        if not response.get("ok"):
+            # Compilation failed or the host lost the script; resend it next time.
+            with self._lock:
+                self._compiled.discard(key)
+            raise ScriptHostError(response.get("error", "unknown error"))
+        return response.get("result", "")
+
+    def close(self):
+        """Stop the host process, failing any requests still in flight."""
+        with self._lock:
+            if self._proc is not None:
+                self._discard(self._proc, "closed")
+
+    def _ensure_started(self) -> subprocess.Popen:
+        if self._proc is not None and self._proc.poll() is None:
+            return self._proc
+        if self._proc is not None:
+            self._discard(self._proc, "exited")
+
+        try:
+            proc = subprocess.Popen(
+                self.command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                bufsize=1,
+            )
+        except OSError as e:
+            raise ScriptHostError(f"Failed to start script host: {e}") from e
+
+        self._proc = proc
+        self.spawns += 1
+        threading.Thread(target=self._read, args=(proc,), daemon=True).start()
+        return proc
+
+    def _read(self, proc: subprocess.Popen):
+        for line in proc.stdout:
+            try:
+                response = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            with self._lock:
+                pending = self._pending.pop(response.get("id"), None) if self._proc is proc else None
+            if pending is not None:
+                pending.response = response
+                pending.event.set()
+
+        with self._lock:
+            if self._proc is proc:
+                self._discard(proc, "exited")
+        proc.wait()
+
+    def _discard(self, proc: subprocess.Popen, reason: str):
+        """Kill a host process and fail its pending requests. Caller holds the lock."""
+        if self._proc is not proc:
+            return
+        if reason != "closed":
+            l.warning(f"Script host restarting: {reason}")
+
+        self._proc = None
+        self._compiled.clear()
+        pending, self._pending = self._pending, {}
+        for request in pending.values():
+            request.event.set()
+
+        try:
+            proc.kill()
+        except OSError:
+            pass
+
+
+class AsyncScriptHost:
+    """
+    asyncio counterpart of ScriptHost, speaking the same protocol to the same
+    host command. Responses are read by a task on the event loop instead of a
+    thread, and deadlines are enforced with asyncio timeouts.
+    """
+
+    # Longest response line accepted from the host.
+    LINE_LIMIT = 1 << 20
+
+    def __init__(self, command: list[str] | None = None, timeout: float = DEFAULT_TIMEOUT):
+        self.command: list[str] = list(command or DEFAULT_COMMAND)
+        self.timeout: float = timeout
+        self.spawns: int = 0
+
+        self._lock = asyncio.Lock()
+        self._ids = itertools.count(1)
+        self._proc: asyncio.subprocess.Process | None = None
+        self._reader: asyncio.Task | None = None
+        self._pending: dict[int, asyncio.Future] = {}
+        self._compiled: set[str] = set()
+
+    async def run(self, script: str, timeout: float | None = None) -> str:
+        """
+        Run a script and return its result as a string.
+        Raises ScriptTimeout if the deadline passes; the host is then respawned.
+        """
+        key = hashlib.sha1(script.encode()).hexdigest()
+        future = asyncio.get_running_loop().create_future()
+
+        async with self._lock:
+            proc = await self._ensure_started()
+            request_id = next(self._ids)
+            request = {"id": request_id, "key": key}
+            if key not in self._compiled:
+                request["script"] = script
+                self._compiled.add(key)
+            self._pending[request_id] = future
+            try:
+                proc.stdin.write((json.dumps(request) + "\n").encode())
+                await proc.stdin.drain()
+            except (OSError, RuntimeError) as e:
+                self._pending.pop(request_id, None)
+                self._discard(proc, f"pipe closed ({e})")
+                raise ScriptHostError(f"Script host pipe closed: {e}") from e
+
+        deadline = self.timeout if timeout is None else timeout
+        try:
+            response = await asyncio.wait_for(future, deadline)
+        except TimeoutError:
+            self._pending.pop(request_id, None)
+            self._discard(proc, f"request {request_id} missed its {deadline:.2f}s deadline")
+            raise ScriptTimeout(f"Script did not finish within {deadline:.2f}s") from None
+
+        if response is None:
+            raise ScriptHostError("Script host exited before answering")
+        if not response.get("ok"):
+            # Compilation failed or the host lost the script; resend it next time.
+            self._compiled.discard(key)
+            raise ScriptHostError(response.get("error", "unknown error"))
+        return response.get("result", "")
+
+    def close(self):
+        """Stop the host process, failing any requests still in flight."""
+        if self._proc is not None:
+            self._discard(self._proc, "closed")
+
+    async def wait_closed(self):
+        """Wait until the process stopped by close() has exited."""
+        if self._reader is not None:
+            await self._reader
+
+    async def _ensure_started(self) -> asyncio.subprocess.Process:
+        if self._proc is not None and self._proc.returncode is None:
+            return self._proc
+        if self._proc is not None:
+            self._discard(self._proc, "exited")
+
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *self.command,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+                limit=self.LINE_LIMIT,
+            )
+        except OSError as e:
+            raise ScriptHostError(f"Failed to start script host: {e}") from e
+
+        self._proc = proc
+        self.spawns += 1
+        self._reader = asyncio.create_task(self._read(proc))
+        return proc
+
+    async def _read(self, proc: asyncio.subprocess.Process):
+        try:
+            while line := await proc.stdout.readline():
+                try:
+                    response = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                future = self._pending.pop(response.get("id"), None) if self._proc is proc else None
+                if future is not None and not future.done():
+                    future.set_result(response)
+        except (OSError, ValueError):
+            pass
+
+        if self._proc is proc:
+            self._discard(proc, "exited")
+        await proc.wait()
+
+    def _discard(self, proc: asyncio.subprocess.Process, reason: str):
+        """Kill a host process and fail its pending requests."""
+        if self._proc is not proc:
+            return
+        if reason != "closed":
+            l.warning(f"Script host restarting: {reason}")
+
+        self._proc = None
+        self._compiled.clear()
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_result(None)
+
+        try:
+            proc.kill()
+        except (OSError, ProcessLookupError):
+            pass
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import marshal
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Any, NamedTuple
+
+_STRING = r'"[^"\\\n]*+(?:\\.[^"\\\n]*+)*+"'
+# What may come between a trailing comma and the bracket it precedes.
+_GAP = r"(?:[ \t\n\r]++|//[^\n]*+|(?>/\*[\s\S]*?\*/))*+"
+# One token per match: a run of JSON to keep (anything but slashes, with its
+# strings and the commas that aren't trailing), a line comment, a block
+# comment (unterminated ones run to the end) or a trailing comma. Only runs
+# and block comments are captured, so splitting on it drops the rest.
+_TOKEN = re.compile(
+    rf'((?:[^"/,]++|{_STRING}|,(?!{_GAP}[}}\]]))++)'
+    r"|//[^\n]*+"
+    r"|(/\*(?:[\s\S]*?\*/|[\s\S]*+))"
+    r"|,"
+)
+# For loads(): a // that isn't part of a URL's ://, and a comma that ends a
+# line before a closing bracket.
+_LINE_COMMENT = re.compile(r"//(?<!://)[^\n]*+")
+_LINE_END_COMMA = re.compile(r",(?=[ \t\r]*+\n[ \t\n\r]*+[}\]])")
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "mark"
+
+
+def strip(text: str) -> str:
+    """
+    Remove // and /* */ comments and trailing commas from JSONC text,
+    leaving strings alone (so "https://..." stays intact). Block comments are
+    replaced by whitespace with the same line breaks, so JSON errors point at
+    the right line.
+
+    Tokenizes the text in a single pass of _TOKEN, which skips over each
+    string whole (escapes included) in C, and joins the runs it keeps.
+    """
+    parts = _TOKEN.split(text)
+    if "/*" in text:
+        parts[2::3] = [comment and _blank(comment, text) for comment in parts[2::3]]
+    return "".join(filter(None, parts))
+
+
+def loads(text: str) -> Any:
+    """
+    Parse JSONC: JSON with // and /* */ comments and trailing commas. Raises
+    json.JSONDecodeError if it is invalid.
+
+    Without block comments, it first cuts each line at its first // (other
+    than a URL's ://) and then at trailing commas that end a line, which is
+    several times faster than tokenizing, and tokenizes only if json.loads
+    rejects the result. That is exact: a string cut that way runs into a
+    line break, which json.loads rejects, as it does a // left in outside
+    a string.
+    """
+    if "/*" not in text:
+        stripped = _LINE_COMMENT.sub("", text)
+        try:
+            return json.loads(stripped)
+        except json.JSONDecodeError:
+            pass
+        try:
+            return json.loads(_LINE_END_COMMA.sub("", stripped))
+        except json.JSONDecodeError:
+            pass
+    return json.loads(strip(text))
+
+
+def _blank(comment: str, text: str) -> str:
+    if len(comment) < 4 or not comment.endswith("*/"):
+        raise json.JSONDecodeError("Unterminated comment", text, len(text) - len(comment))
+    lines = comment.count("\n")
+    if not lines:
+        return " " * len(comment)
+    return "\n" * lines + " " * (len(comment) - comment.rfind("\n") - 1)
+
+
+class CacheKey(NamedTuple):
+    path: str
+    mtime_ns: int
+    size: int
+
+
+class ParseCache:
+    """
+    On-disk cache of parsed files, keyed by path, mtime and size, so a file
+    that hasn't changed since it was last parsed is not parsed again.
+    Entries are stored with marshal; a missing, stale or unreadable entry is
+    a miss, and failing to write one is ignored.
+    """
+
+    def __init__(self, directory: str | os.PathLike = DEFAULT_CACHE_DIR):
+        self.directory: Path = Path(directory)
+
+    def key(self, path: str | os.PathLike) -> CacheKey:
+        """The cache key of a file as it is now. Raises OSError if it can't be read."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        return CacheKey(path, stat.st_mtime_ns, stat.st_size)
+
+    def get(self, key: CacheKey) -> Any | None:
+        try:
+            # Reading the file whole is much faster than marshal.load(f)
+            version, python, cached_key, data = marshal.loads(self._entry(key).read_bytes())
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if version != CACHE_VERSION or python != _python() or tuple(cached_key) != key:
+            return None
+        return data
+
+    def put(self, key: CacheKey, data: Any):
+        entry = self._entry(key)
+        temp = entry.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(temp, "wb") as f:
+                marshal.dump((CACHE_VERSION, _python(), tuple(key), data), f)
+            os.replace(temp, entry)
+        except (OSError, ValueError):
+            try:
+                os.unlink(temp)
+            except OSError:
+                pass
+
+    def _entry(self, key: CacheKey) -> Path:
+        name = hashlib.sha1(key.path.encode()).hexdigest()[:16]
+        return self.directory / f"parsed-{name}.marshal"
+
+
+def _python() -> tuple[int, int]:
+    # The marshal format may change between Python versions.
+    return sys.version_info[:2]
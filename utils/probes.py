@@ -0,0 +1,131 @@
+import asyncio
+import atexit
+import queue
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .host import AsyncScriptHost, ScriptHost
+
+DEFAULT_WORKERS = 4
+DEFAULT_TIMEOUT = 2.0
+
+
+class ProbeRunner:
+    """
+    Runs probe scripts concurrently on a bounded pool of script hosts.
+
+    Each worker has its own host, so a probe stuck on an unresponsive app only
+    blocks (and, once its deadline passes, restarts) that one host. Deadlines
+    are looked up by probe name, then by the part before ':' for parametric
+    probes, then fall back to the default timeout.
+    """
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        timeout: float = DEFAULT_TIMEOUT,
+        timeouts: dict[str, float] | None = None,
+        host_factory: Callable[[], ScriptHost] = ScriptHost,
+    ):
+        self.workers: int = max(1, workers)
+        self.timeout: float = timeout
+        self.timeouts: dict[str, float] = dict(timeouts or {})
+        # Last successfully fetched value of every probe, for stale fallbacks.
+        self.last: dict[str, str] = {}
+
+        self._hosts: queue.SimpleQueue[ScriptHost] = queue.SimpleQueue()
+        self._all_hosts: list[ScriptHost] = []
+        for _ in range(self.workers):
+            host = host_factory()
+            self._all_hosts.append(host)
+            self._hosts.put(host)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="probe"
+        )
+
+    def deadline(self, name: str) -> float:
+        if name in self.timeouts:
+            return self.timeouts[name]
+        return self.timeouts.get(name.split(":", 1)[0], self.timeout)
+
+    def run(self, script: str, timeout: float) -> str:
+        """Run a script on the next free host. Raises ScriptHostError on failure."""
+        host = self._hosts.get()
+        try:
+            return host.run(script, timeout=timeout)
+        finally:
+            self._hosts.put(host)
+
+    def submit(self, fn: Callable[..., dict[str, str]], *args) -> Future:
+        return self._executor.submit(fn, *args)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for host in self._all_hosts:
+            host.close()
+
+
+class AsyncProbeRunner:
+    """
+    asyncio counterpart of ProbeRunner: probes run concurrently as tasks on a
+    bounded pool of async script hosts, with the same per-probe deadlines.
+    """
+
+    deadline = ProbeRunner.deadline
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        timeout: float = DEFAULT_TIMEOUT,
+        timeouts: dict[str, float] | None = None,
+        host_factory: Callable[[], AsyncScriptHost] = AsyncScriptHost,
+    ):
+        self.workers: int = max(1, workers)
+        self.timeout: float = timeout
+        self.timeouts: dict[str, float] = dict(timeouts or {})
+        # Last successfully fetched value of every probe, for stale fallbacks.
+        self.last: dict[str, str] = {}
+
+        self._hosts: asyncio.Queue[AsyncScriptHost] = asyncio.Queue()
+        self._all_hosts: list[AsyncScriptHost] = []
+        for _ in range(self.workers):
+            host = host_factory()
+            self._all_hosts.append(host)
+            self._hosts.put_nowait(host)
+
+    async def run(
+        self, script: str, timeout: float, started: Callable[[], None] | None = None
+    ) -> str:
+        """
+        Run a script on the next free host, calling started() once it has
+        one. Raises ScriptHostError on failure.
+        """
+        host = await self._hosts.get()
+        try:
+            if started is not None:
+                started()
+            return await host.run(script, timeout=timeout)
+        finally:
+            self._hosts.put_nowait(host)
+
+    def close(self):
+        for host in self._all_hosts:
+            host.close()
+
+    async def wait_closed(self):
+        """Wait until the hosts stopped by close() have exited."""
+        await asyncio.gather(*(host.wait_closed() for host in self._all_hosts))
+
+
+_runner: ProbeRunner | None = None
+
+
+def default_runner() -> ProbeRunner:
+    """
+    Returns the shared probe runner, creating it on first use.
+    """
+    global _runner
+    if _runner is None:
+        _runner = ProbeRunner()
+        atexit.register(_runner.close)
+    return _runner
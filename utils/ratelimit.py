@@ -0,0 +1,117 @@
+import threading
+import time
+from collections.abc import Callable, Mapping
+
+from .constants import MIN_RATE_LIMIT
+
+
+class Bucket:
+    """
+    Token bucket for one Discord rate limit bucket: `remaining` requests may
+    be sent until `reset_at`, when the bucket refills to `limit`.
+    """
+
+    __slots__ = ("limit", "remaining", "reset_at")
+
+    def __init__(self, limit: int, remaining: int, reset_at: float):
+        self.limit: int = limit
+        self.remaining: int = remaining
+        self.reset_at: float = reset_at
+
+    def refill(self, now: float):
+        if now >= self.reset_at:
+            self.remaining = self.limit
+
+    def delay(self, now: float) -> float:
+        self.refill(now)
+        return 0.0 if self.remaining > 0 else max(0.0, self.reset_at - now)
+
+
+class RateLimiter:
+    """
+    Tracks Discord's rate limits from response headers so requests are only
+    sent when they will succeed.
+
+    Routes are mapped to buckets via X-RateLimit-Bucket, and each bucket keeps
+    the remaining count and reset time from X-RateLimit-Remaining and
+    X-RateLimit-Reset-After. A 429 empties the bucket (or, for a global limit,
+    blocks every route) for Retry-After seconds. Until a route's bucket is
+    known, requests on it are spaced at least min_interval apart.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = MIN_RATE_LIMIT,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.min_interval: float = min_interval
+        self.clock: Callable[[], float] = clock
+        self.throttled: int = 0
+
+        self._lock = threading.Lock()
+        self._routes: dict[str, str] = {}
+        self._buckets: dict[str, Bucket] = {}
+        self._last_sent: dict[str, float] = {}
+        self._global_until: float = 0.0
+
+    def delay(self, route: str) -> float:
+        """Seconds to wait before a request on this route will succeed."""
+        with self._lock:
+            now = self.clock()
+            wait = max(0.0, self._global_until - now)
+            bucket = self._buckets.get(self._routes.get(route, ""))
+            if bucket is not None:
+                wait = max(wait, bucket.delay(now))
+            elif route in self._last_sent:
+                wait = max(wait, self._last_sent[route] + self.min_interval - now)
+            return wait
+
+    def acquire(self, route: str):
+        """Take a token for a request about to be sent on this route."""
+        with self._lock:
+            now = self.clock()
+            self._last_sent[route] = now
+            bucket = self._buckets.get(self._routes.get(route, ""))
+            if bucket is not None:
+                bucket.refill(now)
+                bucket.remaining = max(0, bucket.remaining - 1)
+
+    def update(self, route: str, status: int, headers: Mapping[str, str], body: dict | None = None):
+        """Update the model from a response's status and headers."""
+        with self._lock:
+            now = self.clock()
+            bucket_id = headers.get("X-RateLimit-Bucket") or self._routes.get(route) or route
+            self._routes[route] = bucket_id
+
+            limit = _number(headers.get("X-RateLimit-Limit"))
+            remaining = _number(headers.get("X-RateLimit-Remaining"))
+            reset_after = _number(headers.get("X-RateLimit-Reset-After"))
+            if limit is not None and remaining is not None and reset_after is not None:
+                self._buckets[bucket_id] = Bucket(int(limit), int(remaining), now + reset_after)
+
+            if status != 429:
+                return
+
+            self.throttled += 1
+            retry_after = _number(headers.get("Retry-After"))
+            if body and _number(body.get("retry_after")) is not None:
+                # The body carries the more precise (fractional) value.
+                retry_after = _number(body.get("retry_after"))
+            retry_after = retry_after if retry_after is not None else self.min_interval
+
+            is_global = headers.get("X-RateLimit-Global", "").lower() == "true" or (
+                body is not None and body.get("global") is True
+            )
+            if is_global or headers.get("X-RateLimit-Scope") == "global":
+                self._global_until = max(self._global_until, now + retry_after)
+            else:
+                bucket = self._buckets.setdefault(bucket_id, Bucket(1, 0, 0.0))
+                bucket.remaining = 0
+                bucket.reset_at = max(bucket.reset_at, now + retry_after)
+
+
+def _number(value) -> float | None:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
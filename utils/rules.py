@@ -0,0 +1,127 @@
+import re
+from collections import OrderedDict
+from collections.abc import Iterable
+from string import Formatter
+from typing import NamedTuple
+
+from .types import PluginStatus
+
+# What a rule's patterns can be matched against.
+FIELDS = ("title", "url")
+
+# Apps whose active tab URL can be read, so their rules can match "url".
+URL_APPS = frozenset({"company.thebrowser.browser"})
+
+# Number of (app, title, url) results RuleSet remembers.
+MEMO_SIZE = 256
+
+
+class Rule(NamedTuple):
+    """
+    Show status while app is frontmost and its window title and URL match
+    the title and url patterns (searched for anywhere; empty matches
+    anything). Named groups can be used in the status text as {name}, and
+    so can {title} and {url}. Only apps in URL_APPS have a URL.
+    """
+
+    app: str
+    title: str
+    url: str
+    status: PluginStatus
+
+
+def check_rule(rule: Rule):
+    """Raise ValueError if rule can't be compiled."""
+    has_url = rule.app in URL_APPS
+    if rule.url and not has_url:
+        raise ValueError(f"url: only rules for {', '.join(sorted(URL_APPS))} can match a URL")
+    groups = set(FIELDS) if has_url else set(FIELDS) - {"url"}
+    for field, pattern in zip(FIELDS, (rule.title, rule.url)):
+        try:
+            groups |= set(re.compile(pattern).groupindex)
+        except re.error as e:
+            raise ValueError(f"{field}: invalid pattern: {e}") from None
+    for _, name, _, _ in Formatter().parse(rule.status[1]):
+        if name is not None and name not in groups:
+            raise ValueError(f"status: unknown placeholder {{{name}}}")
+    # Every value is a string, so a format spec that doesn't fit one fails now
+    try:
+        rule.status[1].format_map(dict.fromkeys(groups, ""))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"status: {e}") from None
+
+
+class _Compiled(NamedTuple):
+    title: re.Pattern | None
+    url: re.Pattern | None
+    status: PluginStatus
+
+
+class RuleSet:
+    """
+    Title and URL rules, compiled once and grouped by app, so only the rules
+    of the focused app are tried. Window titles rarely change from one tick
+    to the next, so the last MEMO_SIZE results are remembered and an
+    unchanged title costs a dict lookup.
+    """
+
+    def __init__(self, rules: Iterable[Rule] = ()):
+        self.rules: tuple[Rule, ...] = tuple(rules)
+        self._by_app: dict[str, list[_Compiled]] = {}
+        for rule in self.rules:
+            check_rule(rule)
+            self._by_app.setdefault(rule.app, []).append(
+                _Compiled(
+                    re.compile(rule.title) if rule.title else None,
+                    re.compile(rule.url) if rule.url else None,
+                    rule.status,
+                )
+            )
+        self._memo: OrderedDict[tuple[str, str, str], PluginStatus | None] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, RuleSet):
+            return NotImplemented
+        return self.rules == other.rules
+
+    @property
+    def apps(self) -> frozenset[str]:
+        """Apps that have rules."""
+        return frozenset(self._by_app)
+
+    def uses_url(self, app: str) -> bool:
+        """True if any rule for app has a URL pattern."""
+        return any(rule.url is not None for rule in self._by_app.get(app, ()))
+
+    def match(self, app: str, title: str, url: str = "") -> PluginStatus | None:
+        """The status of the first rule for app that matches, or None."""
+        key = (app, title, url)
+        if key in self._memo:
+            self._memo.move_to_end(key)
+            return self._memo[key]
+
+        status = self._match(app, title, url)
+        self._memo[key] = status
+        if len(self._memo) > MEMO_SIZE:
+            self._memo.popitem(last=False)
+        return status
+
+    def _match(self, app: str, title: str, url: str) -> PluginStatus | None:
+        for rule in self._by_app.get(app, ()):
+            title_match = rule.title.search(title) if rule.title is not None else None
+            if rule.title is not None and title_match is None:
+                continue
+            url_match = rule.url.search(url) if rule.url is not None else None
+            if rule.url is not None and url_match is None:
+                continue
+
+            values = {"title": title, "url": url}
+            for match in (title_match, url_match):
+                if match is not None:
+                    values.update((k, v or "") for k, v in match.groupdict().items())
+            emoji, text, status_type = rule.status
+            return (emoji, text.format_map(values), status_type)
+        return None
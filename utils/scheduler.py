@@ -0,0 +1,194 @@
+import asyncio
+import time
+from collections.abc import Awaitable, Callable, Iterable
+
+from .events import CLOCK, AsyncEventBus, Event, EventBus, EventSource
+from .governor import SamplingGovernor
+from .timers import TimerHeap
+
+DEFAULT_POLL_INTERVAL = 30.0
+
+# Timers fire this long after their deadline, so that the wall clock has
+# visibly passed it when the tick runs.
+TIMER_SLACK = 0.01
+
+# How often the asyncio scheduler gives the main run loop a turn.
+PUMP_INTERVAL = 0.1
+
+
+class Scheduler:
+    """
+    Runs a tick whenever events arrive on the bus, and at the latest every
+    poll_interval seconds as a fallback for changes nothing reports.
+
+    The tick receives the events that woke it and may return a delay in
+    seconds after which it wants to run again (for example when an update was
+    held back by the rate limit); otherwise it returns None.
+
+    With a governor, the poll interval comes from the governor instead, and
+    ticks are held back (collecting the events that arrive meanwhile) for as
+    long as the governor asks.
+
+    wake_at() sets a named timer for a wall-clock instant (for example the
+    next minute boundary when the status shows the time). When it fires, the
+    tick runs with a CLOCK event carrying the timer's name.
+    """
+
+    def __init__(
+        self,
+        bus: EventBus,
+        tick: Callable[[list[Event]], float | None],
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        sources: Iterable[EventSource] = (),
+        clock: Callable[[], float] = time.monotonic,
+        governor: SamplingGovernor | None = None,
+    ):
+        self.bus: EventBus = bus
+        self.tick: Callable[[list[Event]], float | None] = tick
+        self.poll_interval: float = poll_interval
+        self.sources: list[EventSource] = list(sources)
+        self.clock: Callable[[], float] = clock
+        self.governor: SamplingGovernor | None = governor
+        self.timers: TimerHeap = TimerHeap()
+
+        self._retry_at: float | None = None
+        self._running: bool = False
+
+    def start(self):
+        for source in self.sources:
+            source.start(self.bus)
+        self._running = True
+        # Run the first tick straight away.
+        self._retry_at = self.clock()
+
+    def stop(self):
+        self._running = False
+        for source in self.sources:
+            source.stop()
+
+    def wake_at(self, key: str, at: float | None):
+        """
+        Run a tick at the given time.time() instant; replaces the timer of the
+        same name. None cancels it.
+        """
+        if at is None:
+            self.timers.cancel(key)
+        else:
+            self.timers.schedule(key, self.clock() + (at - time.time()) + TIMER_SLACK)
+
+    def next_timeout(self) -> float:
+        """Seconds until the next tick is due if no event arrives."""
+        timeout = self.poll_interval if self.governor is None else self.governor.interval()
+        if self._retry_at is not None:
+            timeout = min(timeout, self._retry_at - self.clock())
+        if (deadline := self.timers.next_deadline()) is not None:
+            timeout = min(timeout, deadline - self.clock())
+        return max(0.0, timeout)
+
+    def _fired(self) -> list[Event]:
+        now = self.clock()
+        return [Event(CLOCK, key, now) for key in self.timers.pop_due(now)]
+
+    def run_once(self) -> list[Event]:
+        """Wait for events or the next due tick, run the tick, and return the events."""
+        events = self.bus.wait(self.next_timeout())
+        deadline = self._hold_until()
+        while (remaining := deadline - self.clock()) > 0:
+            events += self.bus.wait(remaining)
+        events += self._fired()
+        if self.governor is not None:
+            self.governor.begin()
+        retry = self.tick(events)
+        self._retry_at = None if retry is None else self.clock() + retry
+        if self.governor is not None:
+            self.governor.update()
+        return events
+
+    def run(self):
+        self.start()
+        while self._running:
+            self.run_once()
+
+    def _hold_until(self) -> float:
+        return self.clock() + (0.0 if self.governor is None else self.governor.hold())
+
+
+class AsyncScheduler(Scheduler):
+    """
+    Scheduler for the asyncio engine, with the same wake-up rules.
+
+    The tick is a coroutine. Polling sources run on timers instead of their
+    own threads, and if a pump callback is given it is called with a zero
+    timeout every PUMP_INTERVAL seconds so main-thread run loop notifications
+    still arrive. stop() cancels every timer and the tick in progress.
+    """
+
+    def __init__(
+        self,
+        bus: AsyncEventBus,
+        tick: Callable[[list[Event]], Awaitable[float | None]],
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        sources: Iterable[EventSource] = (),
+        pump: Callable[[float], None] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        governor: SamplingGovernor | None = None,
+    ):
+        super().__init__(bus, tick, poll_interval, sources, clock, governor)
+        self.pump: Callable[[float], None] | None = pump
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self):
+        for source in self.sources:
+            if source.interval is None:
+                source.start(self.bus)
+            else:
+                self._tasks.append(asyncio.create_task(self._poll(source)))
+        if self.pump is not None:
+            self._tasks.append(asyncio.create_task(self._pump()))
+        self._running = True
+        # Run the first tick straight away.
+        self._retry_at = self.clock()
+
+    def stop(self):
+        self._running = False
+        for source in self.sources:
+            if source.interval is None:
+                source.stop()
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+
+    async def run_once(self) -> list[Event]:
+        """Wait for events or the next due tick, run the tick, and return the events."""
+        events = await self.bus.wait(self.next_timeout())
+        deadline = self._hold_until()
+        while (remaining := deadline - self.clock()) > 0:
+            events += await self.bus.wait(remaining)
+        events += self._fired()
+        if self.governor is not None:
+            self.governor.begin()
+        retry = await self.tick(events)
+        self._retry_at = None if retry is None else self.clock() + retry
+        if self.governor is not None:
+            self.governor.update()
+        return events
+
+    async def run(self):
+        self.start()
+        self._tasks.append(asyncio.current_task())
+        try:
+            while self._running:
+                await self.run_once()
+        except asyncio.CancelledError:
+            if self._running:
+                raise
+
+    async def _poll(self, source: EventSource):
+        while True:
+            await source.poll_async(self.bus)
+            await asyncio.sleep(source.interval)
+
+    async def _pump(self):
+        while True:
+            self.pump(0)
+            await asyncio.sleep(PUMP_INTERVAL)
@@ -0,0 +1,562 @@
+import asyncio
+import math
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+
+from .apps import AppIndex
+from .breaker import BreakerBoard
+from .cache import FOCUS_CHANGED, MEDIA_CHANGED, MISS, ProbeCache
+from .host import ScriptHostError, ScriptTimeout
+from .metrics import metrics
+from .probes import AsyncProbeRunner, ProbeRunner, default_runner
+
+# Snapshot fields. Plugins declare which of these they need and the
+# snapshot script only asks for those.
+FRONTMOST = "frontmost"
+PROCESSES = "processes"
+FRONTMOST_TITLE = "frontmost_title"
+ARC_URL = "arc_url"
+ARC_TITLE = "arc_title"
+VSCODE_TITLE = "vscode_title"
+
+# Parametric fields, keyed by bundle ID (e.g. "title:dev.zed.zed").
+TITLE_PREFIX = "title:"
+TRACK_PREFIX = "track:"
+
+# Media apps that can report a current track, by bundle ID.
+TRACK_APPS = {
+    "com.spotify.client": "Spotify",
+    "com.apple.music": "Music",
+}
+
+# Field states
+FRESH = "fresh"  # fetched this tick
+CACHED = "cached"  # served from the probe cache
+STALE = "stale"  # probe failed or missed its deadline; last known value
+TIMED_OUT = "timed_out"  # probe failed or missed its deadline, with no earlier value
+DEGRADED = "degraded"  # probe skipped because its app's circuit breaker is open
+QUEUED = "queued"  # no probe host came free in time; last known value, or empty
+
+# Scripting target of fields that only talk to System Events.
+SYSTEM_EVENTS = "com.apple.systemevents"
+
+# Extra time allowed past the longest probe deadline before giving up on a group.
+DEADLINE_GRACE = 0.25
+
+# Metric names
+PROBE_SECONDS = "mark_probe_seconds"
+PROBE_FAILURES = "mark_probe_failures_total"
+SNAPSHOT_FIELDS = "mark_snapshot_fields_total"
+
+RECORD_SEP = "\x1e"
+UNIT_SEP = "\x1f"
+
+NO_TRACK = ("", "", False)
+
+_FRAGMENTS = {
+    FRONTMOST: """
+        tell application "System Events" to set v to bundle identifier of first process whose frontmost is true
+    """,
+    PROCESSES: """
+        tell application "System Events" to set ids to bundle identifier of every process
+        set AppleScript's text item delimiters to US
+        set v to ids as text
+    """,
+    FRONTMOST_TITLE: """
+        tell application "System Events"
+            tell (first process whose frontmost is true)
+                if (count of windows) > 0 then set v to value of attribute "AXTitle" of window 1
+            end tell
+        end tell
+    """,
+    ARC_URL: """
+        if application "Arc" is running then
+            tell application "Arc"
+                if (count of windows) > 0 then
+                    tell front window
+                        if (count of tabs) > 0 then set v to URL of active tab
+                    end tell
+                end if
+            end tell
+        end if
+    """,
+    ARC_TITLE: """
+        if application "Arc" is running then
+            tell application "Arc"
+                if (count of windows) > 0 then
+                    tell front window
+                        if (count of tabs) > 0 then set v to title of active tab
+                    end tell
+                end if
+            end tell
+        end if
+    """,
+    VSCODE_TITLE: """
+        tell application "System Events"
+            if exists process "Code" then
+                tell process "Code"
+                    if (count of windows) > 0 then set v to value of attribute "AXTitle" of window 1
+                end tell
+            end if
+        end tell
+    """,
+}
+
+_TITLE_FRAGMENT = """
+        tell application "System Events"
+            set matches to every application process whose bundle identifier is "{bundle}"
+            if (count of matches) > 0 then
+                tell item 1 of matches
+                    if (count of windows) > 0 then set v to name of front window
+                end tell
+            end if
+        end tell
+"""
+
+_PID_TITLE_FRAGMENT = """
+        tell application "System Events"
+            tell (first application process whose unix id is {pid})
+                if (count of windows) > 0 then set v to name of front window
+            end tell
+        end tell
+"""
+
+_TRACK_FRAGMENT = """
+        if application "{app}" is running then
+            tell application "{app}"
+                if player state is playing then set v to (name of current track) & US & (artist of current track)
+            end tell
+        end if
+"""
+
+
+def title_field(bundle: str) -> str:
+    """Snapshot field for the front window title of the app with this bundle ID."""
+    return TITLE_PREFIX + bundle
+
+
+def track_field(bundle: str) -> str:
+    """Snapshot field for the current track of the media app with this bundle ID."""
+    return TRACK_PREFIX + bundle
+
+
+@dataclass(frozen=True, slots=True)
+class Snapshot:
+    """
+    System state collected for a single tick.
+    Fields that were not requested keep their empty defaults.
+    """
+
+    frontmost: str = ""
+    processes: frozenset[str] = frozenset()
+    frontmost_title: str = ""
+    arc_url: str = ""
+    arc_title: str = ""
+    vscode_title: str = ""
+    titles: dict[str, str] = field(default_factory=dict)
+    tracks: dict[str, tuple[str, str, bool]] = field(default_factory=dict)
+    fields: frozenset[str] = frozenset()
+    states: dict[str, str] = field(default_factory=dict)
+    degraded: frozenset[str] = frozenset()
+
+    def running(self, bundle: str) -> bool:
+        """Return True if an app with this bundle ID was running."""
+        return bundle.lower() in self.processes
+
+    def title(self, bundle: str) -> str:
+        """Return the front window title of the given app, or an empty string."""
+        return self.titles.get(bundle, "")
+
+    def track(self, bundle: str) -> tuple[str, str, bool]:
+        """Return (track_title, artist_name, is_playing) for the given media app."""
+        return self.tracks.get(bundle, NO_TRACK)
+
+    def state(self, name: str) -> str:
+        """Return how a field's value was obtained (FRESH, CACHED, STALE, TIMED_OUT, DEGRADED or QUEUED)."""
+        return self.states.get(name, FRESH)
+
+    def is_degraded(self, bundle: str) -> bool:
+        """Return True if the app's probes were skipped by its circuit breaker."""
+        return bundle in self.degraded
+
+
+def polled(name: str) -> bool:
+    """
+    True if no event reports changes to a field, so they are only seen by
+    sampling again: window titles and tab URLs change without the frontmost
+    app changing, while tracks and running apps come with MEDIA and app events.
+    """
+    return name in (FRONTMOST_TITLE, ARC_URL, ARC_TITLE, VSCODE_TITLE) or name.startswith(
+        TITLE_PREFIX
+    )
+
+
+def _fragment(name: str, apps: AppIndex | None = None) -> str | None:
+    if name in _FRAGMENTS:
+        return _FRAGMENTS[name]
+    if name.startswith(TITLE_PREFIX):
+        bundle = name.removeprefix(TITLE_PREFIX)
+        if apps is not None:
+            # The index already knows the process, so skip the bundle ID scan.
+            app = apps.get(bundle)
+            return _PID_TITLE_FRAGMENT.format(pid=app.pid) if app else None
+        return _TITLE_FRAGMENT.format(bundle=bundle)
+    if name.startswith(TRACK_PREFIX):
+        app = TRACK_APPS.get(name.removeprefix(TRACK_PREFIX))
+        return _TRACK_FRAGMENT.format(app=app) if app else None
+    return None
+
+
+def build_script(fields: list[str], apps: AppIndex | None = None) -> str:
+    """
+    Build one AppleScript that collects every given field and returns the values
+    joined by the record separator, in the same order. A failing field yields an
+    empty value instead of failing the whole script.
+    """
+    parts = [
+        "set RS to character id 30",
+        "set US to character id 31",
+        "set out to {}",
+    ]
+    for name in fields:
+        parts.append(f'set v to ""\ntry\n{_fragment(name, apps)}\nend try\nset end of out to v')
+    parts.append("set AppleScript's text item delimiters to RS")
+    parts.append("return out as text")
+    return "\n".join(parts)
+
+
+def target(name: str) -> str:
+    """Bundle ID of the app a field's script talks to."""
+    if name in (ARC_URL, ARC_TITLE):
+        return "company.thebrowser.browser"
+    if name == VSCODE_TITLE:
+        return "com.microsoft.vscode"
+    if name.startswith(TITLE_PREFIX):
+        return name.removeprefix(TITLE_PREFIX)
+    if name.startswith(TRACK_PREFIX):
+        return name.removeprefix(TRACK_PREFIX)
+    return SYSTEM_EVENTS
+
+
+def _parse(
+    values: dict[str, str],
+    apps: AppIndex | None = None,
+    states: dict[str, str] | None = None,
+    degraded: frozenset[str] = frozenset(),
+) -> Snapshot:
+    kwargs: dict[str, any] = {
+        "titles": {},
+        "tracks": {},
+        "fields": frozenset(values),
+        "states": states or {},
+        "degraded": degraded,
+    }
+    if apps is not None:
+        kwargs["processes"] = apps.bundles()
+    if metrics.enabled:
+        for state in kwargs["states"].values():
+            metrics.inc(SNAPSHOT_FIELDS, state=state)
+    for name, raw in values.items():
+        if name == FRONTMOST:
+            kwargs["frontmost"] = raw.lower()
+        elif name == PROCESSES:
+            kwargs["processes"] = frozenset(
+                bundle.lower()
+                for bundle in raw.split(UNIT_SEP)
+                if bundle and bundle != "missing value"
+            )
+        elif name.startswith(TITLE_PREFIX):
+            kwargs["titles"][name.removeprefix(TITLE_PREFIX)] = raw
+        elif name.startswith(TRACK_PREFIX):
+            title, _, artist = raw.partition(UNIT_SEP)
+            kwargs["tracks"][name.removeprefix(TRACK_PREFIX)] = (
+                (title, artist, True) if raw else NO_TRACK
+            )
+        else:
+            kwargs[name] = raw
+    return Snapshot(**kwargs)
+
+
+def _tags(name: str) -> tuple[str, ...]:
+    """Cache invalidation tags for a field."""
+    if name.startswith(TRACK_PREFIX):
+        return (MEDIA_CHANGED,)
+    return (FOCUS_CHANGED,)
+
+
+def _fetch(
+    names: list[str], runner: ProbeRunner, apps: AppIndex | None, deadline: float
+) -> tuple[dict[str, str], bool]:
+    """
+    Fetch the given fields. Fields that could not be fetched are left out.
+    Returns the values and whether the target timed out, which is the only
+    failure its app is to blame for; a host error or garbled output isn't.
+    """
+    with metrics.time(PROBE_SECONDS, target=target(names[0])):
+        try:
+            raw = runner.run(build_script(names, apps), deadline).strip("\n")
+            values = raw.split(RECORD_SEP)
+            if len(values) != len(names):
+                raise ScriptHostError("snapshot returned an unexpected number of fields")
+            return dict(zip(names, values)), False
+        except ScriptTimeout:
+            # Something is hanging on an Apple Event; retrying field by field
+            # would only wait on it again.
+            return {}, True
+        except ScriptHostError:
+            pass
+
+        values: dict[str, str] = {}
+        for name in names:
+            try:
+                values[name] = runner.run(build_script([name], apps), deadline).strip("\n")
+            except ScriptTimeout:
+                return values, True
+            except ScriptHostError:
+                pass
+        return values, False
+
+
+async def _fetch_async(
+    names: list[str],
+    runner: AsyncProbeRunner,
+    apps: AppIndex | None,
+    deadline: float,
+    started: Callable[[], None] | None = None,
+) -> tuple[dict[str, str], bool]:
+    """Like _fetch, on an AsyncProbeRunner, calling started() whenever a probe gets a host."""
+    with metrics.time(PROBE_SECONDS, target=target(names[0])):
+        try:
+            raw = (await runner.run(build_script(names, apps), deadline, started)).strip("\n")
+            values = raw.split(RECORD_SEP)
+            if len(values) != len(names):
+                raise ScriptHostError("snapshot returned an unexpected number of fields")
+            return dict(zip(names, values)), False
+        except ScriptTimeout:
+            return {}, True
+        except ScriptHostError:
+            pass
+
+        values: dict[str, str] = {}
+        for name in names:
+            try:
+                values[name] = (
+                    await runner.run(build_script([name], apps), deadline, started)
+                ).strip("\n")
+            except ScriptTimeout:
+                return values, True
+            except ScriptHostError:
+                pass
+        return values, False
+
+
+def _plan(
+    fields: Iterable[str],
+    apps: AppIndex | None,
+    cache: ProbeCache | None,
+    breakers: BreakerBoard | None,
+    values: dict[str, str],
+    states: dict[str, str],
+) -> tuple[dict[str, list[str]], frozenset[str]]:
+    """
+    Fill in the fields served from the cache or skipped by an open breaker,
+    and group the rest by target app. Returns the groups to fetch and the
+    degraded targets.
+    """
+    fields = set(fields)
+    if apps is not None:
+        fields.discard(PROCESSES)
+    names = sorted(name for name in fields if _fragment(name, apps) is not None)
+
+    if cache is not None:
+        for name in names:
+            if cache.ttl(name) > 0 and (value := cache.get(name)) is not MISS:
+                values[name] = value
+                states[name] = CACHED
+
+    groups: dict[str, list[str]] = {}
+    for name in names:
+        if name not in values:
+            groups.setdefault(target(name), []).append(name)
+
+    degraded = set()
+    if breakers is not None:
+        for key in list(groups):
+            if not breakers.allow(key):
+                degraded.add(key)
+                for name in groups.pop(key):
+                    values[name] = ""
+                    states[name] = DEGRADED
+    return groups, frozenset(degraded)
+
+
+def _merge(
+    key: str,
+    group: list[str],
+    fetched: dict[str, str],
+    timed_out: bool,
+    started: bool,
+    last: dict[str, str],
+    cache: ProbeCache | None,
+    breakers: BreakerBoard | None,
+    values: dict[str, str],
+    states: dict[str, str],
+):
+    """
+    Record the result of fetching one target's fields. Only a timeout counts
+    against the app's circuit breaker; a target that never got a host, or
+    whose probes failed for reasons of their own, gives back the trial call
+    if its breaker was half-open.
+    """
+    if not started:
+        if breakers is not None:
+            breakers.release(key)
+        for name in group:
+            values[name] = last.get(name, "")
+            states[name] = QUEUED
+        return
+
+    if timed_out or not fetched:
+        metrics.inc(PROBE_FAILURES, target=key)
+    if breakers is not None:
+        if timed_out:
+            breakers.failure(key)
+        elif fetched:
+            breakers.success(key)
+        else:
+            breakers.release(key)
+
+    for name in group:
+        if name in fetched:
+            values[name] = last[name] = fetched[name]
+            states[name] = FRESH
+            if cache is not None:
+                cache.put(name, fetched[name], _tags(name))
+        elif name in last:
+            values[name] = last[name]
+            states[name] = STALE
+        else:
+            values[name] = ""
+            states[name] = TIMED_OUT
+
+
+def _rounds(targets: int, workers: int) -> int:
+    """How many rounds of probes a pool of workers needs for every target."""
+    return math.ceil(targets / max(1, workers))
+
+
+def take_snapshot(
+    fields: Iterable[str],
+    runner: ProbeRunner | None = None,
+    apps: AppIndex | None = None,
+    cache: ProbeCache | None = None,
+    breakers: BreakerBoard | None = None,
+) -> Snapshot:
+    """
+    Collect the given fields, with one script per target app, all running
+    concurrently on the probe runner. A tick takes as long as the slowest
+    target, bounded by its deadline.
+
+    A target that misses its deadline yields the last known values of its
+    fields, marked STALE, or empty values marked TIMED_OUT if there are none.
+    Each target's deadline runs from when it gets a probe host, so targets
+    queued behind slow ones on a small pool still get their full time; one
+    that doesn't get a host within the rounds the pool needs for all targets
+    is cancelled and its fields marked QUEUED.
+
+    With an app index, the process list comes from the index instead of
+    System Events, and window titles of apps that aren't running are skipped.
+    With a cache, fields that are still fresh are not fetched again.
+    With circuit breakers, targets that keep missing their deadlines are
+    skipped for a while; their fields are empty and marked DEGRADED.
+    """
+    runner = runner or default_runner()
+    values: dict[str, str] = {}
+    states: dict[str, str] = {}
+    groups, degraded = _plan(fields, apps, cache, breakers, values, states)
+    if not groups:
+        return _parse(values, apps, states, degraded)
+
+    # When each target got a host
+    started: dict[str, float] = {}
+
+    def fetch(key: str, group: list[str], deadline: float) -> tuple[dict[str, str], bool]:
+        started[key] = time.monotonic()
+        return _fetch(group, runner, apps, deadline)
+
+    futures = {}
+    deadlines = {}
+    for key, group in groups.items():
+        deadlines[key] = max(runner.deadline(name) for name in group)
+        futures[key] = runner.submit(fetch, key, group, deadlines[key])
+
+    give_up = time.monotonic() + _rounds(len(groups), runner.workers) * (
+        max(deadlines.values()) + DEADLINE_GRACE
+    )
+    for key, future in futures.items():
+        while True:
+            begun = started.get(key)
+            until = give_up if begun is None else begun + deadlines[key] + DEADLINE_GRACE
+            try:
+                fetched, timed_out = future.result(timeout=max(0.0, until - time.monotonic()))
+                ran = True
+            except TimeoutError:
+                # Got a host while we waited, so its own deadline applies now
+                if begun is None and (key in started or not future.cancel()):
+                    continue
+                fetched, timed_out, ran = {}, True, begun is not None
+            break
+        _merge(key, groups[key], fetched, timed_out, ran, runner.last, cache, breakers, values, states)
+
+    return _parse(values, apps, states, degraded)
+
+
+async def take_snapshot_async(
+    fields: Iterable[str],
+    runner: AsyncProbeRunner,
+    apps: AppIndex | None = None,
+    cache: ProbeCache | None = None,
+    breakers: BreakerBoard | None = None,
+) -> Snapshot:
+    """
+    Like take_snapshot, with each target's fetch running as a task on an
+    AsyncProbeRunner. A target whose task is still running at its deadline
+    is cancelled.
+    """
+    values: dict[str, str] = {}
+    states: dict[str, str] = {}
+    groups, degraded = _plan(fields, apps, cache, breakers, values, states)
+    if not groups:
+        return _parse(values, apps, states, degraded)
+
+    loop = asyncio.get_running_loop()
+    deadlines = {key: max(runner.deadline(name) for name in group) for key, group in groups.items()}
+    give_up = loop.time() + _rounds(len(groups), runner.workers) * (
+        max(deadlines.values()) + DEADLINE_GRACE
+    )
+
+    async def fetch(key: str, group: list[str]) -> tuple[dict[str, str], bool, bool]:
+        begun = False
+        try:
+            async with asyncio.timeout_at(give_up) as window:
+
+                def started():
+                    # The deadline runs from when the target first gets a host
+                    nonlocal begun
+                    if not begun:
+                        begun = True
+                        window.reschedule(loop.time() + deadlines[key] + DEADLINE_GRACE)
+
+                fetched, timed_out = await _fetch_async(
+                    group, runner, apps, deadlines[key], started
+                )
+                return fetched, timed_out, True
+        except TimeoutError:
+            return {}, True, begun
+
+    results = await asyncio.gather(*(fetch(key, group) for key, group in groups.items()))
+    for (key, group), (fetched, timed_out, ran) in zip(groups.items(), results):
+        _merge(key, group, fetched, timed_out, ran, runner.last, cache, breakers, values, states)
+
+    return _parse(values, apps, states, degraded)
@@ -0,0 +1,115 @@
+import time
+from collections.abc import Callable
+
+from .types import PluginStatus
+
+DEFAULT_SAMPLES = 2
+DEFAULT_WINDOW = 1.0
+DEFAULT_INTERVAL = 0.5
+
+
+class Stabilizer:
+    """
+    Debounces sampled statuses so that flapping between apps doesn't spend
+    API calls on statuses that only last a moment.
+
+    A new status becomes a candidate and is only committed once it has been
+    sampled `samples` times in a row, or has stayed unchanged for `window`
+    seconds, whichever comes first. While a candidate is waiting, the caller
+    should sample again after next_check() seconds. A candidate replaced by a
+    different status before it was committed counts as suppressed.
+
+    Plugins can override samples and window (e.g. samples 1 to commit idle
+    right away); the override of the plugin that produced the candidate
+    applies. The first status is committed immediately, and so is one offered
+    with immediate=True (e.g. a re-render at a clock boundary) if it comes
+    from the plugin of the committed status; from any other plugin it is a
+    switch like any other and has to settle.
+    """
+
+    def __init__(
+        self,
+        samples: int = DEFAULT_SAMPLES,
+        window: float = DEFAULT_WINDOW,
+        interval: float = DEFAULT_INTERVAL,
+        plugins: dict[str, dict[str, float]] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.samples: int = max(1, samples)
+        self.window: float = window
+        self.interval: float = interval
+        self.plugins: dict[str, dict[str, float]] = dict(plugins or {})
+        self.clock: Callable[[], float] = clock
+
+        self.committed: PluginStatus | None = None
+        # Plugin that produced the committed status
+        self.committed_source: str | None = None
+        self.suppressed: int = 0
+
+        self._candidate: PluginStatus | None = None
+        self._source: str | None = None
+        self._count: int = 0
+        self._since: float = 0.0
+
+    def offer(
+        self, status: PluginStatus, source: str | None = None, immediate: bool = False
+    ) -> PluginStatus | None:
+        """
+        Record a sampled status and the plugin that produced it. Returns the
+        status once it is committed, or None while it is still settling or
+        if it is already the committed one.
+        """
+        status = tuple(status)
+        if status == self.committed:
+            if self._candidate is not None:
+                # Flapped back before the candidate settled
+                self.suppressed += 1
+                self._candidate = None
+            return None
+
+        now = self.clock()
+        if status != self._candidate:
+            if self._candidate is not None:
+                self.suppressed += 1
+            self._candidate = status
+            self._source = source
+            self._count = 0
+            self._since = now
+        self._count += 1
+
+        samples, window = self._limits(source)
+        if (
+            (immediate and source == self.committed_source)
+            or self.committed is None
+            or self._count >= samples
+            or (window > 0 and now - self._since >= window)
+        ):
+            self.committed = status
+            self.committed_source = source
+            self._candidate = None
+            return status
+        return None
+
+    def pending(self) -> PluginStatus | None:
+        """The status waiting to be committed, if any."""
+        return self._candidate
+
+    def progress(self) -> tuple[int, int]:
+        """Samples seen of the pending status, and samples needed to commit it."""
+        return self._count, self._limits(self._source)[0]
+
+    def next_check(self) -> float | None:
+        """Seconds until the pending status should be sampled again, or None."""
+        if self._candidate is None:
+            return None
+        _, window = self._limits(self._source)
+        if window > 0:
+            return max(0.0, min(self.interval, self._since + window - self.clock()))
+        return self.interval
+
+    def _limits(self, source: str | None) -> tuple[int, float]:
+        override = self.plugins.get(source, {}) if source else {}
+        return (
+            max(1, int(override.get("samples", self.samples))),
+            override.get("window", self.window),
+        )
@@ -1,10 +1,29 @@
+import time
+from collections.abc import Callable
+
+from Cocoa import (  # pyright: ignore[reportAttributeAccessIssue]
+    NSDate,
+    NSDefaultRunLoopMode,
+    NSDistributedNotificationCenter,
+    NSObject,
+    NSRunLoop,
+    NSWorkspace,
+)
 from Quartz import (
     CGEventSourceSecondsSinceLastEventType,
     kCGAnyInputEventType,
     kCGEventSourceStateCombinedSessionState,
 )
 
+from .apps import LAUNCH, TERMINATE, AppEvent, AppEventSource, AppInfo
 from .ascript import ascript
+from .events import FOCUS, MEDIA, EventBus, EventSource
+
+# Distributed notifications posted by media apps on track or playback changes.
+MEDIA_NOTIFICATIONS = {
+    "com.spotify.client.PlaybackStateChanged": "com.spotify.client",
+    "com.apple.Music.playerInfo": "com.apple.music",
+}
 
 
 def get_frontmost_bundle() -> str:
@@ -20,7 +39,119 @@ def get_frontmost_bundle() -> str:
     return str(ascript(script)).lower()
 
 
+def frontmost_bundle() -> str:
+    """
+    Returns the bundle ID of the frontmost application from NSWorkspace, without
+    running a script. Only current while the main run loop is being pumped.
+    """
+    app = NSWorkspace.sharedWorkspace().frontmostApplication()
+    return str(app.bundleIdentifier() or "").lower() if app else ""
+
+
 def get_idle_time() -> float:
     return CGEventSourceSecondsSinceLastEventType(
         kCGEventSourceStateCombinedSessionState, kCGAnyInputEventType
     )
+
+
+def pump(seconds: float):
+    """
+    Run the main run loop for up to the given time, so workspace notifications
+    are delivered to their observers. Returns early once a source fired.
+    """
+    until = NSDate.dateWithTimeIntervalSinceNow_(seconds)
+    if not NSRunLoop.currentRunLoop().runMode_beforeDate_(NSDefaultRunLoopMode, until):
+        # No run loop sources attached; fall back to a plain sleep.
+        time.sleep(seconds)
+
+
+def _app_info(app) -> AppInfo:
+    return AppInfo(
+        str(app.bundleIdentifier() or ""),
+        int(app.processIdentifier()),
+        str(app.localizedName() or ""),
+    )
+
+
+class _WorkspaceObserver(NSObject):
+    callback: Callable[[AppEvent], None] | None = None
+
+    def appLaunched_(self, notification):
+        app = notification.userInfo()["NSWorkspaceApplicationKey"]
+        if self.callback:
+            self.callback(AppEvent(LAUNCH, _app_info(app)))
+
+    def appTerminated_(self, notification):
+        app = notification.userInfo()["NSWorkspaceApplicationKey"]
+        if self.callback:
+            self.callback(AppEvent(TERMINATE, _app_info(app)))
+
+
+class WorkspaceAppSource(AppEventSource):
+    """
+    Running apps from NSWorkspace, with launch/terminate notifications.
+    Notifications are delivered while the main run loop runs (see pump()).
+    """
+
+    def __init__(self):
+        self._observer: _WorkspaceObserver | None = None
+
+    def list(self) -> list[AppInfo]:
+        return [_app_info(app) for app in NSWorkspace.sharedWorkspace().runningApplications()]
+
+    def start(self, callback: Callable[[AppEvent], None]):
+        observer = _WorkspaceObserver.alloc().init()
+        observer.callback = callback
+        center = NSWorkspace.sharedWorkspace().notificationCenter()
+        center.addObserver_selector_name_object_(
+            observer, b"appLaunched:", "NSWorkspaceDidLaunchApplicationNotification", None
+        )
+        center.addObserver_selector_name_object_(
+            observer, b"appTerminated:", "NSWorkspaceDidTerminateApplicationNotification", None
+        )
+        self._observer = observer
+
+    def stop(self):
+        if self._observer is not None:
+            NSWorkspace.sharedWorkspace().notificationCenter().removeObserver_(self._observer)
+            self._observer = None
+
+
+class _EventObserver(NSObject):
+    bus: EventBus | None = None
+
+    def appActivated_(self, notification):
+        app = notification.userInfo()["NSWorkspaceApplicationKey"]
+        if self.bus:
+            self.bus.post(FOCUS, str(app.bundleIdentifier() or "").lower())
+
+    def mediaChanged_(self, notification):
+        if self.bus:
+            self.bus.post(MEDIA, MEDIA_NOTIFICATIONS.get(str(notification.name()), ""))
+
+
+class WorkspaceEventSource(EventSource):
+    """
+    Posts FOCUS events on app activation and MEDIA events when Spotify or
+    Music change track or playback state.
+    """
+
+    def __init__(self):
+        self._observer: _EventObserver | None = None
+
+    def start(self, bus: EventBus):
+        observer = _EventObserver.alloc().init()
+        observer.bus = bus
+        NSWorkspace.sharedWorkspace().notificationCenter().addObserver_selector_name_object_(
+            observer, b"appActivated:", "NSWorkspaceDidActivateApplicationNotification", None
+        )
+        distributed = NSDistributedNotificationCenter.defaultCenter()
+        for name in MEDIA_NOTIFICATIONS:
+            distributed.addObserver_selector_name_object_(observer, b"mediaChanged:", name, None)
+        self._observer = observer
+
+    def stop(self):
+        if self._observer is not None:
+            NSWorkspace.sharedWorkspace().notificationCenter().removeObserver_(self._observer)
+            NSDistributedNotificationCenter.defaultCenter().removeObserver_(self._observer)
+            self._observer = None
@@ -0,0 +1,113 @@
+from collections.abc import Callable, Iterable, Mapping
+from string import Formatter
+
+# Fields every template can use.
+COMMON_FIELDS = ("sep", "time")
+
+# Fields each plugin's templates can use, besides COMMON_FIELDS.
+FIELDS = {
+    "browser": ("app", "prefix", "title", "url", "domain"),
+    "music": ("app", "prefix", "title", "artist"),
+    "code": ("app", "prefix", "file", "project"),
+    "idle": ("text", "minutes"),
+}
+
+# Fields whose values aren't strings, with a value of their type. Templates
+# are rendered once with these (and strings for the rest) when compiled, so a
+# format spec that doesn't fit its value fails in the settings, not later.
+SAMPLE_VALUES = {"minutes": 0}
+
+# The built-in template of each "display" value, by plugin ID.
+DISPLAY_TEMPLATES = {
+    "browser": {
+        "title": "{prefix}{title}{sep}{time}",
+        "url": "{prefix}{domain}{sep}{time}",
+        "none": "{app}{sep}{time}",
+    },
+    "music": {
+        "title": "{prefix}{title}{sep}{time}",
+        "artist": "{prefix}{artist}{sep}{time}",
+        "both": "{prefix}{title} by {artist}{sep}{time}",
+        "artist_title": "{app}{time}",
+        "none": "{app}{time}",
+    },
+    "code": {
+        "project": "{prefix}{project}{sep}{time}",
+        "file": "{prefix}{file}{sep}{time}",
+        "both": "{prefix}{file} in {project}{sep}{time}",
+        "file_project": "{app}{time}",
+        "none": "{app}{time}",
+    },
+    "idle": {
+        "normal": "{text}{sep}{time}",
+        "elapsed": "{text} ({minutes}m){sep}{time}",
+    },
+}
+
+
+class Template:
+    """
+    Status text with {field} placeholders, like "{prefix}{title} by
+    {artist}{sep}{time}", compiled once. Values are passed to render() as
+    functions, and only those of the fields the template uses are called,
+    so a template without {time} never reads the clock.
+    """
+
+    def __init__(self, source: str, fields: Iterable[str] | None = None):
+        """Raises ValueError if source isn't a template of the given fields."""
+        self.source: str = source
+        allowed = None if fields is None else set(fields)
+        names: list[str] = []
+        parts: list[str] = []
+        try:
+            for literal, name, spec, conversion in Formatter().parse(source):
+                parts.append(literal.replace("{", "{{").replace("}", "}}"))
+                if name is None:
+                    continue
+                if not name.isidentifier() or "{" in spec:
+                    raise ValueError(f"invalid placeholder {{{name}}}")
+                if allowed is not None and name not in allowed:
+                    raise ValueError(f"unknown placeholder {{{name}}}")
+                if name not in names:
+                    names.append(name)
+                conversion = f"!{conversion}" if conversion else ""
+                spec = f":{spec}" if spec else ""
+                parts.append(f"{{{names.index(name)}{conversion}{spec}}}")
+        except ValueError as e:
+            raise ValueError(f"{source!r}: {e}") from None
+
+        # Fields the template uses, in order of first use.
+        self.fields: tuple[str, ...] = tuple(names)
+        self._format: Callable[..., str] = "".join(parts).format
+        try:
+            self._format(*[SAMPLE_VALUES.get(name, "") for name in names])
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"{source!r}: {e}") from None
+
+    def __repr__(self) -> str:
+        return f"Template({self.source!r})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Template):
+            return NotImplemented
+        return self.source == other.source
+
+    def __hash__(self) -> int:
+        return hash(self.source)
+
+    def uses(self, field: str) -> bool:
+        return field in self.fields
+
+    def render(self, values: Mapping[str, Callable[[], object]]) -> str:
+        """Fill in the template, calling values[field]() for each field it uses."""
+        return self._format(*[values[name]() for name in self.fields])
+
+
+def plugin_template(pid: str, display: str, source: str | None = None) -> Template:
+    """
+    The template of a plugin: source if given, else the built-in template of
+    its display value. Raises ValueError if source uses unknown fields.
+    """
+    if source is None:
+        return Template(DISPLAY_TEMPLATES[pid][display])
+    return Template(source, COMMON_FIELDS + FIELDS[pid])
@@ -0,0 +1,48 @@
+import heapq
+import itertools
+
+
+class TimerHeap:
+    """
+    Named deadlines kept in a min-heap. Scheduling a name again replaces its
+    deadline; replaced and cancelled entries are dropped lazily when they
+    reach the top of the heap.
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[float, int, str]] = []
+        self._live: dict[str, int] = {}
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def schedule(self, key: str, at: float):
+        seq = next(self._seq)
+        self._live[key] = seq
+        heapq.heappush(self._heap, (at, seq, key))
+
+    def cancel(self, key: str):
+        self._live.pop(key, None)
+
+    def next_deadline(self) -> float | None:
+        """The earliest live deadline, or None if there is none."""
+        self._prune()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> list[str]:
+        """Remove and return the names of every deadline at or before now."""
+        due = []
+        while self._prune() and self._heap[0][0] <= now:
+            _, _, key = heapq.heappop(self._heap)
+            del self._live[key]
+            due.append(key)
+        return due
+
+    def _prune(self) -> bool:
+        while self._heap:
+            _, seq, key = self._heap[0]
+            if self._live.get(key) == seq:
+                return True
+            heapq.heappop(self._heap)
+        return False
@@ -0,0 +1,206 @@
+import argparse
+import dataclasses
+import json
+import sys
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+from .config import ConfigError, compile_config
+from .constants import l
+from .snapshot import Snapshot
+from .types import PluginContext, PluginSettings, PluginStatus
+
+TRACE_VERSION = 1
+
+DEFAULT_SETTINGS_PATH = Path(__file__).resolve().parent.parent / "settings.jsonc"
+
+
+class TraceEntry:
+    """One recorded tick: when it ran, its global context, its snapshot, and the status it produced."""
+
+    __slots__ = ("time", "context", "snapshot", "status", "plugin")
+
+    def __init__(
+        self,
+        time: float,
+        context: PluginContext,
+        snapshot: Snapshot,
+        status: PluginStatus,
+        plugin: str | None = None,
+    ):
+        self.time: float = time
+        self.context: PluginContext = context
+        self.snapshot: Snapshot = snapshot
+        self.status: PluginStatus = status
+        self.plugin: str | None = plugin
+
+
+class TraceRecorder:
+    """
+    Appends one JSON line per tick to a trace file. Lines are flushed as
+    they are written, so a trace survives Mark being killed.
+    """
+
+    def __init__(self, path: str):
+        self.path: str = path
+        self.ticks: int = 0
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+
+    def record(self, entry: TraceEntry):
+        self._file.write(
+            json.dumps(
+                {
+                    "v": TRACE_VERSION,
+                    "time": entry.time,
+                    "context": _encode(entry.context),
+                    "snapshot": _encode(
+                        {
+                            f.name: getattr(entry.snapshot, f.name)
+                            for f in dataclasses.fields(Snapshot)
+                        }
+                    ),
+                    "status": list(entry.status),
+                    "plugin": entry.plugin,
+                },
+                ensure_ascii=False,
+            )
+            + "\n"
+        )
+        self.ticks += 1
+
+    def close(self):
+        self._file.close()
+
+
+def read_trace(path: str) -> Iterator[TraceEntry]:
+    """
+    Yield the ticks recorded in a trace file, one line at a time, so traces
+    of any length can be replayed in constant memory. Raises ValueError on a
+    line that isn't a trace entry.
+    """
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+                if data.get("v") != TRACE_VERSION:
+                    raise ValueError(f"unsupported trace version {data.get('v')!r}")
+                yield TraceEntry(
+                    data["time"],
+                    _decode_context(data["context"]),
+                    _decode_snapshot(data["snapshot"]),
+                    tuple(data["status"]),
+                    data.get("plugin"),
+                )
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                raise ValueError(f"{path}:{number}: invalid trace entry: {e}") from e
+
+
+def replay(path: str, settings: PluginSettings, debug: bool = False) -> int:
+    """
+    Feed a recorded trace through the plugins at full speed, with the given
+    settings and the recorded times, and log every tick whose status differs
+    from the recorded one. Returns how many differ. Raises ConfigError if the
+    settings are invalid, and OSError or ValueError if the trace can't be read.
+    """
+    # Imported here so the trace format stays usable without the plugins
+    from plugins.manager import PluginManager
+
+    config = compile_config(settings)
+    entry = None
+    manager = PluginManager(
+        settings,
+        debug=debug,
+        collect=lambda fields: entry.snapshot,
+        clock=lambda: entry.time,
+        config=config,
+    )
+    enabled = config.statuses.enabled
+
+    ticks = changed = 0
+    start = time.perf_counter()
+    for entry in read_trace(path):
+        # Use the current settings' plugins, so config changes show up
+        status = manager.get_status(dict(entry.context, _enabled=enabled))
+        ticks += 1
+        if status != entry.status:
+            changed += 1
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry.time))
+            l.warning(f"{when}: {' '.join(entry.status)} -> {' '.join(status)}")
+        elif debug:
+            l.debug(f"Replayed status: {' '.join(status)}")
+    elapsed = time.perf_counter() - start
+
+    rate = f" ({ticks / elapsed:,.0f} ticks/s)" if elapsed > 0 else ""
+    l.info(f"Replayed {ticks} ticks in {elapsed:.2f}s{rate}")
+    if changed:
+        l.warning(f"{changed} of {ticks} statuses differ from the recording")
+    else:
+        l.success("All statuses match the recording")
+    return changed
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Replay a trace from the command line, on any platform:
+
+        python -m utils.trace replay TRACE [--settings FILE] [--verbose]
+
+    Exits with 0 if every status matches the recording and 1 otherwise.
+    """
+    from . import jsonc
+
+    parser = argparse.ArgumentParser(prog="python -m utils.trace", description="Mark trace tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    replay_parser = commands.add_parser("replay", help="replay a trace offline and report changed statuses")
+    replay_parser.add_argument("trace")
+    replay_parser.add_argument("--settings", default=str(DEFAULT_SETTINGS_PATH))
+    replay_parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    try:
+        with open(args.settings, encoding="utf-8") as f:
+            settings = jsonc.loads(f.read())
+    except (OSError, json.JSONDecodeError) as e:
+        l.error(f"Failed to load settings: {e}")
+        return 1
+    try:
+        return 0 if replay(args.trace, settings, debug=args.verbose) == 0 else 1
+    except ConfigError as e:
+        l.error(f"Failed to load settings: {e}")
+    except (OSError, ValueError) as e:
+        l.error(f"Failed to replay trace: {e}")
+    return 1
+
+
+def _encode(data: dict) -> dict:
+    return {
+        key: sorted(value) if isinstance(value, (set, frozenset)) else value
+        for key, value in data.items()
+    }
+
+
+def _decode_context(data: dict) -> PluginContext:
+    context = dict(data)
+    if "_running" in context:
+        context["_running"] = frozenset(context["_running"])
+    return context
+
+
+def _decode_snapshot(data: dict) -> Snapshot:
+    fields = {f.name for f in dataclasses.fields(Snapshot)}
+    kwargs = {key: value for key, value in data.items() if key in fields}
+    for key in ("processes", "fields", "degraded"):
+        if key in kwargs:
+            kwargs[key] = frozenset(kwargs[key])
+    if "tracks" in kwargs:
+        kwargs["tracks"] = {
+            bundle: tuple(track) for bundle, track in kwargs["tracks"].items()
+        }
+    return Snapshot(**kwargs)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+import asyncio
+import json
+import time
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from .constants import VERSION
+
+DISCORD_API = "https://discord.com/api/v9"
+SETTINGS_PATH = "/users/@me/settings"
+
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 10.0
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.5
+
+# Gateway errors mean the request never reached Discord's backend, so it is
+# safe to send again.
+RETRY_STATUSES = frozenset({502, 503, 504})
+
+
+class DiscordTransport:
+    """
+    HTTP transport for the Discord API over a pooled keep-alive session.
+
+    Headers are set once on the session and payloads are encoded with a
+    shared compact encoder. Every request has connect and read timeouts.
+    Only failures where the request can't have been applied are retried:
+    connection errors and gateway errors (502/503/504). Read timeouts and
+    other responses are returned or raised as they are.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        base_url: str = DISCORD_API,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+    ):
+        self.base_url: str = base_url.rstrip("/")
+        self.timeout: tuple[float, float] = (connect_timeout, read_timeout)
+        self.retries: int = retries
+        self.backoff: float = backoff
+
+        self._encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(
+            {
+                "Authorization": token,
+                "Content-Type": "application/json",
+                "User-Agent": f"Mark/{VERSION}",
+            }
+        )
+
+    def patch_settings(self, payload: dict) -> requests.Response:
+        """PATCH the user settings with the given payload."""
+        return self.request("PATCH", SETTINGS_PATH, payload)
+
+    def request(self, method: str, path: str, payload: dict | None = None) -> requests.Response:
+        """
+        Send a request, retrying connection and gateway errors with exponential
+        backoff. Raises requests.RequestException if it still fails.
+        """
+        url = self.base_url + path
+        body = self._encoder.encode(payload).encode() if payload is not None else None
+
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            try:
+                resp = self.session.request(method, url, data=body, timeout=self.timeout)
+            except requests.ConnectionError:
+                # Includes connect timeouts; nothing reached the server.
+                if last_attempt:
+                    raise
+            else:
+                if resp.status_code not in RETRY_STATUSES or last_attempt:
+                    return resp
+            time.sleep(self.backoff * 2**attempt)
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncDiscordTransport:
+    """
+    asyncio counterpart of DiscordTransport, over a pooled keep-alive
+    httpx.AsyncClient.
+
+    It has the same timeouts, retry rules and headers as DiscordTransport, and
+    raises the same requests exceptions, so callers handle both alike.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        base_url: str = DISCORD_API,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+    ):
+        self.base_url: str = base_url.rstrip("/")
+        self.timeout: tuple[float, float] = (connect_timeout, read_timeout)
+        self.retries: int = retries
+        self.backoff: float = backoff
+
+        self._encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+        self.client = httpx.AsyncClient(
+            headers={
+                "Authorization": token,
+                "Content-Type": "application/json",
+                "User-Agent": f"Mark/{VERSION}",
+            },
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=2, max_keepalive_connections=1),
+        )
+
+    async def patch_settings(self, payload: dict) -> httpx.Response:
+        """PATCH the user settings with the given payload."""
+        return await self.request("PATCH", SETTINGS_PATH, payload)
+
+    async def request(self, method: str, path: str, payload: dict | None = None) -> httpx.Response:
+        """
+        Send a request, retrying connection and gateway errors with exponential
+        backoff. Raises requests.RequestException if it still fails.
+        """
+        url = self.base_url + path
+        body = self._encoder.encode(payload).encode() if payload is not None else None
+
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            try:
+                resp = await self.client.request(method, url, content=body)
+            except httpx.ConnectTimeout as e:
+                # Nothing reached the server.
+                if last_attempt:
+                    raise requests.ConnectTimeout(str(e) or "Connecting timed out") from e
+            except httpx.ConnectError as e:
+                if last_attempt:
+                    raise requests.ConnectionError(str(e)) from e
+            except httpx.TimeoutException as e:
+                raise requests.ReadTimeout(str(e) or "No answer in time") from e
+            except httpx.HTTPError as e:
+                # The request may have been applied, so it isn't sent again.
+                raise requests.ConnectionError(str(e)) from e
+            else:
+                if resp.status_code not in RETRY_STATUSES or last_attempt:
+                    return resp
+            await asyncio.sleep(self.backoff * 2**attempt)
+
+    async def close(self):
+        await self.client.aclose()
@@ -0,0 +1,121 @@
+from collections.abc import Mapping
+from typing import Any
+from urllib.parse import urlsplit
+
+WILDCARD = "*."
+
+
+class _PathNode:
+    """Rules under one host, by path segment."""
+
+    __slots__ = ("value", "children")
+
+    def __init__(self):
+        self.value: Any = None
+        self.children: dict[str, "_PathNode"] = {}
+
+    def match(self, segments: list[str]) -> Any:
+        """The value of the longest rule path that prefixes segments, or None."""
+        node, best = self, self.value
+        for segment in segments:
+            node = node.children.get(segment)
+            if node is None:
+                break
+            if node.value is not None:
+                best = node.value
+        return best
+
+
+class _HostNode:
+    """One host label, with the rules for exactly that host and for its subdomains."""
+
+    __slots__ = ("exact", "wildcard", "children")
+
+    def __init__(self):
+        self.exact: _PathNode | None = None
+        self.wildcard: _PathNode | None = None
+        self.children: dict[str, "_HostNode"] = {}
+
+
+class UrlRules:
+    """
+    A table of rules keyed by URL, compiled into a trie of reversed host
+    labels with path segments below each host, so a lookup costs as much as
+    the URL is deep, however many rules there are.
+
+    Rules look like:
+      "github.com"        - that host (and www.github.com), any path
+      "*.github.com"      - any subdomain of github.com, but not github.com
+      "github.com/a/b"    - that host, under the path /a/b
+
+    The most specific rule wins: an exact host over a wildcard, a longer
+    wildcard over a shorter one, then the longest matching path.
+    """
+
+    def __init__(self, rules: Mapping[str, Any] | None = None):
+        self.rules: dict[str, Any] = dict(rules or {})
+        self._root = _HostNode()
+        for rule, value in self.rules.items():
+            self._add(rule, value)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, UrlRules):
+            return NotImplemented
+        return self.rules == other.rules
+
+    def match(self, url: str) -> Any:
+        """The value of the most specific rule matching url, or None."""
+        parts = urlsplit(url)
+        host = _host(parts.netloc)
+        if not host:
+            return None
+        segments = [segment for segment in parts.path.split("/") if segment]
+
+        # Host rules that match, most specific first
+        candidates = []
+        node = self._root
+        for label in reversed(host.split(".")):
+            if node.wildcard is not None:
+                candidates.append(node.wildcard)
+            node = node.children.get(label)
+            if node is None:
+                break
+        else:
+            if node.exact is not None:
+                candidates.append(node.exact)
+
+        for paths in reversed(candidates):
+            value = paths.match(segments)
+            if value is not None:
+                return value
+        return None
+
+    def _add(self, rule: str, value: Any):
+        host, _, path = rule.partition("/")
+        wildcard = host.startswith(WILDCARD)
+        if wildcard:
+            host = host[len(WILDCARD) :]
+        host = _host(host)
+        labels = host.split(".")
+        if not host or not all(labels) or "*" in host:
+            raise ValueError(f"{rule!r} is not a valid rule")
+
+        node = self._root
+        for label in reversed(labels):
+            node = node.children.setdefault(label, _HostNode())
+        if wildcard:
+            paths = node.wildcard = node.wildcard or _PathNode()
+        else:
+            paths = node.exact = node.exact or _PathNode()
+        for segment in path.split("/"):
+            if segment:
+                paths = paths.children.setdefault(segment, _PathNode())
+        paths.value = value
+
+
+def _host(netloc: str) -> str:
+    """netloc without credentials, lowercased and without a leading "www."."""
+    return netloc.rpartition("@")[2].lower().removeprefix("www.")
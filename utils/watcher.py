@@ -0,0 +1,167 @@
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+from collections.abc import Callable
+from typing import Any, NamedTuple
+
+from .events import SETTINGS, EventBus, EventSource
+
+# inotify(7) flags
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0)
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+DEFAULT_WATCH_INTERVAL = 1.0
+
+
+class SettingsUpdate(NamedTuple):
+    value: Any  # whatever load() returned, or None if it failed
+    error: Exception | None
+
+
+class SettingsWatcher(EventSource):
+    """
+    Watches a settings file and posts a SETTINGS event with a SettingsUpdate
+    whenever its contents change. The file is loaded on the watcher's side,
+    so the tick only has to swap the result in; on the asyncio engine it is
+    loaded on a worker thread, off the event loop.
+
+    Uses inotify on the file's directory where available (so editors that
+    save by renaming a temporary file over it are seen too), and otherwise
+    checks the file's mtime, size and inode every interval seconds.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        load: Callable[[str], Any],
+        interval: float = DEFAULT_WATCH_INTERVAL,
+    ):
+        self.path: str = os.fspath(path)
+        self.load: Callable[[str], Any] = load
+        self.interval: float = interval
+        self._fd: int | None = _inotify_watch(os.path.dirname(os.path.abspath(self.path)))
+        self._name: bytes = os.fsencode(os.path.basename(self.path))
+        self._stat = self._stat_key()
+        self._contents = self._read()
+        self._stop = threading.Event()
+
+    @property
+    def backend(self) -> str:
+        return "inotify" if self._fd is not None else "mtime"
+
+    def start(self, bus: EventBus):
+        self._stop.clear()
+        threading.Thread(target=self._run, args=(bus,), daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        self.stop()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def poll(self, bus: EventBus):
+        if (update := self._check()) is not None:
+            bus.post(SETTINGS, update)
+
+    async def poll_async(self, bus: EventBus):
+        if (update := await asyncio.to_thread(self._check)) is not None:
+            bus.post(SETTINGS, update)
+
+    def _check(self) -> SettingsUpdate | None:
+        """Load the file if its contents changed since the last check."""
+        if self._fd is not None:
+            if not self._drain():
+                return None
+        else:
+            stat = self._stat_key()
+            if stat == self._stat:
+                return None
+            self._stat = stat
+
+        contents = self._read()
+        if contents == self._contents:
+            return None
+        self._contents = contents
+        try:
+            return SettingsUpdate(self.load(self.path), None)
+        except Exception as e:
+            return SettingsUpdate(None, e)
+
+    def _run(self, bus: EventBus):
+        while not self._stop.is_set():
+            if self._fd is not None:
+                # Wake as soon as the directory changes, but check for stop()
+                try:
+                    select.select([self._fd], [], [], self.interval)
+                except (OSError, ValueError):
+                    return
+            else:
+                self._stop.wait(self.interval)
+            if not self._stop.is_set():
+                self.poll(bus)
+
+    def _drain(self) -> bool:
+        """Read pending inotify events; True if any was about the file."""
+        changed = False
+        # close() may run meanwhile on shutdown; reads then fail and stop
+        fd = self._fd
+        if fd is None:
+            return changed
+        while True:
+            try:
+                data = os.read(fd, 4096)
+            except (BlockingIOError, OSError):
+                return changed
+            if not data:
+                return changed
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                _, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset : offset + length].rstrip(b"\0")
+                offset += length
+                if name == self._name:
+                    changed = True
+
+    def _stat_key(self) -> tuple[int, int, int] | None:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _read(self) -> bytes | None:
+        try:
+            with open(self.path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+
+def _inotify_watch(directory: str) -> int | None:
+    """An inotify descriptor watching directory for written or moved-in files, or None."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+        os.close(fd)
+        return None
+    return fd